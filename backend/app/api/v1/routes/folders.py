@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Optional
 from pydantic import BaseModel
 from app.api.v1.dependencies import get_current_user_id
-from app.database.supabase_client import supabase
+from app.database.supabase_client import supabase_admin
+from app.database.executor import db_execute
 from app.core.logging import get_logger
 import uuid
 
@@ -40,7 +41,7 @@ async def create_folder(
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('folders').insert(folder_data).execute()
+        result = await db_execute(supabase_admin.table('folders').insert(folder_data))
         return result.data[0]
         
     except Exception as e:
@@ -54,7 +55,7 @@ async def get_folders(
 ):
     """Get all folders for user."""
     try:
-        result = supabase.table('folders').select('*').eq('user_id', user_id).order('name').execute()
+        result = await db_execute(supabase_admin.table('folders').select('*').eq('user_id', user_id).order('name'))
         return result.data
     except Exception as e:
         logger.error(f"Get folders error: {str(e)}")
@@ -69,7 +70,7 @@ async def delete_folder(
     """Delete a folder."""
     try:
         # Check if folder has lessons
-        lessons = supabase.table('lessons').select('id').eq('folder_id', folder_id).execute()
+        lessons = await db_execute(supabase_admin.table('lessons').select('id').eq('folder_id', folder_id))
         
         if lessons.data:
             raise HTTPException(
@@ -77,7 +78,7 @@ async def delete_folder(
                 detail="Cannot delete folder with lessons. Move or delete lessons first."
             )
         
-        supabase.table('folders').delete().eq('id', folder_id).eq('user_id', user_id).execute()
+        await db_execute(supabase_admin.table('folders').delete().eq('id', folder_id).eq('user_id', user_id))
         return {"message": "Folder deleted successfully"}
         
     except HTTPException:
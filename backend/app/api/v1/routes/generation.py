@@ -1,31 +1,161 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from app.schemas.lesson import GenerationRequest, LessonResponse
-from app.services.llm.question_generator import QuestionGeneratorService
 from app.services.content.content_analyzer import ContentAnalyzer
+from app.services.generation.pipeline import GenerationPipeline
+from app.services.generation.fast_generator import FastGenerator
+from app.services.generation.estimator import GenerationEstimator
+from app.services.generation.speculative import get_speculative_generator
+from app.services.content.concept_index import ConceptIndexer
 from app.services.content.file_processor import FileProcessor
 from app.repositories.lesson_repository import LessonRepository
 from app.api.v1.dependencies import get_current_user_id
 from app.core.logging import get_logger
-from app.schemas.lesson import GenerationSource, Question, Flashcard
-from typing import List
-import asyncio
+from app.core.idempotency import detach, idempotency_store, request_fingerprint, IDEMPOTENCY_HEADER, REPLAYED_HEADER
+from app.schemas.lesson import GenerationSource, GenerationMode
 
 router = APIRouter()
 logger = get_logger(__name__)
 
 content_analyzer = ContentAnalyzer()
 lesson_repo = LessonRepository()
-question_generator = QuestionGeneratorService()
+generation_pipeline = GenerationPipeline(content_analyzer=content_analyzer)
+fast_generator = FastGenerator()
+concept_indexer = ConceptIndexer()
+generation_estimator = GenerationEstimator(generation_pipeline)
+
+
+async def run_pipeline(content: str, sources: List[Tuple[str, str]], request: GenerationRequest):
+    """Full LLM generation; several files share one chunk/plan/dedupe pass."""
+    if len(sources) > 1:
+        return await generation_pipeline.generate_from_sources(sources, request)
+    return await generation_pipeline.generate(content, request)
+
+
+async def refine_lesson(
+    lesson_id: str,
+    user_id: str,
+    content: str,
+    sources: List[Tuple[str, str]],
+    request: GenerationRequest
+):
+    """Background task: replace fast-mode items with full LLM generation."""
+    try:
+        generated = await run_pipeline(content, sources, request)
+        if not generated['questions'] and not generated['flashcards']:
+            logger.warning(f"Background refinement produced nothing for lesson {lesson_id}")
+            return
+        await lesson_repo.replace_lesson_content(
+            lesson_id=lesson_id,
+            questions=[q.model_dump() for q in generated['questions']],
+            flashcards=[fc.model_dump() for fc in generated['flashcards']],
+            study_notes=generated['study_notes']
+        )
+        # Question ids changed, so the concept links need rebuilding
+        lesson = await lesson_repo.get_lesson_by_id(lesson_id, user_id)
+        if lesson:
+            await concept_indexer.index_lesson(user_id, lesson, content)
+    except Exception as e:
+        logger.error(f"Background refinement failed for lesson {lesson_id}: {repr(e)}", exc_info=True)
+
+
+def combined_title(titles: List[str]) -> str:
+    if len(titles) <= 2:
+        return " + ".join(titles)
+    return f"{titles[0]} + {titles[1]} + {len(titles) - 2} more"
+
+
+async def load_source_content(
+    request: GenerationRequest,
+    user_id: str
+) -> Tuple[str, str, List[Tuple[str, str]]]:
+    """Load (content, title, sources) for upload and notes requests."""
+    if request.source_type == GenerationSource.UPLOAD:
+        file_ids = list(dict.fromkeys(([request.file_id] if request.file_id else []) + (request.file_ids or [])))
+        if not file_ids:
+            raise HTTPException(status_code=422, detail="file_id or file_ids is required")
+        file_processor = FileProcessor()
+        if len(file_ids) == 1:
+            file = await file_processor.get_file_content(file_ids[0], user_id)
+            if not file:
+                raise HTTPException(status_code=404, detail="File not found")
+            return file['content'], file['filename'], [(file['filename'], file['content'])]
+
+        files = await file_processor.get_files_content(file_ids, user_id)
+        sources = [(file['filename'], file['content']) for file in files if file['content'].strip()]
+        if not sources:
+            raise HTTPException(status_code=422, detail="None of the files contain extractable text")
+        content = "\n\n".join(f"# {title}\n\n{text}" for title, text in sources)
+        return content, combined_title([title for title, _ in sources]), sources
+
+    if request.source_type == GenerationSource.NOTES:
+        if not request.content:
+            raise HTTPException(status_code=422, detail="content is required")
+        return request.content, "Custom Notes", [("Custom Notes", request.content)]
+
+    raise HTTPException(status_code=422, detail=f"Unsupported source type: {request.source_type.value}")
+
+
+@router.post("/estimate")
+async def estimate_generation(
+    request: GenerationRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Dry run of /generate/: chunk and plan without calling the LLM, and
+    predict LLM calls, tokens, cost and wall-clock time.
+    """
+    try:
+        started = time.perf_counter()
+        content = None
+        sources: List[Tuple[str, str]] = []
+        if request.source_type == GenerationSource.TOPIC:
+            if not request.topic:
+                raise HTTPException(status_code=422, detail="Topic is required")
+        else:
+            content, _, sources = await load_source_content(request, user_id)
+        # Several files are planned per source, as run_pipeline generates them
+        return await generation_estimator.estimate(
+            content,
+            request,
+            content_seconds=time.perf_counter() - started,
+            sources=sources if len(sources) > 1 else None
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Estimate error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @router.post("/", response_model=LessonResponse)
 async def generate_content(
     request: GenerationRequest,
-    user_id: str = Depends(get_current_user_id)
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
 ):
-    logger.info(f"Generation request from user {user_id}, mode: {request.source_type}")
+    # A retried request (e.g. after a proxy timeout) attaches to the running
+    # generation or replays its lesson instead of generating a second one
+    lesson, replayed = await idempotency_store.run(
+        "generate",
+        user_id,
+        idempotency_key,
+        request_fingerprint(request),
+        lambda: _generate_lesson(request, user_id)
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return lesson
+
+
+async def _generate_lesson(request: GenerationRequest, user_id: str):
+    logger.info(f"Generation request from user {user_id}, mode: {request.source_type}, {request.mode.value}")
     
     content = ""
     title = ""
+    sources: List[Tuple[str, str]] = []
 
     try:
         # 1. Fetch Content
@@ -37,84 +167,30 @@ async def generate_content(
             content = await content_analyzer.generate_content_from_topic(request.topic)
             if not content:
                 raise HTTPException(status_code=500, detail="Failed to generate content")
-
-        elif request.source_type == GenerationSource.UPLOAD:
-            if not request.file_id:
-                raise HTTPException(status_code=422, detail="file_id is required")
-            file_processor = FileProcessor()
-            file = await file_processor.get_file_content(request.file_id, user_id)
-            if not file:
-                raise HTTPException(status_code=404, detail="File not found")
-            content = file['content']
-            title = file['filename']
-
-        elif request.source_type == GenerationSource.NOTES:
-            content = request.content
-            title = "Custom Notes"
-
-        # 2. Chunk Content
-        content_chunks = await content_analyzer.chunk_content(content) or []
-        
-        num_chunks = len(content_chunks)
-        questions_per_chunk = 1
-        flashcards_per_chunk = 1
-        
-        if num_chunks > 0:
-            questions_per_chunk = max(1, request.max_questions // num_chunks)
-            flashcards_per_chunk = max(1, 10 // num_chunks)
-
-        logger.info(f"Processing {num_chunks} chunks...")
-
-        all_questions: List[Question] = []
-        all_flashcards: List[Flashcard] = []
-
-        # --- FIX: SEMAPHORE CONCURRENCY ---
-        # Allow 3 chunks to be processed at the same time.
-        # This speeds up processing by ~3x compared to sequential, 
-        # but prevents the API crash we saw earlier.
-        semaphore = asyncio.Semaphore(3) 
-
-        async def process_chunk(chunk):
-            async with semaphore:
-                # Run Q and FC generation in parallel for this chunk
-                results = await asyncio.gather(
-                    question_generator.generate_questions(
-                        content=chunk,
-                        num_questions=questions_per_chunk,
-                        difficulty=request.difficulty,
-                        question_type=request.question_type
-                    ),
-                    question_generator.generate_flashcards(
-                        content=chunk,
-                        num_flashcards=flashcards_per_chunk
-                    ),
-                    return_exceptions=True
-                )
-                return results
-
-        # Create tasks for all chunks
-        tasks = [process_chunk(chunk) for chunk in content_chunks]
-        
-        # Run them (controlled by semaphore)
-        chunk_results_list = []
-        if tasks:
-            chunk_results_list = await asyncio.gather(*tasks)
-
-        # 3. Aggregate Results
-        for q_res, fc_res in chunk_results_list:
-            if isinstance(q_res, list):
-                all_questions.extend(q_res)
-            elif isinstance(q_res, Exception):
-                logger.error(f"Question Error: {q_res}")
-
-            if isinstance(fc_res, list):
-                all_flashcards.extend(fc_res)
-            elif isinstance(fc_res, Exception):
-                logger.error(f"Flashcard Error: {fc_res}")
-
-        # 4. Generate Study Notes
-        notes_result = await question_generator.generate_study_notes(content=content)
-        study_notes = notes_result if isinstance(notes_result, str) else "Failed to generate notes."
+            sources = [(title, content)]
+
+        else:
+            content, title, sources = await load_source_content(request, user_id)
+
+        # 2-4. Chunk, then generate questions, flashcards and study notes,
+        # sharded across every configured provider. Fast mode builds cloze
+        # items locally and leaves the LLM work to a background task.
+        generated = None
+        speculative = await get_speculative_generator().take(user_id, request)
+        if speculative:
+            logger.info(f"Using speculatively pre-generated lesson for file {request.file_id}")
+            generated = speculative
+        elif request.mode == GenerationMode.FAST:
+            generated = await fast_generator.generate(content, request)
+            if not generated['questions'] and not generated['flashcards']:
+                logger.info("Fast mode found too little text; falling back to standard generation")
+                generated = None
+        refine = generated is not None and not speculative and request.refine_in_background
+        if generated is None:
+            generated = await run_pipeline(content, sources, request)
+        all_questions = generated['questions']
+        all_flashcards = generated['flashcards']
+        study_notes = generated['study_notes']
 
         if not all_questions and not all_flashcards and "Failed" in study_notes:
              raise HTTPException(status_code=500, detail="All generation tasks failed.")
@@ -128,6 +204,12 @@ async def generate_content(
             flashcards=[fc.model_dump() for fc in all_flashcards],
             study_notes=study_notes
         )
+
+        # Detached rather than BackgroundTasks: this work is shared by every
+        # retry of the request, and must not depend on any one client staying
+        detach(concept_indexer.index_lesson(user_id, lesson, content))
+        if refine:
+            detach(refine_lesson(lesson['id'], user_id, content, sources, request))
         
         return lesson
 
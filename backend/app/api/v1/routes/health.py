@@ -1,8 +1,16 @@
 from fastapi import APIRouter, HTTPException, status
 
 from app.core.logging import get_logger
+from app.core.idempotency import idempotency_store
 from app.core.exceptions import LLMServiceError
 from app.services.llm.llm_service import get_llm_service
+from app.services.llm.token_budget import usage_tracker
+from app.services.llm.provider_pool import get_provider_pool
+from app.services.generation.speculative import get_speculative_generator
+from app.database.executor import get_db_executor
+from app.repositories.lesson_cache import get_lesson_cache
+from app.services.content.extraction import get_extraction_executor
+from app.services.content.text_store import get_text_store
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -50,3 +58,46 @@ async def llm_health_check():
             detail="LLM health check failed",
         )
 
+
+
+@router.get("/llm/usage", summary="LLM token usage")
+async def llm_usage(limit: int = 50):
+    """Per-model token totals (including prompt cache hit ratios) and recent per-call usage."""
+    return {
+        "totals": usage_tracker.summary(),
+        "prompt_cache": get_llm_service().prompt_cache.stats(),
+        "recent": usage_tracker.recent(limit),
+    }
+
+
+@router.get("/llm/providers", summary="LLM provider pool")
+async def llm_providers():
+    """Capacity, in-flight jobs and observed latency of each provider used for sharded generation."""
+    return {
+        "providers": get_provider_pool().stats(),
+        "speculative": get_speculative_generator().stats(),
+    }
+
+
+@router.get("/idempotency", summary="Idempotency-Key store")
+async def idempotency_stats():
+    """In-flight keys, attached retries and replayed responses."""
+    return idempotency_store.stats()
+
+
+@router.get("/extraction", summary="Document extraction pool")
+async def extraction_stats():
+    """Worker pool size, queued documents, rejections and timeouts for text extraction."""
+    return {
+        **get_extraction_executor().stats(),
+        "text_store": get_text_store().stats(),
+    }
+
+
+@router.get("/database", summary="Database call pool")
+async def database_stats():
+    """Worker threads, in-flight and slow calls, and average queue wait for supabase calls; lesson cache hit rates."""
+    return {
+        **get_db_executor().stats(),
+        "lesson_cache": get_lesson_cache().stats(),
+    }
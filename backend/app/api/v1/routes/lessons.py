@@ -7,6 +7,7 @@ from app.schemas.lesson import LessonResponse, LessonMetadataResponse
 # --- END FIX ---
 
 from app.repositories.lesson_repository import LessonRepository
+from app.repositories.concept_repository import ConceptRepository
 from app.core.logging import get_logger
 from app.api.v1.dependencies import get_current_user_id
 
@@ -41,6 +42,35 @@ async def get_lessons(
         raise HTTPException(status_code=500, detail="Failed to retrieve lessons.")
 
 
+@router.get("/concepts/search")
+async def search_concepts(
+    q: str = Query(..., min_length=2, description="Concept to search for"),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Find the user's lessons and questions covering a concept."""
+    try:
+        concept_repo = ConceptRepository()
+        return await concept_repo.search_concepts(user_id, q, limit)
+    except Exception as e:
+        logger.error(f"Concept search error for '{q}': {repr(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to search concepts.")
+
+
+@router.get("/{lesson_id}/concepts")
+async def get_lesson_concepts(
+    lesson_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Get the key concepts indexed for a lesson, strongest first."""
+    try:
+        concept_repo = ConceptRepository()
+        return await concept_repo.get_lesson_concepts(lesson_id, user_id)
+    except Exception as e:
+        logger.error(f"Get lesson concepts error for ID {lesson_id}: {repr(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve lesson concepts.")
+
+
 @router.get("/{lesson_id}", response_model=LessonResponse)
 async def get_lesson(
     lesson_id: str,
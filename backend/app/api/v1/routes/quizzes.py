@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -6,7 +8,9 @@ from app.api.v1.dependencies import get_current_user_id
 from app.repositories.quiz_repository import QuizRepository
 from app.repositories.lesson_repository import LessonRepository # Import at top level
 from app.services.personal_tutor import add_quiz_result_memory
+from app.services.personalization.adaptive_engine import AdaptiveEngine
 from app.core.logging import get_logger
+from app.core.idempotency import detach, idempotency_store, request_fingerprint, IDEMPOTENCY_HEADER, REPLAYED_HEADER
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -63,20 +67,34 @@ class QuestionAnswerResponse(BaseModel):
 @router.post("/submit", response_model=QuizResult)
 async def submit_quiz(
     submission: QuizSubmission,
-    user_id: str = Depends(get_current_user_id)
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
 ):
     """Submit quiz answers, get results, and save the attempt."""
+    # A retried submission replays the first result instead of saving a duplicate attempt
+    result, replayed = await idempotency_store.run(
+        "quiz_submit",
+        user_id,
+        idempotency_key,
+        request_fingerprint(submission),
+        lambda: _submit_quiz(submission, user_id)
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return result
+
+
+async def _submit_quiz(submission: QuizSubmission, user_id: str):
     try:
         lesson_repo = LessonRepository()
         quiz_repo = QuizRepository()
 
-        # 1. Fetch the lesson to get the correct answers
-        lesson = await lesson_repo.get_lesson_by_id(submission.lesson_id, user_id)
-        if not lesson or not lesson.get('questions'):
+        # 1. Fetch the lesson's answer key to grade against
+        questions_map = await lesson_repo.get_answer_key(submission.lesson_id, user_id)
+        if not questions_map:
             raise HTTPException(status_code=404, detail="Lesson or its questions not found.")
 
-        questions_map = {q['id']: q for q in lesson['questions']}
-
         # 2. Evaluate the user's responses
         correct_count = 0
         processed_responses = []
@@ -96,41 +114,30 @@ async def submit_quiz(
         total_questions = len(submission.responses)
         score = round((correct_count / total_questions) * 100) if total_questions > 0 else 0
 
-        # 3. Create the main quiz attempt record FIRST to get its ID
-        attempt = await quiz_repo.create_quiz_attempt(
+        # 3. Save the attempt and all of its responses in one transaction
+        attempt = await quiz_repo.submit_quiz_attempt(
             user_id=user_id,
             lesson_id=submission.lesson_id,
             score=score,
             total_questions=total_questions,
-            time_taken=submission.time_taken
+            time_taken=submission.time_taken,
+            responses=processed_responses
         )
         attempt_id = attempt['id']
-
-        # 4. NOW, save the individual question responses with the correct attempt_id
-        for resp in processed_responses:
-            await quiz_repo.save_question_response(
-                quiz_attempt_id=attempt_id,
-                question_id=resp['question_id'],
-                user_answer=resp['user_answer'],
-                is_correct=resp['is_correct'],
-                time_taken=resp['time_taken']
-            )
         
         logger.info(f"Quiz attempt {attempt_id} saved for user {user_id} on lesson {submission.lesson_id} with score {score}%")
 
-        # 5. Add quiz result to Mem0 for personalization (best-effort)
-        try:
-            add_quiz_result_memory(
-                user_id=user_id,
-                lesson_id=submission.lesson_id,
-                score=score,
-                correct_answers=correct_count,
-                incorrect_answers=total_questions - correct_count,
-                time_taken=submission.time_taken,
-                attempt_id=attempt_id,
-            )
-        except Exception as mem_err:
-            logger.warning(f"Quiz result memory add failed: {mem_err}")
+        # 4. Add quiz result to Mem0 for personalization (best-effort, off the response path)
+        detach(asyncio.to_thread(
+            add_quiz_result_memory,
+            user_id=user_id,
+            lesson_id=submission.lesson_id,
+            score=score,
+            correct_answers=correct_count,
+            incorrect_answers=total_questions - correct_count,
+            time_taken=submission.time_taken,
+            attempt_id=attempt_id,
+        ))
 
         return {
             "score": score,
@@ -174,37 +181,32 @@ async def answer_question(
     try:
         lesson_repo = LessonRepository()
         quiz_repo = QuizRepository()
-        lesson = await lesson_repo.get_lesson_by_id(payload.lesson_id, user_id)
-        if not lesson or not lesson.get("questions"):
+        qmap = await lesson_repo.get_answer_key(payload.lesson_id, user_id)
+        if not qmap:
             raise HTTPException(status_code=404, detail="Lesson or its questions not found.")
-        qmap = {q["id"]: q for q in lesson["questions"]}
         q = qmap.get(payload.question_id)
         if not q:
             raise HTTPException(status_code=404, detail="Question not found.")
         is_correct = payload.user_answer.strip().lower() == q["correct_answer"].strip().lower()
-        await quiz_repo.save_question_response(
-            quiz_attempt_id=payload.attempt_id,
+        stats = await quiz_repo.record_question_response(
+            attempt_id=payload.attempt_id,
+            user_id=user_id,
             question_id=payload.question_id,
             user_answer=payload.user_answer,
             is_correct=is_correct,
             time_taken=payload.time_taken
         )
-        stats = await quiz_repo.compute_attempt_stats(payload.attempt_id)
-        await quiz_repo.update_quiz_attempt_stats(
-            attempt_id=payload.attempt_id,
-            correct_count=stats["correct_count"],
-            total_count=stats["total_answered"]
-        )
-        score = round((stats["correct_count"] / stats["total_answered"]) * 100) if stats["total_answered"] > 0 else 0
+        if not stats:
+            raise HTTPException(status_code=404, detail="Quiz attempt not found.")
         return QuestionAnswerResponse(
             attempt_id=payload.attempt_id,
             question_id=payload.question_id,
             is_correct=is_correct,
             correct_answer=q["correct_answer"],
             explanation=q.get("explanation") or None,
-            total_answered=stats["total_answered"],
+            total_answered=stats["answered_count"],
             correct_count=stats["correct_count"],
-            score=score
+            score=stats["score"]
         )
     except HTTPException:
         raise
@@ -226,3 +228,17 @@ async def get_performance(
     except Exception as e:
         logger.error(f"Error getting performance for user {user_id}: {repr(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve performance data.")
+
+
+@router.get("/weak-concepts")
+async def get_weak_concepts(
+    lesson_id: Optional[str] = Query(None, description="Optional lesson ID to scope the analysis"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Get concepts the user answers incorrectly most often."""
+    try:
+        adaptive_engine = AdaptiveEngine()
+        return await adaptive_engine.identify_weak_concepts(user_id, lesson_id)
+    except Exception as e:
+        logger.error(f"Error getting weak concepts for user {user_id}: {repr(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve weak concepts.")
@@ -1,9 +1,17 @@
 # app/api/v1/routes/upload.py
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
 import os
 
 from app.services.content.file_processor import FileProcessor
+from app.services.content.upload_spool import SpooledUpload, spool_upload
+from app.services.content.upload_sessions import get_upload_session_store
+from app.services.generation.speculative import get_speculative_generator
 from app.core.config import settings
+from app.schemas.upload import UploadSessionCreate
 from app.core.logging import get_logger
 from app.api.v1.dependencies import get_current_user_id
 from app.utils.helpers import sanitize_filename
@@ -12,6 +20,58 @@ router = APIRouter()
 logger = get_logger(__name__)
 
 
+def validate_extension(filename: Optional[str]) -> str:
+    """Sanitized filename, or 400 if its extension isn't allowed."""
+    safe_filename = sanitize_filename(filename or "")
+    file_ext = os.path.splitext(safe_filename)[1].lower()
+    if file_ext not in settings.ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,  # Bad Request
+            detail=f"Invalid file type '{file_ext}'. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+        )
+    return safe_filename
+
+
+# Text loads for deduplicated uploads, held so they aren't garbage collected mid-run
+_speculative_loads: set = set()
+
+
+async def _load_and_schedule(processor: FileProcessor, file_id: str, user_id: str) -> None:
+    try:
+        file = await processor.get_file_content(file_id, user_id)
+    except Exception as e:
+        logger.warning(f"Skipping speculative generation for file {file_id}: {repr(e)}")
+        return
+    if file:
+        get_speculative_generator().schedule(user_id, file_id, file['content'] or "")
+
+
+def schedule_speculative(processor: FileProcessor, file_data: Dict[str, Any], user_id: str) -> None:
+    """Start on the default lesson while the user picks generation options."""
+    # Runs as its own low-priority task; this call returns immediately
+    if not settings.SPECULATIVE_GENERATION_ENABLED or not file_data.get('id'):
+        return
+    content = file_data.get('extracted_text')
+    if content is not None:
+        get_speculative_generator().schedule(user_id, file_data['id'], content)
+        return
+    # Deduplicated upload: the text lives on the shared blob, so load it in
+    # the background rather than on the response path
+    task = asyncio.create_task(_load_and_schedule(processor, file_data['id'], user_id))
+    _speculative_loads.add(task)
+    task.add_done_callback(_speculative_loads.discard)
+
+
+def file_response(file_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": file_data.get('id'),
+        "filename": file_data.get('filename'),
+        "file_size": file_data.get('file_size'),
+        "file_type": file_data.get('file_type'),
+        "timings": file_data.get('timings')
+    }
+
+
 @router.post("/file")
 async def upload_file(
     file: UploadFile = File(...),
@@ -19,42 +79,25 @@ async def upload_file(
 ):
     """Upload and process a file (PDF, DOCX, TXT, MD)."""
     try:
-        # Validate file size first (read content only once)
-        content = await file.read()
-        if len(content) > settings.MAX_UPLOAD_SIZE:
-            raise HTTPException(
-                status_code=413,  # Payload Too Large
-                detail=f"File exceeds maximum size of {settings.MAX_UPLOAD_SIZE / 1024 / 1024:.1f} MB"
-            )
-
         # Sanitize filename and validate extension
-        safe_filename = sanitize_filename(file.filename)
-        file_ext = os.path.splitext(safe_filename)[1].lower()
+        safe_filename = validate_extension(file.filename)
 
-        if file_ext not in settings.ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,  # Bad Request
-                detail=f"Invalid file type '{file_ext}'. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+        # Copy to a spool file in chunks, rejecting oversize files part-way;
+        # extraction and storage then stream from disk
+        with await spool_upload(file, safe_filename) as upload:
+            processor = FileProcessor()
+            file_data = await processor.process_file(
+                upload=upload,
+                filename=safe_filename,
+                user_id=user_id
             )
 
-        # Process file using the correct service
-        processor = FileProcessor()
-        file_data = await processor.process_file(
-            file_content=content,
-            filename=safe_filename,
-            user_id=user_id
-        )
-
         logger.info(f"File uploaded and processed: {file_data.get('id', 'N/A')}")
+
+        schedule_speculative(processor, file_data, user_id)
+
         # Return wrapped in "data" to match frontend expectation
-        return {
-            "data": {
-                "id": file_data.get('id'),
-                "filename": file_data.get('filename'),
-                "file_size": file_data.get('file_size'),
-                "file_type": file_data.get('file_type')
-            }
-        }
+        return {"data": file_response(file_data)}
 
     except HTTPException:
         raise
@@ -66,4 +109,172 @@ async def upload_file(
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred during file upload."
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/files")
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Upload several files in one request. Each file is spooled to disk, then
+    extracted and stored concurrently (UPLOAD_BATCH_CONCURRENCY at a time).
+    Per-file results stream back as server-sent events in completion order;
+    a failed file doesn't fail the batch.
+    """
+    if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.UPLOAD_BATCH_MAX_FILES} files can be uploaded at once"
+        )
+
+    # Spool before responding: the multipart files are closed once this handler returns
+    spooled: List[Tuple[int, str, Any]] = []
+    for index, file in enumerate(files):
+        try:
+            safe_filename = validate_extension(file.filename)
+            spooled.append((index, safe_filename, await spool_upload(file, safe_filename)))
+        except HTTPException as e:
+            spooled.append((index, file.filename or "", e))
+        except Exception as e:
+            logger.error(f"Spooling failed for batch file '{file.filename}': {repr(e)}", exc_info=True)
+            spooled.append((index, file.filename or "", HTTPException(status_code=500, detail="Failed to read file")))
+
+    processor = FileProcessor()
+    semaphore = asyncio.Semaphore(settings.UPLOAD_BATCH_CONCURRENCY)
+
+    async def process(index: int, filename: str, upload: Any) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"index": index, "filename": filename}
+        if isinstance(upload, HTTPException):
+            return {**result, "status": "error", "status_code": upload.status_code, "detail": upload.detail}
+        try:
+            async with semaphore:
+                file_data = await processor.process_file(upload=upload, filename=filename, user_id=user_id)
+            schedule_speculative(processor, file_data, user_id)
+            return {**result, "status": "ok", "data": file_response(file_data)}
+        except HTTPException as e:
+            return {**result, "status": "error", "status_code": e.status_code, "detail": e.detail}
+        except Exception as e:
+            logger.error(f"Batch upload error for file '{filename}': {repr(e)}", exc_info=True)
+            return {**result, "status": "error", "status_code": 500, "detail": "An unexpected error occurred during file upload."}
+        finally:
+            upload.cleanup()
+
+    async def event_generator():
+        tasks = [asyncio.create_task(process(*item)) for item in spooled]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += result["status"] == "ok"
+                yield f"data: {json.dumps(result)}\n\n"
+            logger.info(f"Batch upload by user {user_id}: {succeeded}/{len(tasks)} files processed")
+            yield f"data: {json.dumps({'done': True, 'succeeded': succeeded, 'failed': len(tasks) - succeeded})}\n\n"
+        finally:
+            # Client went away: stop queued work and remove the spool files
+            for task in tasks:
+                task.cancel()
+            for _, _, upload in spooled:
+                if isinstance(upload, SpooledUpload):
+                    upload.cleanup()
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.post("/sessions")
+async def create_upload_session(
+    session: UploadSessionCreate,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Start a resumable upload for a large document. PUT each part to
+    /sessions/{upload_id}/parts/{n} (any order, retries overwrite), then
+    POST /sessions/{upload_id}/complete.
+    """
+    safe_filename = validate_extension(session.filename)
+    result = await get_upload_session_store().init(user_id, safe_filename, session.total_size, session.part_size)
+    return {"data": result}
+
+
+@router.put("/sessions/{upload_id}/parts/{part_number}")
+async def upload_session_part(
+    request: Request,
+    upload_id: str,
+    part_number: int = Path(..., ge=1),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Raw request body is the part's bytes; streamed to the session's spool directory."""
+    result = await get_upload_session_store().write_part(upload_id, user_id, part_number, request.stream())
+    return {"data": result}
+
+
+@router.get("/sessions/{upload_id}")
+async def get_upload_session(
+    upload_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Received and missing parts, for resuming after a dropped connection."""
+    return {"data": await get_upload_session_store().status(upload_id, user_id)}
+
+
+@router.post("/sessions/{upload_id}/complete")
+async def complete_upload_session(
+    upload_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Assemble the parts and process the file like a regular upload. Safe to
+    retry: a completed session returns the file it already produced.
+    """
+    processor = FileProcessor()
+    processed: Dict[str, Any] = {}
+
+    async def process(upload: SpooledUpload) -> Dict[str, Any]:
+        file_data = await processor.process_file(upload=upload, filename=upload.filename, user_id=user_id)
+        processed.update(file_data)
+        return file_response(file_data)
+
+    result = await get_upload_session_store().complete(upload_id, user_id, process)
+    if processed:
+        logger.info(f"Resumable upload {upload_id} processed: {processed.get('id', 'N/A')}")
+        schedule_speculative(processor, processed, user_id)
+    return {"data": result}
+
+
+@router.delete("/sessions/{upload_id}")
+async def abort_upload_session(
+    upload_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    await get_upload_session_store().abort(upload_id, user_id)
+    return {"data": {"upload_id": upload_id, "aborted": True}}
+
+
+@router.get("/file/{file_id}/text")
+async def get_file_text(
+    file_id: str,
+    start: Optional[int] = Query(None, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    page_start: Optional[int] = Query(None, ge=1),
+    page_end: Optional[int] = Query(None, ge=1),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Extracted text of a file, optionally limited to a character range
+    [start, end) or a 1-based page range (PDFs only).
+    """
+    processor = FileProcessor()
+    result = await processor.get_file_text(file_id, user_id, start, end, page_start, page_end)
+    return {"data": result}
+
+
+@router.delete("/file/{file_id}")
+async def delete_file(
+    file_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Delete an uploaded file. Shared storage is kept while other uploads reference it."""
+    processor = FileProcessor()
+    result = await processor.delete_file(file_id, user_id)
+    return {"data": result}
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional, List # Import List
+from typing import Optional, List, Dict
 
 class Settings(BaseSettings):
     # App Settings
@@ -33,17 +33,108 @@ class Settings(BaseSettings):
     MEM0_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
 
+    # --- Sharded generation across providers ---
+    # Extra "provider:model" entries that lesson generation spreads chunk
+    # work across, e.g. ["groq:llama-3.1-8b-instant", "google:gemini-2.0-flash"].
+    # Keys come from LLM_API_KEY for the primary provider, otherwise from
+    # GEMINI_API_KEY / GROQ_API_KEY / OPENROUTER_API_KEY.
+    LLM_SHARDING_ENABLED: bool = True
+    LLM_SHARD_PROVIDERS: List[str] = []
+    GROQ_API_KEY: Optional[str] = None
+    OPENROUTER_API_KEY: Optional[str] = None
+    # Concurrent chunk jobs per provider; keys are "provider" or "provider:model"
+    LLM_DEFAULT_CONCURRENCY: int = 3
+    LLM_PROVIDER_CONCURRENCY: Dict[str, int] = {}
+    LLM_PROVIDER_COOLDOWN_SECONDS: float = 10.0
+    LLM_DEFAULT_JOB_LATENCY_SECONDS: float = 8.0  # Used until latency has been observed
+    LLM_JOB_MAX_ATTEMPTS: int = 2
+    # USD per million tokens, used by /generate/estimate,
+    # e.g. {"llama-3.1-8b-instant": {"input": 0.05, "output": 0.08}}
+    LLM_MODEL_PRICES: Dict[str, Dict[str, float]] = {}
+
+    # Ask the LLM once per chunk to replace questions that fail validation
+    QUESTION_REPAIR_ENABLED: bool = True
+
     # General LLM Settings (can still be used)
     MAX_TOKENS: int = 2048
     TEMPERATURE: float = 0.7
 
+    # Token budgeting: prompts larger than the model's input budget are
+    # compacted/trimmed before they are sent.
+    LLM_INPUT_TOKEN_BUDGET: int = 12000
+    LLM_MODEL_INPUT_BUDGETS: Dict[str, int] = {}  # e.g. {"llama3-8b-8192": 6000}
+
+    # Provider-side prompt prefix caching (Gemini explicit caches, OpenRouter cache_control)
+    PROMPT_CACHE_ENABLED: bool = True
+    PROMPT_CACHE_TTL_SECONDS: int = 600
+    PROMPT_CACHE_MIN_TOKENS: int = 1024  # Providers reject/ignore smaller prefixes
+    # Per "provider:model" or "provider" minimum, e.g. {"google:gemini-2.5-pro": 4096}
+    PROMPT_CACHE_MIN_TOKENS_BY_MODEL: Dict[str, int] = {}
+    # Chunk tasks send the whole document as one shared cached prefix (and
+    # name their chunk in the task suffix) when the document clears the
+    # cache minimum and is at most this size; otherwise each chunk is its own prefix
+    PROMPT_CACHE_SHARED_PREFIX_MAX_TOKENS: int = 8000
+
+    # Chunking (sizes in tokens; ~4 characters per token for English text)
+    CHUNK_MAX_TOKENS: int = 400
+    CHUNK_OVERLAP_TOKENS: int = 50
+
+    # Local concept index built for every lesson
+    CONCEPTS_PER_LESSON: int = 15
+
     # Vector Store
     VECTOR_DB_PATH: str = "./data/chromadb"
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
 
+    # Speculative pre-generation of the default lesson right after upload
+    SPECULATIVE_GENERATION_ENABLED: bool = False
+    SPECULATIVE_MAX_CONCURRENT: int = 1
+    SPECULATIVE_USER_BUDGET: int = 3  # runs per user per window
+    SPECULATIVE_BUDGET_WINDOW_SECONDS: int = 3600
+    SPECULATIVE_IDLE_WAIT_SECONDS: int = 60
+    SPECULATIVE_RESULT_TTL_SECONDS: int = 1800
+    SPECULATIVE_MAX_RESULTS: int = 100
+
+    # Near-duplicate removal across chunk outputs (cosine similarity on embeddings)
+    DEDUPE_ENABLED: bool = True
+    DEDUPE_SIMILARITY_THRESHOLD: float = 0.9
+
     # File Upload
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = [".pdf", ".docx", ".txt", ".md"] # Use List type hint
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes read per step while spooling to disk
+    UPLOAD_SPOOL_DIR: Optional[str] = None  # temp dir for spooled uploads (system default if unset)
+    UPLOAD_BATCH_MAX_FILES: int = 20
+    UPLOAD_BATCH_CONCURRENCY: int = 4  # files of one batch processed at a time
+
+    # Resumable uploads (init / PUT parts / complete) for large documents
+    UPLOAD_RESUMABLE_MAX_SIZE: int = 200 * 1024 * 1024
+    UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+    UPLOAD_MIN_PART_SIZE: int = 1024 * 1024
+    UPLOAD_MAX_PART_SIZE: int = 64 * 1024 * 1024
+    UPLOAD_SESSION_DIR: Optional[str] = None  # system temp dir if unset
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 3600  # since the last part
+
+    # PDF/DOCX text extraction process pool
+    EXTRACTION_MAX_WORKERS: int = 2
+    EXTRACTION_MAX_QUEUE: int = 8  # waiting documents beyond busy workers before 503
+    EXTRACTION_TIMEOUT_SECONDS: int = 120
+    PDF_ENGINE: str = "PyPDF2"  # or "pypdf"
+    PDF_PAGES_PER_SHARD: int = 25  # pages per worker task for parallel PDF extraction
+
+    # Compressed extracted-text store (file_text_blocks) and its decompressed LRU
+    TEXT_BLOCK_CHARS: int = 64 * 1024
+    TEXT_COMPRESSION_LEVEL: int = 6  # zlib 1-9
+    TEXT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    TEXT_CACHE_TTL_SECONDS: int = 3600
+
+    # Thread pool for blocking supabase-py calls (see app/database/executor.py)
+    DB_MAX_WORKERS: int = 16
+    DB_SLOW_QUERY_MS: int = 1000  # log database calls slower than this; 0 disables
+
+    # Read-through cache of assembled lessons and answer keys (per process)
+    LESSON_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    LESSON_CACHE_TTL_SECONDS: int = 300
 
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [ # Use List type hint
@@ -51,6 +142,10 @@ class Settings(BaseSettings):
         "http://localhost:8000",
     ]
 
+    # Idempotency-Key replay store for POST /generate/ and /quizzes/submit
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 1000
+
     # Rate Limiting (Optional - Not currently implemented in routes)
     RATE_LIMIT_PER_MINUTE: int = 60
 
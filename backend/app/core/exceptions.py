@@ -36,4 +36,9 @@ class ValidationError(QuizCraftException):
 class LLMServiceError(QuizCraftException):
     """Raised when LLM service fails."""
     def __init__(self, message: str = "LLM service error"):
-        super().__init__(message, status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        super().__init__(message, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class LLMProviderError(LLMServiceError):
+    """Raised when the LLM provider's API fails (rate limits, outages), as opposed to bad output."""
+    def __init__(self, message: str = "LLM provider error"):
+        super().__init__(message)
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.utils.cache import TTLCache
+
+logger = get_logger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+_detached: Set[asyncio.Task] = set()
+
+
+def detach(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """
+    Start a side effect of shared idempotent work as its own task.
+
+    The work may be answering several requests, so its side effects can't be
+    tied to any one request's BackgroundTasks: those run only for the request
+    that queued them, and not at all if that client disconnected.
+    """
+    task = asyncio.create_task(coro)
+    _detached.add(task)
+    task.add_done_callback(_detached.discard)
+    return task
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    """Hash of the request body, so a key can't be reused for a different request."""
+    return hashlib.sha256(payload.model_dump_json().encode('utf-8')).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Deduplicates retried mutating requests that carry an Idempotency-Key.
+
+    A retry while the original is still running attaches to the same work
+    (the work runs as its own task, so it survives the original client
+    disconnecting); a retry after it finished replays the stored response
+    from a bounded TTL cache. Failed requests are not stored, so they can be
+    retried. Keys are scoped per endpoint and user and held in process
+    memory only.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._completed: TTLCache[Tuple[str, Any]] = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._in_flight: Dict[Tuple[str, str, str], Tuple[str, asyncio.Task]] = {}
+        self.replays = 0
+        self.attached = 0
+
+    async def run(
+        self,
+        scope: str,
+        user_id: str,
+        key: Optional[str],
+        fingerprint: str,
+        func: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Run func once per (scope, user, key); returns (result, replayed)."""
+        if not key:
+            return await func(), False
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"
+            )
+
+        store_key = (scope, user_id, key)
+        stored = self._completed.get(store_key)
+        if stored is not None:
+            self._check_fingerprint(stored[0], fingerprint)
+            self.replays += 1
+            logger.info(f"Replaying stored response for {scope} idempotency key {key}")
+            return stored[1], True
+
+        in_flight = self._in_flight.get(store_key)
+        if in_flight is not None:
+            self._check_fingerprint(in_flight[0], fingerprint)
+            self.attached += 1
+            logger.info(f"Attaching retry to in-flight {scope} request with idempotency key {key}")
+            return await asyncio.shield(in_flight[1]), True
+
+        task = asyncio.create_task(func())
+        self._in_flight[store_key] = (fingerprint, task)
+
+        def on_done(done: asyncio.Task) -> None:
+            self._in_flight.pop(store_key, None)
+            if not done.cancelled() and done.exception() is None:
+                self._completed.set(store_key, (fingerprint, done.result()))
+
+        task.add_done_callback(on_done)
+        # Shielded: if this client goes away, a retry can still pick up the result
+        return await asyncio.shield(task), False
+
+    @staticmethod
+    def _check_fingerprint(expected: str, actual: str) -> None:
+        if expected != actual:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"{IDEMPOTENCY_HEADER} was already used for a different request"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': len(self._in_flight),
+            'replays': self.replays,
+            'attached': self.attached,
+            **self._completed.stats(),
+        }
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES
+)
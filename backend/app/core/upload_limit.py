@@ -0,0 +1,55 @@
+from typing import Dict
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def _too_large_detail(limit: int) -> str:
+    return f"Upload exceeds maximum size of {limit / 1024 / 1024:.1f} MB"
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversize uploads with 413 before their body is parsed.
+
+    limits maps a POST path to its maximum file size; overhead allows for
+    the multipart framing around the file. A Content-Length over the limit
+    is rejected without reading the body. Chunked bodies have no length up
+    front, so the raw stream is counted as it is received and the request
+    fails as soon as it passes the limit, rather than after multipart
+    parsing has written it all to disk.
+    """
+
+    def __init__(self, app: ASGIApp, limits: Dict[str, int], overhead: int = 0):
+        self.app = app
+        self.limits = limits
+        self.overhead = overhead
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits[scope["path"]]
+        max_body = limit + self.overhead
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body:
+            response = JSONResponse(status_code=413, content={"detail": _too_large_detail(limit)})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # Raised inside body parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=_too_large_detail(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    """
+    Runs blocking supabase-py calls (PostgREST queries, RPCs, auth) on a
+    dedicated, bounded thread pool so a database round trip never blocks the
+    event loop. The pool is kept separate from the default executor, which
+    also serves asyncio.to_thread file and CPU work. Each client reuses one
+    pooled httpx connection pool, so keeping max_workers within its
+    keep-alive limit (20) lets every worker hold a warm connection; calls
+    beyond the worker count queue in order instead of opening new ones.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, slow_query_ms: Optional[int] = None):
+        self.max_workers = max_workers or settings.DB_MAX_WORKERS
+        self.slow_query_ms = settings.DB_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.slow = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call fn(*args, **kwargs) on the database pool and await its result."""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        started = submitted
+
+        def call() -> T:
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args, **kwargs)
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            result = await loop.run_in_executor(self._get_pool(), call)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            finished = time.perf_counter()
+            wait_ms = (started - submitted) * 1000
+            run_ms = (finished - started) * 1000
+            self.total_wait_ms += wait_ms
+            self.total_run_ms += run_ms
+            if self.slow_query_ms and run_ms > self.slow_query_ms:
+                self.slow += 1
+                name = getattr(fn, '__qualname__', repr(fn))
+                logger.warning(f"Slow database call {name}: {run_ms:.0f}ms (queued {wait_ms:.0f}ms)")
+
+    async def execute(self, query: Any) -> Any:
+        """Execute a supabase-py query or RPC builder on the database pool."""
+        return await self.run(query.execute)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.completed + self.failed
+        return {
+            'max_workers': self.max_workers,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'slow': self.slow,
+            'avg_wait_ms': round(self.total_wait_ms / calls, 2) if calls else 0.0,
+            'avg_run_ms': round(self.total_run_ms / calls, 2) if calls else 0.0,
+        }
+
+
+@lru_cache()
+def get_db_executor() -> DatabaseExecutor:
+    return DatabaseExecutor()
+
+
+async def db_execute(query: Any) -> Any:
+    """Shorthand for get_db_executor().execute(query)."""
+    return await get_db_executor().execute(query)
+
+
+async def db_run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Shorthand for get_db_executor().run(fn, ...), e.g. for supabase.auth calls."""
+    return await get_db_executor().run(fn, *args, **kwargs)
@@ -1,4 +1,4 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from app.core.config import settings
 from functools import lru_cache
 
@@ -21,5 +21,18 @@ def get_supabase_admin_client() -> Client:
     )
 
 
+def create_auth_client() -> Client:
+    """
+    New anon client for one sign-up, sign-in or session refresh. Those calls
+    store the session on the client and switch its requests to the user's
+    token, so they must not run on the shared client.
+    """
+    return create_client(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_KEY,
+        options=ClientOptions(persist_session=False, auto_refresh_token=False)
+    )
+
+
 supabase = get_supabase_client()
 supabase_admin = get_supabase_admin_client()
\ No newline at end of file
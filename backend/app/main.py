@@ -7,6 +7,9 @@ import time
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.exceptions import QuizCraftException
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.database.executor import get_db_executor
+from app.services.content.extraction import get_extraction_executor
 # This line has been updated with the new routes
 from app.api.v1.routes import (
     auth,
@@ -32,6 +35,8 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     logger.info("Shutting down application")
+    get_extraction_executor().shutdown()
+    get_db_executor().shutdown()
 
 
 app = FastAPI(
@@ -52,6 +57,20 @@ app.add_middleware(
 )
 
 
+# Multipart framing around the file itself
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+
+UPLOAD_SIZE_LIMITS = {
+    f"{settings.API_V1_PREFIX}/upload/file": settings.MAX_UPLOAD_SIZE,
+    f"{settings.API_V1_PREFIX}/upload/files": settings.MAX_UPLOAD_SIZE * settings.UPLOAD_BATCH_MAX_FILES,
+}
+
+
+# Reject oversize uploads before the body is parsed, chunked ones included
+app.add_middleware(UploadSizeLimitMiddleware, limits=UPLOAD_SIZE_LIMITS, overhead=UPLOAD_OVERHEAD_BYTES)
+
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -0,0 +1,85 @@
+from typing import List, Dict, Any, Optional
+from app.database.supabase_client import supabase_admin
+from app.database.executor import db_execute
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ConceptRepository:
+    """Repository for the per-user concept -> lessons/questions index."""
+
+    async def replace_lesson_concepts(
+        self,
+        user_id: str,
+        lesson_id: str,
+        concepts: List[Dict[str, Any]]
+    ) -> None:
+        """Store a lesson's concepts, replacing any previous index rows."""
+        try:
+            await db_execute(supabase_admin.table('lesson_concepts').delete().eq('lesson_id', lesson_id))
+            if not concepts:
+                return
+            rows = [
+                {
+                    'user_id': user_id,
+                    'lesson_id': lesson_id,
+                    'concept': concept['concept'],
+                    'weight': concept.get('weight', 0),
+                    'question_ids': concept.get('question_ids', []),
+                }
+                for concept in concepts
+            ]
+            await db_execute(supabase_admin.table('lesson_concepts').insert(rows))
+        except Exception as e:
+            logger.error(f"Replace lesson concepts error: {str(e)}")
+            raise
+
+    async def get_lesson_concepts(self, lesson_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Get a lesson's concepts, strongest first."""
+        try:
+            result = await db_execute(
+                supabase_admin.table('lesson_concepts').select('concept, weight, question_ids')
+                .eq('lesson_id', lesson_id).eq('user_id', user_id)
+                .order('weight', desc=True)
+            )
+            return result.data
+        except Exception as e:
+            logger.error(f"Get lesson concepts error: {str(e)}")
+            raise
+
+    async def search_concepts(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Find the user's lessons and questions for concepts matching query."""
+        try:
+            # Escape LIKE wildcards so the query is matched literally
+            pattern = query.strip().lower().replace('%', r'\%').replace('_', r'\_')
+            result = await db_execute(
+                supabase_admin.table('lesson_concepts')
+                .select('concept, weight, lesson_id, question_ids, lessons(title)')
+                .eq('user_id', user_id).ilike('concept', f"%{pattern}%")
+                .order('weight', desc=True).limit(limit)
+            )
+            return result.data
+        except Exception as e:
+            logger.error(f"Search concepts error: {str(e)}")
+            raise
+
+    async def get_user_concepts(
+        self,
+        user_id: str,
+        lesson_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get every concept row for a user, optionally for one lesson."""
+        try:
+            query = supabase_admin.table('lesson_concepts').select('concept, lesson_id, question_ids').eq('user_id', user_id)
+            if lesson_id:
+                query = query.eq('lesson_id', lesson_id)
+            return (await db_execute(query)).data
+        except Exception as e:
+            logger.error(f"Get user concepts error: {str(e)}")
+            raise
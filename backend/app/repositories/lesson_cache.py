@@ -0,0 +1,128 @@
+import copy
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+# Lessons whose last invalidation is remembered individually; older ones
+# fall back to a conservative floor
+MAX_TRACKED_INVALIDATIONS = 10000
+
+
+def approx_size(value: Any) -> int:
+    """Approximate in-memory footprint of a JSON-like value (its serialized length)."""
+    return len(json.dumps(value, default=str))
+
+
+def answer_key_from_questions(questions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """question id -> the fields needed to grade an answer."""
+    return {
+        q['id']: {'correct_answer': q.get('correct_answer') or '', 'explanation': q.get('explanation')}
+        for q in questions
+    }
+
+
+class LessonCache:
+    """
+    In-process read-through cache for assembled lessons (lesson row plus
+    questions, flashcards and notes) and their answer keys, bounded by bytes
+    with a TTL. Entries are keyed by lesson id and remember their owner, so
+    a lookup by another user is a miss.
+
+    Writers call invalidate(). Readers note the epoch before fetching and
+    pass it when storing; a fill is dropped if its lesson was invalidated
+    after that, so an in-flight read can't put stale content back, while
+    fills of other lessons are unaffected. Other worker processes only see
+    a write once their entry expires, which bounds staleness to the TTL.
+
+    Entries are copied in and out, so callers can modify what they get
+    without touching the cache.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        ttl_seconds = ttl_seconds or settings.LESSON_CACHE_TTL_SECONDS
+        max_bytes = max_bytes or settings.LESSON_CACHE_MAX_BYTES
+        self._lessons: TTLCache[Dict[str, Any]] = TTLCache(
+            ttl_seconds=ttl_seconds, max_bytes=max_bytes, sizeof=approx_size
+        )
+        # Answer keys are small; give them a slice of the budget so big lessons can't evict them
+        self._answer_keys: TTLCache[Dict[str, Any]] = TTLCache(
+            ttl_seconds=ttl_seconds, max_bytes=max(1, max_bytes // 8), sizeof=approx_size
+        )
+        # Bumped by every invalidation; a reader's snapshot of it is its epoch
+        self.epoch = 0
+        # lesson id -> epoch of its latest invalidation, oldest first
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        # Fills from before this epoch are dropped for every lesson
+        self._floor = 0
+
+    def _is_stale(self, lesson_id: str, epoch: Optional[int]) -> bool:
+        if epoch is None:
+            return False
+        return epoch < self._floor or epoch < self._invalidated.get(lesson_id, 0)
+
+    def get_lesson(self, lesson_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        lesson = self._lessons.get(lesson_id)
+        if lesson is None or lesson.get('user_id') != user_id:
+            return None
+        return copy.deepcopy(lesson)
+
+    def set_lesson(self, lesson: Dict[str, Any], epoch: Optional[int] = None) -> None:
+        if self._is_stale(lesson['id'], epoch):
+            return
+        self._lessons.set(lesson['id'], copy.deepcopy(lesson))
+
+    def get_answer_key(self, lesson_id: str, user_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        entry = self._answer_keys.get(lesson_id)
+        if entry is not None and entry['user_id'] == user_id:
+            return copy.deepcopy(entry['questions'])
+        lesson = self.get_lesson(lesson_id, user_id)
+        if lesson is None:
+            return None
+        answer_key = answer_key_from_questions(lesson.get('questions') or [])
+        self.set_answer_key(lesson_id, user_id, answer_key)
+        return answer_key
+
+    def set_answer_key(
+        self,
+        lesson_id: str,
+        user_id: str,
+        answer_key: Dict[str, Dict[str, Any]],
+        epoch: Optional[int] = None
+    ) -> None:
+        if self._is_stale(lesson_id, epoch):
+            return
+        self._answer_keys.set(lesson_id, {'user_id': user_id, 'questions': copy.deepcopy(answer_key)})
+
+    def invalidate(self, lesson_id: str) -> None:
+        self.epoch += 1
+        self._invalidated[lesson_id] = self.epoch
+        self._invalidated.move_to_end(lesson_id)
+        while len(self._invalidated) > MAX_TRACKED_INVALIDATIONS:
+            _, forgotten = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, forgotten)
+        self._lessons.pop(lesson_id)
+        self._answer_keys.pop(lesson_id)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._floor = self.epoch
+        self._invalidated.clear()
+        self._lessons.clear()
+        self._answer_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'lessons': self._lessons.stats(),
+            'answer_keys': self._answer_keys.stats(),
+            'epoch': self.epoch,
+            'tracked_invalidations': len(self._invalidated),
+        }
+
+
+@lru_cache()
+def get_lesson_cache() -> LessonCache:
+    return LessonCache()
@@ -1,6 +1,8 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from app.database.supabase_client import supabase, supabase_admin
+from app.database.executor import db_execute
+from app.repositories.lesson_cache import answer_key_from_questions, get_lesson_cache
 from app.core.logging import get_logger
 import uuid
 import asyncio
@@ -9,7 +11,10 @@ logger = get_logger(__name__)
 
 
 class LessonRepository:
-    """Repository for lesson data access."""
+    """Repository for lesson data access. Lesson reads go through the shared LessonCache."""
+
+    def __init__(self):
+        self.cache = get_lesson_cache()
     
     async def create_lesson(
         self,
@@ -30,7 +35,7 @@ class LessonRepository:
                 'updated_at': datetime.utcnow().isoformat()
             }
             
-            result = supabase_admin.table('lessons').insert(lesson_data).execute()
+            result = await db_execute(supabase_admin.table('lessons').insert(lesson_data))
             return result.data[0]
             
         except Exception as e:
@@ -46,63 +51,126 @@ class LessonRepository:
         study_notes: str,
         description: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Create lesson with generated content."""
+        """
+        Create lesson with generated content. The lesson, questions,
+        flashcards and notes are written by one transactional RPC, which
+        returns the assembled lesson so it doesn't have to be read back.
+        """
         try:
-            # Create lesson
-            lesson = await self.create_lesson(user_id, title, description)
-            lesson_id = lesson['id']
-            
-            # Add questions
-            for q in questions:
-                question_data = {
-                    'id': str(uuid.uuid4()),
-                    'lesson_id': lesson_id,
-                    'question_text': q.get('question_text'),
-                    'question_type': q.get('question_type', 'multiple_choice'),
-                    'difficulty': q.get('difficulty', 'medium'),
-                    'bloom_level': q.get('bloom_level', 'understand'),
-                    'correct_answer': q.get('correct_answer'),
-                    'explanation': q.get('explanation', ''),
-                    'options': q.get('options', []),
-                    'points': 1
-                }
-                supabase_admin.table('questions').insert(question_data).execute()
-            
-            # Add flashcards
-            for fc in flashcards:
-                flashcard_data = {
-                    'id': str(uuid.uuid4()),
-                    'lesson_id': lesson_id,
-                    'front': fc.get('front'),
-                    'back': fc.get('back'),
-                    'confidence_level': 0
-                }
-                supabase_admin.table('flashcards').insert(flashcard_data).execute()
-            
-            # Add study notes
-            notes_data = {
+            now = datetime.utcnow().isoformat()
+            lesson_data = {
                 'id': str(uuid.uuid4()),
-                'lesson_id': lesson_id,
-                'content': study_notes
+                'user_id': user_id,
+                'title': title,
+                'description': description,
+                'folder_id': None,
+                'created_at': now,
+                'updated_at': now
             }
-            supabase_admin.table('study_notes').insert(notes_data).execute()
-            
-            # Get complete lesson
-            return await self.get_lesson_by_id(lesson_id, user_id)
+            question_rows, flashcard_rows = self._content_rows(lesson_data['id'], questions, flashcards)
+
+            result = await db_execute(
+                supabase_admin.rpc('create_lesson_with_content', {
+                    'p_lesson': lesson_data,
+                    'p_questions': question_rows,
+                    'p_flashcards': flashcard_rows,
+                    'p_study_notes': study_notes
+                })
+            )
+            logger.info(
+                f"Lesson created: {lesson_data['id']} with {len(question_rows)} questions "
+                f"and {len(flashcard_rows)} flashcards"
+            )
+            self.cache.set_lesson(result.data)
+            return result.data
             
         except Exception as e:
             logger.error(f"Create lesson with content error: {str(e)}")
             raise
     
+    @staticmethod
+    def _content_rows(
+        lesson_id: str,
+        questions: List[Dict[str, Any]],
+        flashcards: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Question and flashcard rows for a lesson, with ids and defaults filled in."""
+        question_rows = [
+            {
+                'id': str(uuid.uuid4()),
+                'lesson_id': lesson_id,
+                'question_text': q.get('question_text'),
+                'question_type': q.get('question_type', 'multiple_choice'),
+                'difficulty': q.get('difficulty', 'medium'),
+                'bloom_level': q.get('bloom_level', 'understand'),
+                'correct_answer': q.get('correct_answer'),
+                'explanation': q.get('explanation', ''),
+                'options': q.get('options', []),
+                'points': 1
+            }
+            for q in questions
+        ]
+        flashcard_rows = [
+            {
+                'id': str(uuid.uuid4()),
+                'lesson_id': lesson_id,
+                'front': fc.get('front'),
+                'back': fc.get('back'),
+                'confidence_level': 0
+            }
+            for fc in flashcards
+        ]
+        return question_rows, flashcard_rows
+
+    async def replace_lesson_content(
+        self,
+        lesson_id: str,
+        questions: List[Dict[str, Any]],
+        flashcards: List[Dict[str, Any]],
+        study_notes: str
+    ) -> None:
+        """
+        Swap in newly generated content for a lesson (e.g. LLM output replacing
+        fast-mode items). Questions that already have quiz attempts and
+        flashcards already under review are kept; the new items are added
+        alongside them. Runs as one transactional RPC, so readers never see
+        the lesson half replaced.
+        """
+        try:
+            question_rows, flashcard_rows = self._content_rows(lesson_id, questions, flashcards)
+            result = await db_execute(
+                supabase_admin.rpc('replace_lesson_content', {
+                    'p_lesson_id': lesson_id,
+                    'p_questions': question_rows,
+                    'p_flashcards': flashcard_rows,
+                    'p_study_notes': study_notes
+                })
+            )
+            if not result.data:
+                logger.warning(f"Lesson {lesson_id} no longer exists; generated content discarded")
+                return
+            logger.info(f"Lesson content replaced: {lesson_id}")
+
+        except Exception as e:
+            logger.error(f"Replace lesson content error: {str(e)}")
+            raise
+        finally:
+            self.cache.invalidate(lesson_id)
+    
     async def get_lesson_by_id(
         self,
         lesson_id: str,
         user_id: str
     ) -> Optional[Dict[str, Any]]:
-        """Get lesson by ID with all associated content."""
+        """Get lesson by ID with all associated content. Served from the lesson cache when possible."""
         try:
+            cached = self.cache.get_lesson(lesson_id, user_id)
+            if cached is not None:
+                return cached
+            epoch = self.cache.epoch
+
             # 1. Fetch the main lesson record first to ensure it exists and the user has access.
-            lesson_result = supabase_admin.table('lessons').select('*').eq('id', lesson_id).eq('user_id', user_id).execute()
+            lesson_result = await db_execute(supabase_admin.table('lessons').select('*').eq('id', lesson_id).eq('user_id', user_id))
             
             if not lesson_result.data:
                 return None
@@ -111,14 +179,14 @@ class LessonRepository:
             
             # 2. Fetch all related content in parallel using asyncio.gather.
             # This reduces the total wait time from (A + B + C) to max(A, B, C).
-            questions_future = asyncio.to_thread(
-                lambda: supabase_admin.table('questions').select('*').eq('lesson_id', lesson_id).execute()
+            questions_future = db_execute(
+                supabase_admin.table('questions').select('*').eq('lesson_id', lesson_id)
             )
-            flashcards_future = asyncio.to_thread(
-                lambda: supabase_admin.table('flashcards').select('*').eq('lesson_id', lesson_id).execute()
+            flashcards_future = db_execute(
+                supabase_admin.table('flashcards').select('*').eq('lesson_id', lesson_id)
             )
-            notes_future = asyncio.to_thread(
-                lambda: supabase_admin.table('study_notes').select('*').eq('lesson_id', lesson_id).execute()
+            notes_future = db_execute(
+                supabase_admin.table('study_notes').select('*').eq('lesson_id', lesson_id)
             )
 
             # Wait for all queries to complete
@@ -131,11 +199,43 @@ class LessonRepository:
             lesson['flashcards'] = flashcards_result.data
             lesson['study_notes'] = notes_result.data[0]['content'] if notes_result.data else ""
             
+            self.cache.set_lesson(lesson, epoch)
             return lesson
             
         except Exception as e:
             logger.error(f"Get lesson error: {str(e)}")
             raise
+
+    async def get_answer_key(
+        self,
+        lesson_id: str,
+        user_id: str
+    ) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        question id -> {'correct_answer', 'explanation'} for grading, or None
+        if the lesson doesn't exist, isn't the user's or has no questions.
+        Reads only those columns instead of assembling the whole lesson.
+        """
+        try:
+            cached = self.cache.get_answer_key(lesson_id, user_id)
+            if cached is not None:
+                return cached or None
+            epoch = self.cache.epoch
+
+            result = await db_execute(
+                supabase_admin.table('questions').select('id, correct_answer, explanation, lessons!inner(user_id)')
+                .eq('lesson_id', lesson_id).eq('lessons.user_id', user_id)
+            )
+            if not result.data:
+                return None
+
+            answer_key = answer_key_from_questions(result.data)
+            self.cache.set_answer_key(lesson_id, user_id, answer_key, epoch)
+            return answer_key
+
+        except Exception as e:
+            logger.error(f"Get answer key error: {str(e)}")
+            raise
     
     async def get_user_lessons(
         self,
@@ -151,7 +251,7 @@ class LessonRepository:
             if folder_id:
                 query = query.eq('folder_id', folder_id)
             
-            result = query.order('created_at', desc=True).range(skip, skip + limit - 1).execute()
+            result = await db_execute(query.order('created_at', desc=True).range(skip, skip + limit - 1))
             
             return result.data
             
@@ -168,7 +268,8 @@ class LessonRepository:
         """Update a lesson."""
         try:
             data['updated_at'] = datetime.utcnow().isoformat()
-            result = supabase_admin.table('lessons').update(data).eq('id', lesson_id).eq('user_id', user_id).execute()
+            result = await db_execute(supabase_admin.table('lessons').update(data).eq('id', lesson_id).eq('user_id', user_id))
+            self.cache.invalidate(lesson_id)
             return result.data[0]
         except Exception as e:
             logger.error(f"Update lesson error: {str(e)}")
@@ -179,7 +280,8 @@ class LessonRepository:
         try:
             # You only need to delete the main lesson record.
             # The 'ON DELETE CASCADE' in your database schema handles the rest.
-            result = supabase_admin.table('lessons').delete().eq('id', lesson_id).eq('user_id', user_id).execute()
+            result = await db_execute(supabase_admin.table('lessons').delete().eq('id', lesson_id).eq('user_id', user_id))
+            self.cache.invalidate(lesson_id)
             
             logger.info(f"Lesson deleted: {lesson_id}")
             # The execute() result for delete returns the deleted data.
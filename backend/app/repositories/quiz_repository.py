@@ -1,6 +1,7 @@
-from typing import Dict, Any, Optional
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from app.database.supabase_client import supabase_admin as supabase
+from app.database.executor import db_execute
 from app.core.logging import get_logger
 import uuid
 
@@ -28,33 +29,41 @@ class QuizRepository:
                 'total_questions': total_questions,
                 'time_taken': time_taken, # <-- FIX: Rename this from time_taken_seconds
             }
-            result = supabase.table('quiz_attempts').insert(attempt_data).execute()
+            result = await db_execute(supabase.table('quiz_attempts').insert(attempt_data))
             logger.info(f"Created quiz attempt result: {result.data}")
             return result.data[0] if result.data else {}
         except Exception as e:
             logger.error(f"Create quiz attempt error: {repr(e)}", exc_info=True)
             raise
 
-    async def save_question_response(
+    async def submit_quiz_attempt(
         self,
-        quiz_attempt_id: str,
-        question_id: str,
-        user_answer: str,
-        is_correct: bool,
-        time_taken: int
-    ):
-        """Save an individual question response."""
+        user_id: str,
+        lesson_id: str,
+        score: int,
+        total_questions: int,
+        time_taken: int,
+        responses: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Create a completed attempt and bulk-insert its graded responses
+        (question_id, user_answer, is_correct, time_taken) in one
+        transactional RPC. Returns the attempt row.
+        """
         try:
-            response_data = {
-                'quiz_attempt_id': quiz_attempt_id,
-                'question_id': question_id,
-                'user_answer': user_answer,
-                'is_correct': is_correct,
-                'time_taken': time_taken,
-            }
-            supabase.table('question_responses').insert(response_data).execute()
+            result = await db_execute(supabase.rpc('submit_quiz_attempt', {
+                'p_user_id': user_id,
+                'p_lesson_id': lesson_id,
+                'p_score': score,
+                'p_total_questions': total_questions,
+                'p_time_taken': time_taken,
+                'p_responses': responses,
+            }))
+            attempt = result.data[0] if isinstance(result.data, list) else result.data
+            logger.info(f"Created quiz attempt {attempt['id']} with {len(responses)} responses")
+            return attempt
         except Exception as e:
-            logger.error(f"Save question response error: {repr(e)}", exc_info=True)
+            logger.error(f"Submit quiz attempt error: {repr(e)}", exc_info=True)
             raise
 
     async def get_user_performance(
@@ -70,7 +79,7 @@ class QuizRepository:
             if lesson_id:
                 rpc_params['p_lesson_id'] = lesson_id
 
-            result = supabase.rpc('get_user_performance_stats', rpc_params).execute()
+            result = await db_execute(supabase.rpc('get_user_performance_stats', rpc_params))
             
             # The function returns a list with one object, so we return that object
             # If no attempts, it returns an object with null/0 values
@@ -79,31 +88,31 @@ class QuizRepository:
             logger.error(f"Get user performance error for user {user_id}: {repr(e)}", exc_info=True)
             raise
 
-    async def compute_attempt_stats(self, attempt_id: str) -> Dict[str, Any]:
-        try:
-            responses = supabase.table('question_responses').select('*').eq('quiz_attempt_id', attempt_id).execute()
-            data = responses.data or []
-            total_answered = len(data)
-            correct_count = sum(1 for r in data if r.get('is_correct'))
-            return {
-                'total_answered': total_answered,
-                'correct_count': correct_count,
-            }
-        except Exception as e:
-            logger.error(f"Compute attempt stats error for {attempt_id}: {repr(e)}", exc_info=True)
-            raise
-
-    async def update_quiz_attempt_stats(self, attempt_id: str, correct_count: int, total_count: int, time_taken: Optional[int] = None) -> Dict[str, Any]:
+    async def record_question_response(
+        self,
+        attempt_id: str,
+        user_id: str,
+        question_id: str,
+        user_answer: str,
+        is_correct: bool,
+        time_taken: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Save one answer of an in-progress attempt and bump the attempt's
+        counters atomically (one RPC, no recount of earlier responses).
+        Returns {'answered_count', 'correct_count', 'score'}, or None if the
+        attempt doesn't belong to the user.
+        """
         try:
-            score = round((correct_count / total_count) * 100) if total_count > 0 else 0
-            update_data: Dict[str, Any] = {
-                'score': score,
-                'total_questions': total_count,
-            }
-            if time_taken is not None:
-                update_data['time_taken'] = time_taken
-            result = supabase.table('quiz_attempts').update(update_data).eq('id', attempt_id).execute()
-            return result.data[0] if result.data else {}
+            result = await db_execute(supabase.rpc('record_question_response', {
+                'p_attempt_id': attempt_id,
+                'p_user_id': user_id,
+                'p_question_id': question_id,
+                'p_user_answer': user_answer,
+                'p_is_correct': is_correct,
+                'p_time_taken': time_taken,
+            }))
+            return result.data[0] if result.data else None
         except Exception as e:
-            logger.error(f"Update quiz attempt stats error for {attempt_id}: {repr(e)}", exc_info=True)
+            logger.error(f"Record question response error for {attempt_id}: {repr(e)}", exc_info=True)
             raise
@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 from datetime import datetime  # <-- Import at the top
-from app.database.supabase_client import supabase, supabase_admin # Import admin client just in case
+from app.database.supabase_client import supabase_admin
+from app.database.executor import db_execute
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -13,7 +14,7 @@ class UserRepository:
         """Get user by ID."""
         try:
             # Use .single() to fetch one row or None
-            result = supabase.table('users').select('*').eq('id', user_id).single().execute()
+            result = await db_execute(supabase_admin.table('users').select('*').eq('id', user_id).single())
             return result.data  # Will be the dict if found, or None if not
         except Exception as e:
             # Use repr(e) for better logging
@@ -23,7 +24,7 @@ class UserRepository:
     async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email."""
         try:
-            result = supabase.table('users').select('*').eq('email', email).single().execute()
+            result = await db_execute(supabase_admin.table('users').select('*').eq('email', email).single())
             return result.data
         except Exception as e:
             logger.error(f"Get user by email error for {email}: {repr(e)}", exc_info=True)
@@ -32,7 +33,7 @@ class UserRepository:
     async def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Get user by username."""
         try:
-            result = supabase.table('users').select('*').eq('username', username).single().execute()
+            result = await db_execute(supabase_admin.table('users').select('*').eq('username', username).single())
             return result.data
         except Exception as e:
             logger.error(f"Get user by username error for {username}: {repr(e)}", exc_info=True)
@@ -43,7 +44,7 @@ class UserRepository:
         try:
             data['updated_at'] = datetime.utcnow().isoformat()
             # Use .single() to return the updated record directly
-            result = supabase.table('users').update(data).eq('id', user_id).single().execute()
+            result = await db_execute(supabase_admin.table('users').update(data).eq('id', user_id).single())
             
             if not result.data:
                 logger.error(f"Failed to update user {user_id}, user not found or no data returned.")
@@ -42,11 +42,18 @@ class GenerationSource(str, Enum):
     NOTES = "notes"
 
 
+class GenerationMode(str, Enum):
+    STANDARD = "standard"  # Full LLM pipeline
+    FAST = "fast"          # Local TF-IDF cloze items, returned immediately
+
+
 class GenerationRequest(BaseModel):
     source_type: GenerationSource
     content: Optional[str] = None
     topic: Optional[str] = None
     file_id: Optional[str] = None
+    # Several uploads combined into one lesson (used instead of, or with, file_id)
+    file_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=10)
     
     question_type: QuestionType = QuestionType.MIXED
     difficulty: DifficultyLevel = DifficultyLevel.MEDIUM
@@ -54,6 +61,9 @@ class GenerationRequest(BaseModel):
     max_questions: int = Field(default=10, ge=5, le=40)
     bloom_levels: Optional[List[BloomLevel]] = None
     custom_instructions: Optional[str] = None
+    mode: GenerationMode = GenerationMode.STANDARD
+    # Fast mode only: run the LLM pipeline afterwards and upgrade the lesson
+    refine_in_background: bool = True
 
 
 class QuestionOption(BaseModel):
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    total_size: int = Field(gt=0)
+    # Defaults to UPLOAD_PART_SIZE; clamped to the configured bounds
+    part_size: Optional[int] = Field(default=None, gt=0)
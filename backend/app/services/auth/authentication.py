@@ -1,13 +1,19 @@
 from typing import Dict, Any, Optional
 from datetime import datetime
 # Ensure both clients are imported
-from app.database.supabase_client import supabase, supabase_admin
+from app.database.supabase_client import create_auth_client, supabase, supabase_admin
+from app.database.executor import db_execute, db_run
 from app.core.exceptions import AuthenticationError, ValidationError
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
 
+def _auth_call(method: str, *args: Any) -> Any:
+    """Run a session-creating auth call on a client of its own (see create_auth_client)."""
+    return getattr(create_auth_client().auth, method)(*args)
+
+
 class AuthService:
     """Authentication service."""
 
@@ -21,11 +27,11 @@ class AuthService:
         """Register a new user."""
         auth_user_id = None
         try:
-            existing_user_res = supabase.table("users").select("id").eq("username", username).execute()
+            existing_user_res = await db_execute(supabase_admin.table("users").select("id").eq("username", username))
             if existing_user_res.data:
                 raise ValidationError("Username already exists")
 
-            auth_response = supabase.auth.sign_up({
+            auth_response = await db_run(_auth_call, "sign_up", {
                 "email": email,
                 "password": password
             })
@@ -55,13 +61,13 @@ class AuthService:
             }
 
             logger.info(f"Attempting to insert profile into 'users' table for ID: {auth_user_id}")
-            profile_res = supabase_admin.table("users").insert(user_profile_data).execute()
+            profile_res = await db_execute(supabase_admin.table("users").insert(user_profile_data))
 
             if hasattr(profile_res, 'error') and profile_res.error:
                 profile_error_message = profile_res.error.message if hasattr(profile_res.error, 'message') else str(profile_res.error)
                 logger.error(f"Failed to create profile in 'users' table: {profile_error_message}")
                 try:
-                    supabase_admin.auth.admin.delete_user(auth_user_id)
+                    await db_run(supabase_admin.auth.admin.delete_user, auth_user_id)
                     logger.info(f"Cleaned up orphaned auth user: {auth_user_id}")
                 except Exception as cleanup_error:
                     logger.error(f"Failed to clean up orphaned auth user {auth_user_id}: {cleanup_error}")
@@ -80,7 +86,7 @@ class AuthService:
             logger.error(f"Unexpected error during signup for {email}: {repr(e)}", exc_info=True)
             if auth_user_id:
                  try:
-                      supabase_admin.auth.admin.delete_user(auth_user_id)
+                      await db_run(supabase_admin.auth.admin.delete_user, auth_user_id)
                       logger.info(f"Cleaned up orphaned auth user due to unexpected error: {auth_user_id}")
                  except Exception as cleanup_error:
                       logger.error(f"Failed to clean up orphaned auth user {auth_user_id} after error: {cleanup_error}")
@@ -89,7 +95,7 @@ class AuthService:
     async def login(self, email: str, password: str) -> Dict[str, Any]:
         """Authenticate user and return tokens."""
         try:
-            auth_response = supabase.auth.sign_in_with_password({
+            auth_response = await db_run(_auth_call, "sign_in_with_password", {
                 "email": email,
                 "password": password
             })
@@ -101,7 +107,7 @@ class AuthService:
             if not auth_response.user or not auth_response.session:
                 raise AuthenticationError("Invalid credentials")
 
-            user_result = supabase.table("users").select("*").eq("id", auth_response.user.id).execute()
+            user_result = await db_execute(supabase_admin.table("users").select("*").eq("id", auth_response.user.id))
 
             if not user_result.data:
                 raise AuthenticationError("User profile not found")
@@ -123,7 +129,7 @@ class AuthService:
     async def verify_token(self, token: str) -> str:
         """Verify JWT token and return user ID."""
         try:
-            user_response = supabase.auth.get_user(token)
+            user_response = await db_run(supabase.auth.get_user, token)
 
             if hasattr(user_response, 'error') and user_response.error:
                 raise AuthenticationError("Invalid token")
@@ -155,7 +161,7 @@ class AuthService:
             logger.info(f"Attempting to update user {user_id} with data: {update_data}")
             
             # Use supabase_admin to bypass RLS and remove .single()
-            result = supabase_admin.table("users").update(update_data).eq("id", user_id).execute()
+            result = await db_execute(supabase_admin.table("users").update(update_data).eq("id", user_id))
 
             if not result.data:
                 raise ValidationError("Failed to update user profile")
@@ -170,7 +176,7 @@ class AuthService:
     async def refresh_tokens(self, refresh_token: str) -> Dict[str, Any]:
         """Refresh access token."""
         try:
-            response = supabase.auth.refresh_session(refresh_token)
+            response = await db_run(_auth_call, "refresh_session", refresh_token)
 
             if hasattr(response, 'error') and response.error:
                 raise AuthenticationError("Invalid refresh token")
@@ -199,7 +205,7 @@ class AuthService:
     async def get_user_by_id(self, user_id: str) -> Dict[str, Any]:
         """Get user by ID using the admin client to bypass RLS."""
         try:
-            result = supabase_admin.table("users").select("*").eq("id", user_id).single().execute()
+            result = await db_execute(supabase_admin.table("users").select("*").eq("id", user_id).single())
 
             if not result.data:
                 raise ValidationError("User not found")
@@ -0,0 +1,204 @@
+import re
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.services.llm.token_budget import get_encoder
+
+_INLINE_SPACE_RE = re.compile(r'[ \t\f\v\u00a0]+')
+_LINE_RE = re.compile(r'[^\n]*\n|[^\n]+$')
+# A sentence ends at . ? ! (optionally followed by a closing quote/bracket)
+# and whitespace; abbreviations like "e.g." occasionally split early, which
+# only makes a boundary slightly less ideal.
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])["\')\]]?\s+')
+_MARKDOWN_HEADING_RE = re.compile(r'^#{1,6}\s+\S')
+_NUMBERED_HEADING_RE = re.compile(r'^(\d+(\.\d+)*\.?|[IVXLC]+\.|chapter\s+\d+|section\s+\d+)\s+\S', re.IGNORECASE)
+
+PARAGRAPH_BREAK = "\n\n"
+LINE_BREAK = "\n"
+SENTENCE_BREAK = " "
+
+# (text, token count, separator placed before it, is_heading)
+_Unit = Tuple[str, int, str, bool]
+
+
+def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Yield lines from a string or from an iterable of text pieces (e.g. pages)."""
+    pieces = [source] if isinstance(source, str) else source
+    pending = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        text = pending + piece.replace('\r\n', '\n').replace('\r', '\n')
+        pending = ""
+        for match in _LINE_RE.finditer(text):
+            line = match.group(0)
+            if line.endswith('\n'):
+                yield line[:-1]
+            else:
+                # Incomplete last line; it may continue in the next piece
+                pending = line
+    if pending:
+        yield pending
+
+
+def is_heading(line: str) -> bool:
+    """Heuristic for section headings in extracted text."""
+    if _MARKDOWN_HEADING_RE.match(line):
+        return True
+    if len(line) > 80 or line.endswith(('.', ',', ';', ':', '?', '!')):
+        return False
+    if _NUMBERED_HEADING_RE.match(line):
+        return True
+    words = line.split()
+    if not 0 < len(words) <= 8 or not words[0][:1].isupper():
+        return False
+    # Title Case, allowing short connecting words ("Introduction to Cells")
+    return line.isupper() or all(word[:1].isupper() for word in words if len(word) > 3 and word[:1].isalpha())
+
+
+def iter_blocks(source: Union[str, Iterable[str]]) -> Iterator[Tuple[str, bool]]:
+    """
+    Yield (block, is_heading) pairs: headings as their own block, and
+    paragraphs with inline whitespace collapsed and wrapped lines joined.
+    """
+    paragraph: List[str] = []
+    for raw_line in _iter_lines(source):
+        line = _INLINE_SPACE_RE.sub(' ', raw_line).strip()
+        if not line:
+            if paragraph:
+                yield ' '.join(paragraph), False
+                paragraph = []
+            continue
+        if is_heading(line) and (not paragraph or paragraph[-1].endswith(('.', '?', '!', ':'))):
+            if paragraph:
+                yield ' '.join(paragraph), False
+                paragraph = []
+            yield line, True
+            continue
+        paragraph.append(line)
+    if paragraph:
+        yield ' '.join(paragraph), False
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_END_RE.split(paragraph) if sentence]
+
+
+class TokenChunker:
+    """
+    Streaming, token-sized chunker.
+
+    Chunks are built from whole sentences and never exceed max_tokens
+    (sentences longer than that are split on token boundaries). Paragraph
+    breaks are kept, a heading starts a new chunk once the current one is
+    reasonably full, and consecutive chunks overlap by up to overlap_tokens
+    worth of trailing sentences. Only the current chunk is held in memory.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        min_chars: int = 50,
+        model: Optional[str] = None
+    ):
+        self.max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+        overlap = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.overlap_tokens = min(overlap, self.max_tokens // 2)
+        self.min_chars = min_chars
+        self.encoder = get_encoder(model)
+
+    def _count(self, text: str) -> int:
+        return len(self.encoder.encode(text, disallowed_special=()))
+
+    def _unit(self, text: str, separator: str, heading: bool = False) -> _Unit:
+        # Counted both alone (first in a chunk, where the separator is dropped)
+        # and with its separator, so a chunk never has more tokens than the
+        # sum of its units
+        tokens = self._count(text)
+        if separator:
+            tokens = max(tokens, self._count(separator + text))
+        return text, tokens, separator, heading
+
+    def _iter_units(self, source: Union[str, Iterable[str]]) -> Iterator[_Unit]:
+        separator = ""
+        for block, heading in iter_blocks(source):
+            if heading:
+                yield self._unit(block, separator and PARAGRAPH_BREAK, heading=True)
+                separator = LINE_BREAK
+                continue
+            for index, sentence in enumerate(split_sentences(block)):
+                unit = self._unit(sentence, separator if index == 0 else SENTENCE_BREAK)
+                if unit[1] <= self.max_tokens:
+                    yield unit
+                else:
+                    # Run-on "sentence" (tables, code, missing punctuation)
+                    yield from self._split_run_on(sentence, unit[2])
+            separator = PARAGRAPH_BREAK
+
+    def _split_run_on(self, sentence: str, separator: str) -> Iterator[_Unit]:
+        """Split an over-long sentence on token boundaries into units of at most max_tokens."""
+        tokens = self.encoder.encode(sentence, disallowed_special=())
+        start = 0
+        while start < len(tokens):
+            end = min(start + self.max_tokens, len(tokens))
+            # Stripping a piece can re-tokenize its first word; back off until it fits
+            unit = self._unit(self.encoder.decode(tokens[start:end]).strip(), separator)
+            while unit[1] > self.max_tokens and end - start > 1:
+                end -= 1
+                unit = self._unit(self.encoder.decode(tokens[start:end]).strip(), separator)
+            if unit[0]:
+                yield unit
+                separator = SENTENCE_BREAK
+            start = end
+
+    @staticmethod
+    def _join(units: Iterable[_Unit]) -> str:
+        parts = []
+        for text, _, separator, _ in units:
+            parts.append((separator if parts else "") + text)
+        return ''.join(parts).strip()
+
+    def iter_chunks(self, source: Union[str, Iterable[str]]) -> Iterator[str]:
+        """Yield chunks from a string or an iterable of text pieces."""
+        buffer: Deque[_Unit] = deque()
+        buffer_tokens = 0
+
+        def emit() -> Optional[str]:
+            chunk = self._join(buffer)
+            return chunk if len(chunk) > self.min_chars else None
+
+        for unit in self._iter_units(source):
+            _, tokens, _, heading = unit
+
+            # New section: close the current chunk without overlap
+            if heading and buffer and buffer_tokens >= self.max_tokens // 2:
+                chunk = emit()
+                if chunk:
+                    yield chunk
+                buffer.clear()
+                buffer_tokens = 0
+
+            elif buffer and buffer_tokens + tokens > self.max_tokens:
+                chunk = emit()
+                if chunk:
+                    yield chunk
+                # Carry trailing whole sentences over as overlap
+                overlap: Deque[_Unit] = deque()
+                overlap_tokens = 0
+                while buffer and overlap_tokens + buffer[-1][1] <= self.overlap_tokens:
+                    overlap_tokens += buffer[-1][1]
+                    overlap.appendleft(buffer.pop())
+                if overlap_tokens + tokens > self.max_tokens:
+                    overlap.clear()
+                    overlap_tokens = 0
+                buffer, buffer_tokens = overlap, overlap_tokens
+
+            buffer.append(unit)
+            buffer_tokens += tokens
+
+        if buffer:
+            chunk = emit()
+            if chunk:
+                yield chunk
@@ -0,0 +1,117 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+from app.core.logging import get_logger
+from app.services.content.chunker import iter_blocks, split_sentences
+
+logger = get_logger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z\-']*[A-Za-z]|[,;:()\[\]\"]")
+MAX_PHRASE_WORDS = 3
+# Extra words that end a noun phrase in running text
+_BREAK_WORDS = frozenset({
+    'also', 'however', 'therefore', 'thus', 'using', 'used', 'called', 'known',
+    'include', 'includes', 'including', 'example', 'examples', 'like', 'such',
+    'make', 'makes', 'made', 'use', 'uses', 'allow', 'allows', 'different', 'various',
+})
+_STOP_WORDS = ENGLISH_STOP_WORDS | _BREAK_WORDS
+
+
+def _is_breaker(token: str) -> bool:
+    lowered = token.lower()
+    return (
+        len(token) < 3
+        or lowered in _STOP_WORDS
+        or lowered.endswith('ly')      # adverbs
+        or not token[0].isalpha()      # punctuation
+    )
+
+
+def candidate_phrases(sentence: str) -> Iterable[str]:
+    """
+    Noun-phrase-like candidates: runs of content words between stop words and
+    punctuation, capped at MAX_PHRASE_WORDS (longer runs yield their bigrams).
+    """
+    run: List[str] = []
+    for token in _WORD_RE.findall(sentence) + [","]:
+        if not _is_breaker(token):
+            run.append(token.lower())
+            continue
+        if run:
+            if len(run) <= MAX_PHRASE_WORDS:
+                yield " ".join(run)
+            else:
+                for index in range(len(run) - 1):
+                    yield " ".join(run[index:index + 2])
+        run = []
+
+
+class ConceptExtractor:
+    """
+    Local key-concept extraction: candidate noun phrases are scored with
+    TF-IDF over the document's sentences, favouring multi-word phrases.
+    """
+
+    def extract(self, text: str, top_k: int = 10) -> List[str]:
+        return [concept for concept, _ in self.extract_scored(text, top_k)]
+
+    def extract_scored(self, text: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        sentences = [
+            sentence
+            for block, heading in iter_blocks(text)
+            for sentence in ([block] if heading else split_sentences(block))
+        ]
+        vocabulary = sorted({phrase for sentence in sentences for phrase in candidate_phrases(sentence)})
+        if not vocabulary:
+            return []
+
+        vectorizer = TfidfVectorizer(
+            vocabulary=vocabulary,
+            ngram_range=(1, MAX_PHRASE_WORDS),
+            token_pattern=r"(?u)\b[a-zA-Z][a-zA-Z\-']*[a-zA-Z]\b",
+            sublinear_tf=True
+        )
+        try:
+            matrix = vectorizer.fit_transform(sentences)
+        except ValueError:
+            # Every sentence was empty after tokenizing
+            return []
+
+        scores = np.asarray(matrix.sum(axis=0)).ravel()
+        names = vectorizer.get_feature_names_out()
+        lengths = np.array([len(name.split()) for name in names])
+        scores = scores * (1 + 0.5 * (lengths - 1))
+
+        concepts: List[Tuple[str, float]] = []
+        covered: set = set()
+        for index in np.argsort(-scores):
+            if scores[index] <= 0 or len(concepts) >= top_k:
+                break
+            words = set(names[index].split())
+            # "membrane" adds nothing once "cell membrane" is in
+            if words <= covered:
+                continue
+            concepts.append((names[index], round(float(scores[index]), 4)))
+            covered |= words
+        return concepts
+
+    @staticmethod
+    def link_questions(concepts: List[str], questions: List[Dict]) -> Dict[str, List[str]]:
+        """Map each concept to the ids of questions that mention it."""
+        linked: Dict[str, List[str]] = {concept: [] for concept in concepts}
+        patterns = {
+            concept: re.compile(r'\b' + r'\s+'.join(map(re.escape, concept.split())) + r'\b', re.IGNORECASE)
+            for concept in concepts
+        }
+        for question in questions:
+            text = " ".join(
+                str(question.get(field) or "")
+                for field in ('question_text', 'correct_answer', 'explanation')
+            )
+            for concept, pattern in patterns.items():
+                if question.get('id') and pattern.search(text):
+                    linked[concept].append(question['id'])
+        return linked
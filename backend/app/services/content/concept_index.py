@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.repositories.concept_repository import ConceptRepository
+from app.services.content.concept_extractor import ConceptExtractor
+
+logger = get_logger(__name__)
+
+
+class ConceptIndexer:
+    """Builds the per-user concept index for a lesson when it is created or regenerated."""
+
+    def __init__(
+        self,
+        extractor: Optional[ConceptExtractor] = None,
+        concept_repo: Optional[ConceptRepository] = None
+    ):
+        self.extractor = extractor or ConceptExtractor()
+        self.concept_repo = concept_repo or ConceptRepository()
+
+    def build(self, lesson: Dict[str, Any], content: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Extract concepts from the source text (or the lesson itself) and link questions."""
+        questions = lesson.get('questions') or []
+        text = content or "\n\n".join(
+            [lesson.get('study_notes') or ""]
+            + [q.get('question_text') or "" for q in questions]
+            + [f"{fc.get('front') or ''} {fc.get('back') or ''}" for fc in lesson.get('flashcards') or []]
+        )
+        scored = self.extractor.extract_scored(text, top_k=settings.CONCEPTS_PER_LESSON)
+        linked = self.extractor.link_questions([concept for concept, _ in scored], questions)
+        return [
+            {'concept': concept, 'weight': weight, 'question_ids': linked[concept]}
+            for concept, weight in scored
+        ]
+
+    async def index_lesson(
+        self,
+        user_id: str,
+        lesson: Dict[str, Any],
+        content: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Rebuild a lesson's index rows. Best effort: failures are logged, not raised."""
+        try:
+            concepts = await asyncio.to_thread(self.build, lesson, content)
+            await self.concept_repo.replace_lesson_concepts(user_id, lesson['id'], concepts)
+            logger.info(f"Indexed {len(concepts)} concepts for lesson {lesson['id']}")
+            return concepts
+        except Exception as e:
+            logger.error(f"Concept indexing failed for lesson {lesson.get('id')}: {repr(e)}", exc_info=True)
+            return []
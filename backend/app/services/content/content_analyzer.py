@@ -1,11 +1,13 @@
 # app/services/content/content_analyzer.py
 from typing import List, Dict, Any, Optional
+import asyncio
 import re
 from app.services.llm.llm_service import LLMService, get_llm_service
 from app.services.llm.prompt_templates import PromptTemplates  # Assuming this exists; inline if not
 from app.services.content.file_processor import FileProcessor
+from app.services.content.chunker import TokenChunker
+from app.services.content.concept_extractor import ConceptExtractor
 from app.core.logging import get_logger
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from fastapi import HTTPException
 
 logger = get_logger(__name__)
@@ -20,38 +22,36 @@ class ContentAnalyzer:
         self.llm = llm or get_llm_service()
         self.prompts = PromptTemplates()
         self.file_processor = FileProcessor()
+        self.concept_extractor = ConceptExtractor()
 
     async def chunk_content(
         self,
         content: str,
-        chunk_size: int = 1500,
-        overlap: int = 200
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
     ) -> List[str]:
-        """Split content into meaningful chunks using Langchain."""
+        """Split content into token-sized chunks along paragraph and sentence boundaries."""
         try:
-            content = self._clean_text(content)
-
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=overlap,
-                separators=["\n\n", "\n", ". ", "? ", "! ", " ", ""]
+            chunker = TokenChunker(
+                max_tokens=max_tokens,
+                overlap_tokens=overlap_tokens,
+                model=self.llm.model_name
             )
-            chunks = splitter.split_text(content)
-
-            min_chunk_size = 50
-            filtered_chunks = [chunk for chunk in chunks if len(chunk) > min_chunk_size]
+            # Tokenizing a large document is CPU-bound; keep it off the event loop
+            chunks = await asyncio.to_thread(lambda: list(chunker.iter_chunks(content)))
 
-            logger.info(f"Content split into {len(filtered_chunks)} chunks")
-            return filtered_chunks if filtered_chunks else [content]
+            logger.info(f"Content split into {len(chunks)} chunks")
+            return chunks if chunks else [self._clean_text(content)]
 
         except Exception as e:
             logger.error(f"Chunking error: {repr(e)}", exc_info=True)
             return [content]
 
     def _clean_text(self, text: str) -> str:
-        """Basic text cleaning."""
-        text = re.sub(r'\s+', ' ', text).strip()
-        text = re.sub(r'\n+', '\n', text).strip()
+        """Basic text cleaning that keeps line and paragraph breaks."""
+        text = re.sub(r'[ \t\f\v]+', ' ', text)
+        text = re.sub(r' *\n *', '\n', text)
+        text = re.sub(r'\n{3,}', '\n\n', text).strip()
         return text
 
     async def generate_content_from_topic(self, topic: str) -> str:
@@ -69,21 +69,10 @@ class ContentAnalyzer:
         """Get content from uploaded file via FileProcessor."""
         return await self.file_processor.get_file_content(file_id)
 
-    async def extract_key_concepts(self, content: str) -> List[str]:
-        """Extract key concepts from content."""
+    async def extract_key_concepts(self, content: str, top_k: int = 10) -> List[str]:
+        """Extract key concepts from content locally (TF-IDF over noun phrases)."""
         try:
-            prompt = f"""Extract 5-10 key concepts or terms from the following content.
-
-Content:
----
-{content}
----
-
-Return ONLY a valid JSON array of strings. Example: ["Concept 1", "Concept 2"]
-"""
-            concepts = await self.llm.generate_json(prompt, temperature=0.5)
-            return concepts if isinstance(concepts, list) else []
-
+            return await asyncio.to_thread(self.concept_extractor.extract, content, top_k)
         except Exception as e:
             logger.error(f"Concept extraction error: {repr(e)}", exc_info=True)
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,235 @@
+import asyncio
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import mammoth  # For docx extraction
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+PAGE_SEPARATOR = "\n\n"
+PDF_ENGINES = ("pypdf", "PyPDF2")
+
+
+# --- Worker functions: run in the extraction processes, so module-level and path-based ---
+
+def _pdf_reader(path: str, engine: str):
+    if engine not in PDF_ENGINES:
+        raise ValueError(f"Unknown PDF engine: {engine}")
+    # Both packages expose the same PdfReader API
+    return importlib.import_module(engine).PdfReader(path)
+
+
+def extract_pdf_pages(path: str, start: int, end: int, engine: str) -> Tuple[int, List[str]]:
+    """Text of pages [start, end) plus the document's page count."""
+    reader = _pdf_reader(path, engine)
+    num_pages = len(reader.pages)
+    return num_pages, [reader.pages[i].extract_text() or "" for i in range(start, min(end, num_pages))]
+
+
+def extract_pdf_text(path: str, engine: str = "PyPDF2") -> str:
+    """Extract text from a PDF file on one core."""
+    reader = _pdf_reader(path, engine)
+    return PAGE_SEPARATOR.join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_docx_text(path: str) -> str:
+    """Extract text from a DOCX file using mammoth."""
+    with open(path, 'rb') as stream:
+        result = mammoth.convert_to_markdown(stream)
+    return result.value or ""
+
+
+def extract_plain_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
+EXTRACTORS = {
+    '.docx': extract_docx_text,
+    '.txt': extract_plain_text,
+    '.md': extract_plain_text,
+}
+SUPPORTED_EXTENSIONS = ('.pdf', *EXTRACTORS)
+
+
+def extract_document(path: str, file_ext: str) -> str:
+    extractor = EXTRACTORS.get(file_ext)
+    if extractor is None:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+    return extractor(path)
+
+
+def join_pages(pages: List[str]) -> Tuple[str, List[List[int]]]:
+    """Join page texts and record each page's [start, end) character offsets in the result."""
+    offsets: List[List[int]] = []
+    position = 0
+    for index, page in enumerate(pages):
+        if index:
+            position += len(PAGE_SEPARATOR)
+        offsets.append([position, position + len(page)])
+        position += len(page)
+    return PAGE_SEPARATOR.join(pages), offsets
+
+
+class ExtractionExecutor:
+    """
+    Runs CPU-bound document extraction in a bounded process pool so large
+    PDFs don't stall the event loop; PDFs are split into page ranges that
+    are extracted in parallel. Submissions beyond the workers plus
+    max_queue are rejected with 503 instead of piling up. A document that
+    exceeds the timeout gets 504 and the pool is recycled, since a running
+    worker process can't be cancelled on its own.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        pdf_engine: Optional[str] = None,
+        pdf_pages_per_shard: Optional[int] = None
+    ):
+        self.max_workers = max_workers or settings.EXTRACTION_MAX_WORKERS
+        self.max_queue = settings.EXTRACTION_MAX_QUEUE if max_queue is None else max_queue
+        self.timeout_seconds = timeout_seconds or settings.EXTRACTION_TIMEOUT_SECONDS
+        self.pdf_engine = pdf_engine or settings.PDF_ENGINE
+        self.pdf_pages_per_shard = max(1, pdf_pages_per_shard or settings.PDF_PAGES_PER_SHARD)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that holds the event loop, model weights
+            # and client threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _restart_pool(self, pool: ProcessPoolExecutor) -> None:
+        if self._pool is not pool:
+            return  # Another caller already replaced it
+        self._pool = None
+        self.restarts += 1
+        # Hung workers would otherwise hold a slot forever
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def extract(self, path: str, file_ext: str) -> Dict[str, Any]:
+        """
+        Extract text from the file at path in worker processes. Returns
+        {'text', 'page_offsets'}; page_offsets is a [start, end) character
+        range per PDF page and None for other formats.
+        """
+        if file_ext not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Extraction queue full ({self.pending} pending); rejecting {path}")
+            raise HTTPException(status_code=503, detail="Server is busy processing other documents. Please retry shortly.")
+
+        self.pending += 1
+        try:
+            # One retry if another document's timeout recycled the pool under us
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    result = await asyncio.wait_for(self._extract(pool, path, file_ext), timeout=self.timeout_seconds)
+                    self.completed += 1
+                    return result
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    logger.error(f"Extraction of {path} exceeded {self.timeout_seconds}s; recycling worker pool")
+                    self._restart_pool(pool)
+                    raise HTTPException(status_code=504, detail="Document text extraction timed out")
+                except BrokenProcessPool:
+                    self._restart_pool(pool)
+                    if attempt:
+                        raise
+                    logger.warning(f"Extraction pool was recycled; retrying {path}")
+        finally:
+            self.pending -= 1
+
+    async def _extract(self, pool: ProcessPoolExecutor, path: str, file_ext: str) -> Dict[str, Any]:
+        if file_ext != '.pdf':
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(pool, extract_document, path, file_ext)
+            return {'text': text, 'page_offsets': None}
+
+        started = time.perf_counter()
+        pages = [page async for page in self.iter_pdf_pages(path, pool=pool)]
+        text, offsets = join_pages(pages)
+        logger.info(
+            f"Extracted {len(pages)} PDF pages with {self.pdf_engine} in {time.perf_counter() - started:.2f}s"
+        )
+        return {'text': text, 'page_offsets': offsets}
+
+    async def iter_pdf_pages(
+        self,
+        path: str,
+        pool: Optional[ProcessPoolExecutor] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield PDF page texts in page order. The first shard also reports the
+        page count; the remaining page ranges then run across all workers
+        and are yielded as soon as every earlier range is done.
+        """
+        pool = pool or self._get_pool()
+        loop = asyncio.get_running_loop()
+        shard = self.pdf_pages_per_shard
+        num_pages, first = await loop.run_in_executor(
+            pool, extract_pdf_pages, path, 0, shard, self.pdf_engine
+        )
+        futures = [
+            loop.run_in_executor(pool, extract_pdf_pages, path, start, start + shard, self.pdf_engine)
+            for start in range(shard, num_pages, shard)
+        ]
+        try:
+            for page in first:
+                yield page
+            for future in futures:
+                _, pages = await future
+                for page in pages:
+                    yield page
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'timeout_seconds': self.timeout_seconds,
+            'pdf_engine': self.pdf_engine,
+            'pdf_pages_per_shard': self.pdf_pages_per_shard,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+        }
+
+
+@lru_cache()
+def get_extraction_executor() -> ExtractionExecutor:
+    return ExtractionExecutor()
@@ -1,121 +1,112 @@
 # app/services/content/file_processor.py
-import io
+import asyncio
 import os
+import time
 import uuid
-from typing import Dict, Any
-import mammoth  # For docx extraction
-from PyPDF2 import PdfReader
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 from app.database.supabase_client import supabase, supabase_admin
+from app.database.executor import db_execute, db_run
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.services.content.extraction import get_extraction_executor
+from app.services.content.text_store import get_text_store, page_range
+from app.services.content.upload_spool import SpooledUpload
 from app.utils.helpers import sanitize_filename 
 from fastapi import HTTPException
 
 logger = get_logger(__name__)
 
+# Deduplicated uploads keep their text on the shared blob (embedded via the sha256 FK)
+FILE_TEXT_COLUMNS = (
+    'filename, sha256, extracted_text, page_offsets, '
+    'file_blobs(extracted_text, page_offsets, text_length, block_chars)'
+)
+
 
 class FileProcessor:
     """Service for processing various document types (PDF, DOCX, TXT)."""
 
     async def process_file(
         self,
-        file_content: bytes,
+        upload: SpooledUpload,
         filename: str,
         user_id: str
     ) -> Dict[str, Any]:
-        """Process an uploaded file, extract text, and store it."""
+        """Process a spooled upload, extract text, and store it."""
         
         # Sanitize filename and prepare paths
         safe_filename = sanitize_filename(filename)
         file_ext = os.path.splitext(safe_filename)[1].lower()
         file_id = str(uuid.uuid4())
-        file_path = f"{user_id}/{file_id}{file_ext}" # Path within Supabase Storage
+        # Content-addressed path within Supabase Storage, shared by identical uploads
+        file_path = f"blobs/{upload.sha256}{file_ext}"
 
-        logger.info(f"Processing file: {safe_filename}, type: {file_ext}, size: {len(file_content)} bytes")
+        logger.info(f"Processing file: {safe_filename}, type: {file_ext}, size: {upload.size} bytes")
 
+        claimed = saved = False
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
         try:
-            # === STEP 1: Extract Text ===
-            text = ""
-            if file_ext == '.pdf':
-                text = self._extract_pdf_text(file_content)
-                logger.info("Extracted text from PDF.")
-            elif file_ext == '.docx':
-                text = self._extract_docx_text(file_content)
-                logger.info("Extracted text from DOCX.")
-            elif file_ext in ['.txt', '.md']:
-                text = file_content.decode('utf-8', errors='ignore')
-                logger.info("Decoded text from TXT/MD.")
-            else:
-                raise ValueError(f"Unsupported file type: {file_ext}")
+            # === STEP 0: Reuse an identical earlier upload (any user) ===
+            # Same bytes means same extraction: skip storage and extraction and
+            # just add this user's reference to the shared blob, if one is registered.
+            file_data = await self._timed(
+                timings, 'lookup',
+                db_run(self._register_file, file_id, user_id, safe_filename, file_ext, upload, require_existing=True)
+            )
+            if file_data:
+                logger.info(f"Upload {file_id} deduplicated against blob {upload.sha256}")
+                file_data['timings'] = self._report_timings(timings, started, file_id)
+                saved = True
+                return file_data
 
-            # === STEP 2: Upload File to Supabase Storage ===
-            logger.info(f"Uploading file to storage at path: {file_path}")
-            
-            try:
-                # Determine content type
-                content_type = 'application/octet-stream'
-                if file_ext == '.pdf':
-                    content_type = 'application/pdf'
-                elif file_ext == '.docx':
-                    content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-                elif file_ext == '.txt':
-                    content_type = 'text/plain'
-                elif file_ext == '.md':
-                    content_type = 'text/markdown'
+            # No registered blob: claim it so nothing deletes the object and
+            # text we are about to store before we register them
+            await self._timed(
+                timings, 'claim',
+                db_execute(supabase_admin.rpc('claim_blob', {
+                    'p_sha256': upload.sha256,
+                    'p_file_path': file_path,
+                    'p_file_type': file_ext,
+                    'p_file_size': upload.size,
+                }))
+            )
+            claimed = True
 
-                upload_response = supabase_admin.storage.from_('documents').upload(
-                    path=file_path,
-                    file=file_content,
-                    file_options={'content-type': content_type}
+            # === STEPS 1+2: Extract Text and Upload to Storage, concurrently ===
+            # Extraction is CPU-bound (process pool), the upload network-bound
+            # (thread); neither waits for the other.
+            extract_result, storage_result = await asyncio.gather(
+                self._timed(timings, 'extract', get_extraction_executor().extract(upload.path, file_ext)),
+                self._timed(timings, 'storage', asyncio.to_thread(self._upload_to_storage, upload, file_path, file_ext)),
+                return_exceptions=True
+            )
+            if isinstance(extract_result, BaseException):
+                raise extract_result
+            if isinstance(storage_result, BaseException):
+                raise storage_result
+            text = extract_result['text']
+            logger.info(f"Extracted {len(text)} chars of text from {file_ext} file.")
+
+            # === STEP 3: Store the text compressed, then create the blob (if new) and this user's file row ===
+            text_layout = await self._timed(timings, 'text_store', get_text_store().save(upload.sha256, text))
+            logger.info(f"Attempting to register file ID: {file_id} for blob {upload.sha256}")
+            file_data = await self._timed(
+                timings, 'insert',
+                db_run(
+                    self._register_file, file_id, user_id, safe_filename, file_ext, upload,
+                    file_path, extract_result['page_offsets'], text_layout
                 )
-                logger.info(f"File upload response: {upload_response}")
-                logger.info("File upload to storage successful.")
-            except KeyError as ke:
-                # Catch potential library bug in storage3 where it fails to parse error response
-                logger.error(f"Storage library KeyError (likely parsing error response) for path {file_path}: {ke}", exc_info=True)
-                raise HTTPException(status_code=502, detail=f"Storage service returned an unexpected response format. Please try again.")
-            except Exception as upload_err:
-                logger.error(f"Storage upload failed for path {file_path}: {repr(upload_err)}", exc_info=True)
-                if hasattr(upload_err, 'status_code'):
-                    raise HTTPException(status_code=upload_err.status_code, detail=f"Storage upload failed: {str(upload_err)}")
-                else:
-                    raise HTTPException(status_code=500, detail=f"Storage upload failed: {str(upload_err)}")
-
-            # === STEP 3: Insert Metadata into Database ===
-            file_metadata = {
-                'id': file_id,
-                'user_id': user_id,
-                'filename': safe_filename,
-                'file_path': file_path,
-                'file_type': file_ext,
-                'extracted_text': text,
-                'file_size': len(file_content)
-            }
-            
-            logger.info(f"Attempting to insert metadata into 'uploaded_files' table for file ID: {file_id}")
-            try:
-                result = supabase_admin.table('uploaded_files').insert(file_metadata).execute()
-
-                if result.data:
-                    logger.info(f"Successfully inserted metadata for file ID: {file_id}")
-                    return result.data[0] if isinstance(result.data, list) else result.data
-                else:
-                    if result.error:
-                        db_error = {
-                            'message': result.error.message,
-                            'details': result.error.details,
-                            'hint': result.error.hint,
-                            'code': result.error.code
-                        }
-                        logger.error(f"Database insert failed: {db_error}")
-                        raise HTTPException(status_code=400 if result.error.code == '400' else 500, 
-                                          detail=f"Failed to save file metadata: {result.error.message}")
-                    else:
-                        logger.error("Database insert succeeded but returned no data.")
-                        raise HTTPException(status_code=500, detail="Failed to save file metadata: Unknown database error")
-            except Exception as db_err:
-                logger.error(f"Database operation error: {repr(db_err)}", exc_info=True)
-                raise HTTPException(status_code=500, detail=f"Database error: {str(db_err)}")
+            )
+            if not file_data:
+                logger.error("Database insert succeeded but returned no data.")
+                raise HTTPException(status_code=500, detail="Failed to save file metadata: Unknown database error")
+
+            logger.info(f"Successfully inserted metadata for file ID: {file_id}")
+            file_data['extracted_text'] = text
+            file_data['timings'] = self._report_timings(timings, started, file_id)
+            saved = True
+            return file_data
 
         except ValueError as ve:
             logger.warning(f"File processing validation error for '{filename or 'N/A'}': {ve}")
@@ -125,21 +116,176 @@ class FileProcessor:
         except Exception as e:
             logger.error(f"Unexpected file processing error for '{filename}': {repr(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"File processing failed: {str(e)}")
+        finally:
+            if claimed and not saved:
+                await self._release_claim(upload.sha256)
 
-    def _extract_pdf_text(self, file_content: bytes) -> str:
-        """Extract text from PDF content."""
-        pdf_file = io.BytesIO(file_content)
-        reader = PdfReader(pdf_file)
-        text_parts = [page.extract_text() or "" for page in reader.pages]
-        logger.debug(f"Extracted {len(text_parts)} pages from PDF.")
-        return "\n\n".join(text_parts)
-
-    def _extract_docx_text(self, file_content: bytes) -> str:
-        """Extract text from DOCX content using mammoth."""
-        docx_file = io.BytesIO(file_content)
-        result = mammoth.convert_to_markdown(docx_file)
-        logger.debug("Converted DOCX to markdown text.")
-        return result.value or ""
+    async def _release_claim(self, sha256: str) -> None:
+        """
+        Drop a failed upload's blob claim. The database deletes the text and
+        reports the object orphaned only if no registered file or other
+        in-progress upload uses them, checked in the same transaction.
+        """
+        try:
+            result = await db_execute(supabase_admin.rpc('release_blob_claim', {'p_sha256': sha256}))
+            released = result.data[0] if result.data else None
+            if released and released.get('orphaned'):
+                get_text_store().evict(sha256)
+                await asyncio.to_thread(self._remove_from_storage, released['file_path'])
+        except Exception as e:
+            logger.warning(f"Could not release claim on blob {sha256}: {repr(e)}")
+
+    def _register_file(
+        self,
+        file_id: str,
+        user_id: str,
+        filename: str,
+        file_ext: str,
+        upload: SpooledUpload,
+        file_path: Optional[str] = None,
+        page_offsets: Optional[List[List[int]]] = None,
+        text_layout: Optional[Dict[str, int]] = None,
+        require_existing: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Insert the user's file row and take a blob reference, creating the blob
+        if new (one RPC). With require_existing, returns None unless the blob
+        is already registered.
+        """
+        try:
+            result = supabase_admin.rpc('register_file', {
+                'p_id': file_id,
+                'p_user_id': user_id,
+                'p_filename': filename,
+                'p_file_type': file_ext,
+                'p_file_size': upload.size,
+                'p_sha256': upload.sha256,
+                'p_file_path': file_path or f"blobs/{upload.sha256}{file_ext}",
+                'p_page_offsets': page_offsets,
+                'p_text_length': (text_layout or {}).get('text_length'),
+                'p_block_chars': (text_layout or {}).get('block_chars'),
+                'p_require_existing': require_existing,
+            }).execute()
+        except Exception as db_err:
+            logger.error(f"Database operation error: {repr(db_err)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Database error: {str(db_err)}")
+        if not result.data:
+            return None
+        return result.data[0] if isinstance(result.data, list) else result.data
+
+    async def delete_file(self, file_id: str, user_id: str) -> Dict[str, Any]:
+        """Delete a user's file; the stored object goes once no other upload references it."""
+        try:
+            result = await db_execute(
+                supabase_admin.rpc('release_file', {'p_file_id': file_id, 'p_user_id': user_id})
+            )
+            if not result.data:
+                raise HTTPException(status_code=404, detail="File not found or access denied")
+
+            released = result.data[0]
+            if released.get('orphaned'):
+                await asyncio.to_thread(self._remove_from_storage, released['file_path'])
+                if released.get('blob_sha256'):
+                    # Blocks were deleted with the blob; drop the decompressed copy too
+                    get_text_store().evict(released['blob_sha256'])
+            logger.info(f"Deleted file {file_id} for user {user_id} (object removed: {bool(released.get('orphaned'))})")
+            return {'id': file_id, 'storage_removed': bool(released.get('orphaned'))}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Delete file error for ID {file_id}: {repr(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Failed to delete file")
+
+    @staticmethod
+    async def _timed(timings: Dict[str, float], stage: str, awaitable: Awaitable[Any]) -> Any:
+        stage_started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = time.perf_counter() - stage_started
+
+    @staticmethod
+    def _report_timings(timings: Dict[str, float], started: float, file_id: str) -> Dict[str, float]:
+        """Per-stage milliseconds, plus what overlapping extraction and storage saved."""
+        total = time.perf_counter() - started
+        sequential = sum(timings.values())
+        report = {f"{stage}_ms": round(seconds * 1000, 1) for stage, seconds in timings.items()}
+        report['total_ms'] = round(total * 1000, 1)
+        report['saved_ms'] = round(max(0.0, sequential - total) * 1000, 1)
+        logger.info(f"Upload {file_id} timings: {report}")
+        return report
+
+    def _upload_to_storage(self, upload: SpooledUpload, file_path: str, file_ext: str) -> None:
+        """Upload the spooled file to Supabase Storage (blocking; run in a thread)."""
+        logger.info(f"Uploading file to storage at path: {file_path}")
+        try:
+            # Determine content type
+            content_type = 'application/octet-stream'
+            if file_ext == '.pdf':
+                content_type = 'application/pdf'
+            elif file_ext == '.docx':
+                content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            elif file_ext == '.txt':
+                content_type = 'text/plain'
+            elif file_ext == '.md':
+                content_type = 'text/markdown'
+
+            # Streamed from the spool file rather than passed as bytes
+            with upload.open() as stream:
+                upload_response = supabase_admin.storage.from_('documents').upload(
+                    path=file_path,
+                    file=stream,
+                    # A concurrent identical upload may have written the same object
+                    file_options={'content-type': content_type, 'upsert': 'true'}
+                )
+            logger.info(f"File upload response: {upload_response}")
+            logger.info("File upload to storage successful.")
+        except KeyError as ke:
+            # Catch potential library bug in storage3 where it fails to parse error response
+            logger.error(f"Storage library KeyError (likely parsing error response) for path {file_path}: {ke}", exc_info=True)
+            raise HTTPException(status_code=502, detail=f"Storage service returned an unexpected response format. Please try again.")
+        except Exception as upload_err:
+            logger.error(f"Storage upload failed for path {file_path}: {repr(upload_err)}", exc_info=True)
+            if hasattr(upload_err, 'status_code'):
+                raise HTTPException(status_code=upload_err.status_code, detail=f"Storage upload failed: {str(upload_err)}")
+            else:
+                raise HTTPException(status_code=500, detail=f"Storage upload failed: {str(upload_err)}")
+
+    def _remove_from_storage(self, file_path: str) -> None:
+        """Best-effort delete of an object whose upload can no longer be used."""
+        try:
+            supabase_admin.storage.from_('documents').remove([file_path])
+            logger.info(f"Removed orphaned storage object {file_path}")
+        except Exception as e:
+            logger.warning(f"Could not remove storage object {file_path}: {repr(e)}")
+
+    @staticmethod
+    def _text_source(file_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Where a file's text lives: on the row (legacy), on its blob, or in the block store."""
+        blob = file_data.get('file_blobs') or {}
+        if file_data.get('extracted_text') is not None:
+            text = file_data['extracted_text']
+            return {'text': text, 'page_offsets': file_data.get('page_offsets'), 'text_length': len(text)}
+        if blob.get('extracted_text') is not None:
+            text = blob['extracted_text']
+            return {'text': text, 'page_offsets': blob.get('page_offsets'), 'text_length': len(text)}
+        return {
+            'text': None,
+            'sha256': file_data.get('sha256'),
+            'page_offsets': blob.get('page_offsets'),
+            'text_length': blob.get('text_length') or 0,
+            'block_chars': blob.get('block_chars'),
+        }
+
+    async def _load_text(self, file_data: Dict[str, Any]) -> Tuple[str, Optional[List[List[int]]]]:
+        """(text, page_offsets) of a file row selected with FILE_TEXT_COLUMNS."""
+        source = self._text_source(file_data)
+        if source['text'] is not None:
+            return source['text'], source['page_offsets']
+        if not source['sha256']:
+            return '', None
+        return await get_text_store().get_text(source['sha256']), source['page_offsets']
 
     async def get_file_content(self, file_id: str, user_id: str) -> Dict[str, Any]:
         """Retrieve extracted text and metadata of a file from the database."""
@@ -147,25 +293,115 @@ class FileProcessor:
             logger.info(f"Retrieving extracted text for file ID: {file_id} by user {user_id}")
             
             # Use supabase_admin to ensure we can read the file
-            result = supabase_admin.table('uploaded_files').select('extracted_text, filename').eq('id', file_id).eq('user_id', user_id).execute()
+            result = await db_execute(supabase_admin.table('uploaded_files').select(FILE_TEXT_COLUMNS).eq('id', file_id).eq('user_id', user_id))
             
             if not result.data or len(result.data) == 0:
                 logger.warning(f"File content not found or access denied for ID: {file_id}, User: {user_id}")
                 raise HTTPException(status_code=404, detail="File not found or access denied")
             
             file_data = result.data[0]
-            extracted_text = file_data.get('extracted_text', '')
+            extracted_text, page_offsets = await self._load_text(file_data)
             filename = file_data.get('filename', 'Unknown File')
             
             logger.info(f"Successfully retrieved extracted text for file ID: {file_id} (length: {len(extracted_text)} chars)")
             
             return {
                 'content': extracted_text,
-                'filename': filename
+                'filename': filename,
+                'page_offsets': page_offsets
             }
             
         except HTTPException:
             raise
         except Exception as e:
             logger.error(f"Get file content error for ID {file_id}: {repr(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail="Failed to retrieve file content")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail="Failed to retrieve file content")
+
+    async def get_files_content(self, file_ids: List[str], user_id: str) -> List[Dict[str, Any]]:
+        """Retrieve extracted text of several files in one query, in the requested order."""
+        try:
+            unique_ids = list(dict.fromkeys(file_ids))
+            logger.info(f"Retrieving extracted text for {len(unique_ids)} files by user {user_id}")
+
+            result = await db_execute(
+                supabase_admin.table('uploaded_files').select(f'id, {FILE_TEXT_COLUMNS}')
+                .in_('id', unique_ids).eq('user_id', user_id)
+            )
+            rows = {row['id']: row for row in result.data or []}
+
+            missing = [file_id for file_id in unique_ids if file_id not in rows]
+            if missing:
+                logger.warning(f"Files not found or access denied: {missing}, User: {user_id}")
+                raise HTTPException(status_code=404, detail=f"File not found or access denied: {', '.join(missing)}")
+
+            texts = await asyncio.gather(*(self._load_text(rows[file_id]) for file_id in unique_ids))
+            return [
+                {
+                    'id': file_id,
+                    'content': text or '',
+                    'filename': rows[file_id].get('filename') or 'Unknown File'
+                }
+                for file_id, (text, _) in zip(unique_ids, texts)
+            ]
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Get files content error for IDs {file_ids}: {repr(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Failed to retrieve file content")
+
+    async def get_file_text(
+        self,
+        file_id: str,
+        user_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        page_start: Optional[int] = None,
+        page_end: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        A character range [start, end) or a 1-based page range of a file's
+        extracted text. Only the compressed blocks covering the range are read.
+        """
+        try:
+            result = await db_execute(
+                supabase_admin.table('uploaded_files').select(FILE_TEXT_COLUMNS)
+                .eq('id', file_id).eq('user_id', user_id)
+            )
+            if not result.data:
+                raise HTTPException(status_code=404, detail="File not found or access denied")
+
+            source = self._text_source(result.data[0])
+            page_offsets = source['page_offsets']
+            total = source['text_length']
+            if page_start is not None or page_end is not None:
+                if not page_offsets:
+                    raise HTTPException(status_code=422, detail="This file has no page index")
+                first_page = page_start or 1
+                start, end = page_range(page_offsets, first_page, page_end or first_page)
+            start = max(0, start or 0)
+            end = total if end is None else min(end, total)
+
+            if source['text'] is not None:
+                text = source['text'][start:end]
+            elif source['sha256']:
+                text = await get_text_store().get_range(
+                    source['sha256'], start, end, total, source['block_chars']
+                )
+            else:
+                text = ''
+
+            return {
+                'id': file_id,
+                'start': start,
+                'end': max(start, end),
+                'total_length': total,
+                'num_pages': len(page_offsets) if page_offsets else None,
+                'text': text,
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Get file text range error for ID {file_id}: {repr(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Failed to retrieve file text")
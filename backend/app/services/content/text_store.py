@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.database.supabase_client import supabase_admin
+from app.database.executor import db_execute
+from app.utils.cache import TTLCache
+
+logger = get_logger(__name__)
+
+
+def encode_blocks(text: str, block_chars: int, level: int) -> List[str]:
+    """Split text into fixed-size character blocks, each zlib-compressed and base64-encoded."""
+    return [
+        base64.b64encode(zlib.compress(text[start:start + block_chars].encode('utf-8'), level)).decode('ascii')
+        for start in range(0, len(text), block_chars)
+    ] or [base64.b64encode(zlib.compress(b"", level)).decode('ascii')]
+
+
+def decode_block(data: str) -> str:
+    return zlib.decompress(base64.b64decode(data)).decode('utf-8')
+
+
+def page_range(page_offsets: List[List[int]], first_page: int, last_page: int) -> Tuple[int, int]:
+    """Character range [start, end) covering 1-based pages first_page..last_page."""
+    if not page_offsets:
+        raise ValueError("Document has no page index")
+    first = min(max(first_page, 1), len(page_offsets))
+    last = min(max(last_page, first), len(page_offsets))
+    return page_offsets[first - 1][0], page_offsets[last - 1][1]
+
+
+class TextStore:
+    """
+    Extracted text for file blobs, stored as zlib-compressed fixed-size
+    character blocks in file_text_blocks. A character (or page) range only
+    fetches and decompresses the blocks it overlaps. Whole documents read
+    recently are kept decompressed in a byte-bounded in-process LRU.
+    """
+
+    def __init__(
+        self,
+        block_chars: Optional[int] = None,
+        cache_max_bytes: Optional[int] = None,
+        cache_ttl_seconds: Optional[int] = None
+    ):
+        self.block_chars = block_chars or settings.TEXT_BLOCK_CHARS
+        self._cache: TTLCache[str] = TTLCache(
+            ttl_seconds=cache_ttl_seconds or settings.TEXT_CACHE_TTL_SECONDS,
+            max_bytes=cache_max_bytes or settings.TEXT_CACHE_MAX_BYTES
+        )
+        self.blocks_read = 0
+
+    async def save(self, sha256: str, text: str) -> Dict[str, int]:
+        """Write (or overwrite) the blocks for a blob; returns the layout to store on the blob."""
+        blocks = await asyncio.to_thread(encode_blocks, text, self.block_chars, settings.TEXT_COMPRESSION_LEVEL)
+        rows = [
+            {'sha256': sha256, 'block_index': index, 'data': data}
+            for index, data in enumerate(blocks)
+        ]
+        # Identical uploads racing each other write the same rows
+        await db_execute(
+            supabase_admin.table('file_text_blocks').upsert(rows, on_conflict='sha256,block_index')
+        )
+        compressed = sum(len(data) for data in blocks)
+        logger.info(
+            f"Stored {len(text)} chars for blob {sha256} in {len(blocks)} blocks "
+            f"({compressed} bytes encoded, {compressed / max(1, len(text.encode('utf-8'))):.0%} of original)"
+        )
+        self._cache.set(sha256, text)
+        return {'text_length': len(text), 'block_chars': self.block_chars}
+
+    def evict(self, sha256: str) -> None:
+        self._cache.pop(sha256)
+
+    async def delete(self, sha256: str) -> None:
+        self.evict(sha256)
+        await db_execute(supabase_admin.table('file_text_blocks').delete().eq('sha256', sha256))
+
+    async def get_text(self, sha256: str) -> str:
+        cached = self._cache.get(sha256)
+        if cached is not None:
+            return cached
+        text = await self._read_blocks(sha256)
+        self._cache.set(sha256, text)
+        return text
+
+    async def get_range(
+        self,
+        sha256: str,
+        start: int,
+        end: int,
+        text_length: int,
+        block_chars: Optional[int] = None
+    ) -> str:
+        """Characters [start, end) of a blob's text."""
+        start = max(0, start)
+        end = min(end, text_length)
+        if start >= end:
+            return ""
+        cached = self._cache.get(sha256)
+        if cached is not None:
+            return cached[start:end]
+
+        block_chars = block_chars or self.block_chars
+        first_block, last_block = start // block_chars, (end - 1) // block_chars
+        text = await self._read_blocks(sha256, first_block, last_block)
+        offset = first_block * block_chars
+        return text[start - offset:end - offset]
+
+    async def _read_blocks(
+        self,
+        sha256: str,
+        first_block: Optional[int] = None,
+        last_block: Optional[int] = None
+    ) -> str:
+        query = supabase_admin.table('file_text_blocks').select('block_index, data').eq('sha256', sha256)
+        if first_block is not None:
+            query = query.gte('block_index', first_block).lte('block_index', last_block)
+        result = await db_execute(query.order('block_index'))
+        rows = result.data or []
+        self.blocks_read += len(rows)
+        return await asyncio.to_thread(lambda: "".join(decode_block(row['data']) for row in rows))
+
+    def stats(self) -> Dict[str, Any]:
+        return {'blocks_read': self.blocks_read, 'cache': self._cache.stats()}
+
+
+@lru_cache()
+def get_text_store() -> TextStore:
+    return TextStore()
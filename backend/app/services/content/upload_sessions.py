@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.content.upload_spool import SpooledUpload, too_large
+
+logger = get_logger(__name__)
+
+MANIFEST = "manifest.json"
+ASSEMBLED = "assembled"
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadSessionStore:
+    """
+    Resumable uploads: init a session, PUT parts in any order (re-sending a
+    part overwrites it), then complete. Parts are streamed into a per-session
+    spool directory next to a JSON manifest, so a session survives dropped
+    connections and can report which parts are still missing.
+
+    Contiguous leading parts are appended to the assembled file (and hashed)
+    as soon as they arrive, so completing a session only has to copy the
+    tail. Sessions live on the local disk of the instance that created them.
+
+    Completing runs the caller's processing once: the result is kept in the
+    manifest until the session expires, so a repeated complete returns it.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.UPLOAD_SESSION_DIR or os.path.join(tempfile.gettempdir(), "quizcraft-upload-sessions")
+        os.makedirs(self.root, exist_ok=True)
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Running sha256 of the assembled prefix; rebuilt from disk after a restart
+        self._digests: Dict[str, Any] = {}
+
+    # --- manifest helpers ---
+
+    def _dir(self, upload_id: str) -> str:
+        return os.path.join(self.root, upload_id)
+
+    def _part_path(self, upload_id: str, part_number: int) -> str:
+        return os.path.join(self._dir(upload_id), f"part-{part_number:05d}")
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        path = os.path.join(self._dir(manifest['upload_id']), MANIFEST)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _load(self, upload_id: str, user_id: str) -> Dict[str, Any]:
+        try:
+            uuid.UUID(upload_id)
+            with open(os.path.join(self._dir(upload_id), MANIFEST)) as f:
+                manifest = json.load(f)
+        except (ValueError, OSError):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if manifest['user_id'] != user_id:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if time.time() - manifest['updated_at'] > settings.UPLOAD_SESSION_TTL_SECONDS:
+            self._remove(upload_id)
+            raise HTTPException(status_code=404, detail="Upload session expired")
+        return manifest
+
+    def _remove(self, upload_id: str) -> None:
+        self._digests.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def _sweep(self) -> None:
+        """Drop sessions that haven't received a part within the TTL."""
+        now = time.time()
+        for upload_id in os.listdir(self.root):
+            manifest_path = os.path.join(self._dir(upload_id), MANIFEST)
+            try:
+                if now - os.path.getmtime(manifest_path) > settings.UPLOAD_SESSION_TTL_SECONDS:
+                    logger.info(f"Removing expired upload session {upload_id}")
+                    self._remove(upload_id)
+            except OSError:
+                continue
+
+    @staticmethod
+    def expected_size(manifest: Dict[str, Any], part_number: int) -> int:
+        if part_number < manifest['num_parts']:
+            return manifest['part_size']
+        return manifest['total_size'] - manifest['part_size'] * (manifest['num_parts'] - 1)
+
+    @staticmethod
+    def summary(manifest: Dict[str, Any]) -> Dict[str, Any]:
+        received = sorted(int(n) for n in manifest['parts'])
+        return {
+            'upload_id': manifest['upload_id'],
+            'filename': manifest['filename'],
+            'total_size': manifest['total_size'],
+            'part_size': manifest['part_size'],
+            'num_parts': manifest['num_parts'],
+            'received_parts': received,
+            'missing_parts': [n for n in range(1, manifest['num_parts'] + 1) if str(n) not in manifest['parts']],
+            'assembled_parts': manifest['assembled_parts'],
+            'status': manifest.get('status', 'open'),
+        }
+
+    # --- protocol ---
+
+    async def init(self, user_id: str, filename: str, total_size: int, part_size: Optional[int] = None) -> Dict[str, Any]:
+        if total_size > settings.UPLOAD_RESUMABLE_MAX_SIZE:
+            raise too_large(settings.UPLOAD_RESUMABLE_MAX_SIZE)
+        await asyncio.to_thread(self._sweep)
+
+        part_size = min(max(part_size or settings.UPLOAD_PART_SIZE, settings.UPLOAD_MIN_PART_SIZE), settings.UPLOAD_MAX_PART_SIZE)
+        upload_id = str(uuid.uuid4())
+        now = time.time()
+        manifest = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'filename': filename,
+            'total_size': total_size,
+            'part_size': part_size,
+            'num_parts': max(1, -(-total_size // part_size)),
+            'parts': {},  # part number (str) -> {'size', 'sha256'}
+            'assembled_parts': 0,
+            'created_at': now,
+            'updated_at': now,
+        }
+        os.makedirs(self._dir(upload_id))
+        await asyncio.to_thread(self._write_manifest, manifest)
+        logger.info(f"Upload session {upload_id} for {filename}: {total_size} bytes in {manifest['num_parts']} parts")
+        return self.summary(manifest)
+
+    async def write_part(
+        self,
+        upload_id: str,
+        user_id: str,
+        part_number: int,
+        chunks: AsyncIterator[bytes]
+    ) -> Dict[str, Any]:
+        manifest = self._load(upload_id, user_id)
+        if manifest.get('status') == 'completed':
+            raise HTTPException(status_code=409, detail="Upload session already completed")
+        if not 1 <= part_number <= manifest['num_parts']:
+            raise HTTPException(status_code=400, detail=f"part_number must be between 1 and {manifest['num_parts']}")
+        if part_number <= manifest['assembled_parts']:
+            # Already appended to the assembled file; a resend is a no-op
+            return {'part_number': part_number, **manifest['parts'][str(part_number)], **self.summary(manifest)}
+
+        expected = self.expected_size(manifest, part_number)
+        part_path = self._part_path(upload_id, part_number)
+        tmp_path = f"{part_path}.{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as out:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > expected:
+                        raise HTTPException(status_code=413, detail=f"Part {part_number} exceeds its size of {expected} bytes")
+                    digest.update(chunk)
+                    await asyncio.to_thread(out.write, chunk)
+            if size != expected:
+                raise HTTPException(status_code=400, detail=f"Part {part_number} is {size} bytes; expected {expected}")
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        async with self._locks[upload_id]:
+            manifest = self._load(upload_id, user_id)
+            if manifest.get('status') == 'completed':
+                os.unlink(tmp_path)
+                raise HTTPException(status_code=409, detail="Upload session already completed")
+            os.replace(tmp_path, part_path)
+            manifest['parts'][str(part_number)] = {'size': size, 'sha256': digest.hexdigest()}
+            manifest['updated_at'] = time.time()
+            await asyncio.to_thread(self._assemble_prefix, manifest)
+            await asyncio.to_thread(self._write_manifest, manifest)
+        return {'part_number': part_number, 'size': size, 'sha256': digest.hexdigest(), **self.summary(manifest)}
+
+    def _assemble_prefix(self, manifest: Dict[str, Any]) -> None:
+        """Append every received part that directly follows the assembled prefix."""
+        upload_id = manifest['upload_id']
+        assembled_path = os.path.join(self._dir(upload_id), ASSEMBLED)
+        with open(assembled_path, 'ab') as out:
+            # Drop anything a crash mid-append left past the recorded prefix
+            out.truncate(min(manifest['assembled_parts'] * manifest['part_size'], manifest['total_size']))
+
+            digest = self._digests.get(upload_id)
+            if digest is None:
+                digest = hashlib.sha256()
+                with open(assembled_path, 'rb') as f:
+                    for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+                        digest.update(block)
+                self._digests[upload_id] = digest
+
+            while str(manifest['assembled_parts'] + 1) in manifest['parts']:
+                part_number = manifest['assembled_parts'] + 1
+                try:
+                    part = open(self._part_path(upload_id, part_number), 'rb')
+                except FileNotFoundError:
+                    # Lost in a crash after its manifest entry; the client re-sends it
+                    del manifest['parts'][str(part_number)]
+                    break
+                # Hash into a copy: if the copy fails part-way, the next call
+                # truncates the file back to the prefix the stored digest covers
+                part_digest = digest.copy()
+                with part:
+                    for block in iter(lambda: part.read(COPY_BUFFER_SIZE), b""):
+                        part_digest.update(block)
+                        out.write(block)
+                digest = self._digests[upload_id] = part_digest
+                os.unlink(self._part_path(upload_id, part_number))
+                manifest['assembled_parts'] += 1
+
+    async def status(self, upload_id: str, user_id: str) -> Dict[str, Any]:
+        return self.summary(self._load(upload_id, user_id))
+
+    async def complete(
+        self,
+        upload_id: str,
+        user_id: str,
+        process: Callable[[SpooledUpload], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Run process() on the assembled file once every part has arrived, and
+        return its result. Runs hold the session lock, so concurrent or
+        repeated completes wait and then get the stored result instead of
+        processing the file again. A failed run leaves the session open.
+        """
+        async with self._locks[upload_id]:
+            manifest = self._load(upload_id, user_id)
+            if manifest.get('status') == 'completed':
+                return manifest['result']
+            summary = self.summary(manifest)
+            if summary['missing_parts']:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Upload incomplete; missing parts: {summary['missing_parts'][:20]}"
+                )
+            await asyncio.to_thread(self._assemble_prefix, manifest)
+            await asyncio.to_thread(self._write_manifest, manifest)
+            digest = self._digests[upload_id]
+
+            path = os.path.join(self._dir(upload_id), ASSEMBLED)
+            size = os.path.getsize(path)
+            if size != manifest['total_size']:
+                raise HTTPException(status_code=400, detail=f"Assembled upload is {size} bytes; expected {manifest['total_size']}")
+            logger.info(f"Upload session {upload_id} complete: {size} bytes")
+
+            manifest['status'] = 'completing'
+            await asyncio.to_thread(self._write_manifest, manifest)
+
+            upload = SpooledUpload(path=path, filename=manifest['filename'], size=size, sha256=digest.hexdigest())
+            try:
+                result = await process(upload)
+            except BaseException:
+                manifest['status'] = 'open'
+                await asyncio.to_thread(self._write_manifest, manifest)
+                raise
+
+            manifest.update({'status': 'completed', 'result': result, 'updated_at': time.time()})
+            await asyncio.to_thread(self._write_manifest, manifest)
+            # The manifest stays until the session expires; the file can go now
+            self._digests.pop(upload_id, None)
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.warning(f"Could not remove assembled file of upload session {upload_id}: {repr(e)}")
+            return result
+
+    async def abort(self, upload_id: str, user_id: str) -> None:
+        # Waits for a complete that is still processing the file
+        async with self._locks[upload_id]:
+            self._load(upload_id, user_id)
+            await asyncio.to_thread(self._remove, upload_id)
+
+
+@lru_cache()
+def get_upload_session_store() -> UploadSessionStore:
+    return UploadSessionStore()
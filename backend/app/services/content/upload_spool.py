@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,  # Payload Too Large
+        detail=f"File exceeds maximum size of {max_bytes / 1024 / 1024:.1f} MB"
+    )
+
+
+class SpooledUpload:
+    """
+    An uploaded file written to a temp file on disk, with its size and
+    sha256. Extraction and storage read it as a stream, so the file is
+    never held in memory as one bytes object. Use as a context manager (or
+    call cleanup()) to remove the temp file.
+    """
+
+    def __init__(self, path: str, filename: str, size: int, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    def open(self) -> BinaryIO:
+        return open(self.path, 'rb')
+
+    def read_text(self) -> str:
+        with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+
+    def cleanup(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove spooled upload {self.path}: {repr(e)}")
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.cleanup()
+
+
+async def spool_upload(
+    file: UploadFile,
+    filename: str,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> SpooledUpload:
+    """
+    Copy an UploadFile to a spool file in fixed-size chunks, hashing as it
+    goes and rejecting with 413 as soon as the running size passes max_bytes.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_SIZE
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    # Multipart parsing already recorded the size; reject without copying
+    if file.size is not None and file.size > max_bytes:
+        raise too_large(max_bytes)
+
+    if settings.UPLOAD_SPOOL_DIR:
+        os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(
+        prefix="upload-", suffix=os.path.splitext(filename)[1], dir=settings.UPLOAD_SPOOL_DIR
+    )
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large(max_bytes)
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        raise
+
+    logger.debug(f"Spooled upload {filename} ({size} bytes) to {path}")
+    return SpooledUpload(path=path, filename=filename, size=size, sha256=digest.hexdigest())
@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.schemas.lesson import Question, Flashcard
+from app.services.rag.embeddings import EmbeddingService, get_embedding_service
+
+logger = get_logger(__name__)
+
+
+def near_duplicate_mask(embeddings: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Return a keep-mask over unit-length embeddings. Items are kept in order;
+    an item is dropped when its cosine similarity to an earlier kept item
+    exceeds threshold.
+    """
+    count = len(embeddings)
+    keep = np.ones(count, dtype=bool)
+    if count < 2:
+        return keep
+
+    # Pairwise cosine similarity; only compare each item with later ones
+    similar = np.triu(embeddings @ embeddings.T > threshold, k=1)
+    for index in range(count):
+        if keep[index]:
+            keep &= ~similar[index]
+    return keep
+
+
+class SemanticDeduplicator:
+    """Drops near-identical questions and flashcards produced by overlapping chunks."""
+
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        threshold: Optional[float] = None
+    ):
+        self._embedding_service = embedding_service
+        self.threshold = threshold if threshold is not None else settings.DEDUPE_SIMILARITY_THRESHOLD
+
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        # Loaded lazily so the model is only pulled in when dedupe actually runs
+        if self._embedding_service is None:
+            self._embedding_service = get_embedding_service()
+        return self._embedding_service
+
+    def dedupe(
+        self,
+        questions: List[Question],
+        flashcards: List[Flashcard]
+    ) -> Tuple[List[Question], List[Flashcard], Dict[str, int]]:
+        """
+        Embed all questions and flashcards in one batch and drop near
+        duplicates within each group. Earlier items win, so callers can pass
+        already-accepted items first and new candidates after them.
+        """
+        texts = [q.question_text for q in questions] + [fc.front for fc in flashcards]
+        if len(questions) < 2 and len(flashcards) < 2:
+            return questions, flashcards, {'questions_removed': 0, 'flashcards_removed': 0}
+
+        embeddings = self.embedding_service.encode(texts, normalize=True)
+        question_keep = near_duplicate_mask(embeddings[:len(questions)], self.threshold)
+        flashcard_keep = near_duplicate_mask(embeddings[len(questions):], self.threshold)
+
+        kept_questions = [q for q, keep in zip(questions, question_keep) if keep]
+        kept_flashcards = [fc for fc, keep in zip(flashcards, flashcard_keep) if keep]
+        stats = {
+            'questions_removed': len(questions) - len(kept_questions),
+            'flashcards_removed': len(flashcards) - len(kept_flashcards),
+        }
+        return kept_questions, kept_flashcards, stats
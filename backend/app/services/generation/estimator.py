@@ -0,0 +1,231 @@
+import heapq
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.schemas.lesson import GenerationRequest, GenerationMode
+from app.services.generation.pipeline import GenerationPipeline, DEFAULT_NUM_FLASHCARDS
+from app.services.llm.prompt_templates import PromptTemplates
+from app.services.llm.token_budget import count_tokens
+
+logger = get_logger(__name__)
+
+# Typical completion sizes observed for each task's JSON/markdown output
+OUTPUT_TOKENS_PER_QUESTION = 180
+OUTPUT_TOKENS_PER_FLASHCARD = 60
+OUTPUT_TOKENS_STUDY_NOTES = 1200
+OUTPUT_TOKENS_TOPIC_CONTENT = 1500
+# Study notes cover the whole document, so they take longer than a chunk job
+NOTES_LATENCY_FACTOR = 1.5
+FAST_MODE_SECONDS = 0.5
+
+
+class GenerationEstimator:
+    """
+    Dry run of /generate/: chunk the content and plan the work exactly as the
+    pipeline would, then predict LLM calls, tokens, cost and wall-clock time
+    from the provider pool's observed latencies. Makes no LLM calls.
+    """
+
+    def __init__(self, pipeline: GenerationPipeline):
+        self.pipeline = pipeline
+        self.prompts = PromptTemplates()
+
+    async def estimate(
+        self,
+        content: Optional[str],
+        request: GenerationRequest,
+        content_seconds: float = 0.0,
+        sources: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        content is None for topic requests, whose source text is itself LLM
+        generated; the estimate then assumes a typical topic article.
+        sources are the (title, content) files of a multi-file request, which
+        is planned like generate_from_sources: chunks deduped across files,
+        budget split by chunk size and one notes call per file.
+        content_seconds is the time already spent loading the content.
+        """
+        started = time.perf_counter()
+        slot = self.pipeline.pool.slots[0]
+        generator = self.pipeline.generators[slot.name]
+        model = slot.service.model_name
+        calls = 0
+        input_tokens = 0
+        output_tokens = 0
+        cached_input_tokens = 0
+        topic_seconds = 0.0
+
+        # Notes calls as (prefix, prefix tokens); chunk jobs as
+        # (prefix, prefix tokens, focus tokens, questions, flashcards)
+        notes_calls: List[Tuple[Any, int]] = []
+        chunk_jobs: List[Tuple[Any, int, int, int, int]] = []
+        prefix_overhead = count_tokens(self.prompts.content_prefix(""), model)
+        if content is None:
+            calls += 1
+            input_tokens += count_tokens(self.prompts.generate_topic_content_prompt(request.topic or ""), model)
+            output_tokens += OUTPUT_TOKENS_TOPIC_CONTENT
+            topic_seconds = self._slot_latency(slot)
+            # Assume a typical topic article split into full-size chunks
+            content_tokens = OUTPUT_TOKENS_TOPIC_CONTENT
+            stride = max(1, settings.CHUNK_MAX_TOKENS - settings.CHUNK_OVERLAP_TOKENS)
+            num_chunks = max(1, -(-content_tokens // stride))
+            plan = self.pipeline.plan(num_chunks, request.max_questions)
+            chunk_tokens = min(settings.CHUNK_MAX_TOKENS, content_tokens)
+            notes_prefix_tokens = prefix_overhead + content_tokens
+            notes_calls.append(("notes", notes_prefix_tokens))
+            for index in range(num_chunks):
+                if slot.service.can_share_prefix(notes_prefix_tokens, model):
+                    focus_tokens = count_tokens(self.prompts.focus_section(""), model) + chunk_tokens
+                    prefix_key, prefix_tokens = "notes", notes_prefix_tokens
+                else:
+                    focus_tokens = 0
+                    prefix_key, prefix_tokens = index, prefix_overhead + chunk_tokens
+                chunk_jobs.append((
+                    prefix_key, prefix_tokens, focus_tokens,
+                    plan['questions_per_chunk'], plan['flashcards_per_chunk']
+                ))
+        else:
+            if sources and len(sources) > 1:
+                documents = [text for _, text in sources]
+                assignments = await self.pipeline.plan_sources(sources, request.max_questions)
+            else:
+                documents = [content]
+                chunks = await self.pipeline.content_analyzer.chunk_content(content) or []
+                plan = self.pipeline.plan(len(chunks), request.max_questions)
+                assignments = [
+                    (chunk, plan['questions_per_chunk'], plan['flashcards_per_chunk'], content) for chunk in chunks
+                ]
+            content_tokens = sum(count_tokens(document, model) for document in documents)
+            for document in documents:
+                notes_prefix = self.prompts.content_prefix(self.prompts.fit_content(document, model))
+                notes_calls.append((notes_prefix, count_tokens(notes_prefix, model)))
+            for chunk, num_questions, num_flashcards, document in assignments:
+                prefix, focus = generator.task_prefix(chunk, document)
+                chunk_jobs.append((
+                    prefix, count_tokens(prefix, model), count_tokens(focus, model), num_questions, num_flashcards
+                ))
+        num_chunks = len(chunk_jobs)
+
+        # prefix -> (tokens, calls); every call after the first to send a
+        # cacheable prefix reads it from the provider's cache
+        prefix_calls: Dict[Any, Tuple[int, int]] = {}
+
+        def send_prefix(prefix: Any, tokens: int, count: int) -> None:
+            prefix_calls[prefix] = (tokens, prefix_calls.get(prefix, (tokens, 0))[1] + count)
+
+        # Study notes: one call over each whole (fitted) document
+        notes_task_tokens = count_tokens(self.prompts.study_notes_task(), model)
+        for notes_prefix, notes_prefix_tokens in notes_calls:
+            calls += 1
+            input_tokens += notes_prefix_tokens + notes_task_tokens
+            output_tokens += OUTPUT_TOKENS_STUDY_NOTES
+            send_prefix(notes_prefix, notes_prefix_tokens, 1)
+
+        # Per chunk: a questions call and a flashcards call sharing one prefix
+        # (the whole document's when it is shared), each naming the chunk in its focus
+        for prefix, prefix_tokens, focus_tokens, num_questions, num_flashcards in chunk_jobs:
+            if num_questions:
+                calls += 1
+                input_tokens += prefix_tokens + focus_tokens + count_tokens(
+                    self.prompts.questions_task(num_questions, request.difficulty.value, request.question_type.value),
+                    model
+                )
+                output_tokens += num_questions * OUTPUT_TOKENS_PER_QUESTION
+                send_prefix(prefix, prefix_tokens, 1)
+            if num_flashcards:
+                calls += 1
+                input_tokens += prefix_tokens + focus_tokens + count_tokens(
+                    self.prompts.flashcards_task(num_flashcards), model
+                )
+                output_tokens += num_flashcards * OUTPUT_TOKENS_PER_FLASHCARD
+                send_prefix(prefix, prefix_tokens, 1)
+
+        cache_min_tokens = slot.service.cache_min_tokens(model)
+        if settings.PROMPT_CACHE_ENABLED:
+            cached_input_tokens = sum(
+                tokens * (count - 1)
+                for tokens, count in prefix_calls.values()
+                if tokens >= cache_min_tokens
+            )
+
+        generation_seconds = self._simulate(num_chunks, num_notes=len(notes_calls))
+        llm_estimate = {
+            'llm_calls': calls,
+            'input_tokens': input_tokens,
+            'cached_input_tokens': cached_input_tokens,
+            'output_tokens': output_tokens,
+            'estimated_cost_usd': self._cost(model, input_tokens, output_tokens),
+        }
+
+        # Multi-file budgets are split by chunk size, so report the largest share
+        estimate = {
+            'mode': request.mode.value,
+            'content_tokens': content_tokens,
+            'num_chunks': num_chunks,
+            'questions_per_chunk': max((job[3] for job in chunk_jobs), default=0),
+            'flashcards_per_chunk': max((job[4] for job in chunk_jobs), default=0),
+            'expected_questions': min(request.max_questions, sum(job[3] for job in chunk_jobs)),
+            'expected_flashcards': min(DEFAULT_NUM_FLASHCARDS, sum(job[4] for job in chunk_jobs)),
+            'estimated_seconds': round(content_seconds + topic_seconds + generation_seconds, 1),
+            'providers': [
+                {
+                    'name': slot.name,
+                    'concurrency': slot.concurrency,
+                    'latency_seconds': round(self._slot_latency(slot), 2),
+                    'observed': slot.latency_ewma is not None,
+                }
+                for slot in self.pipeline.pool.slots
+            ],
+        }
+        if request.mode == GenerationMode.FAST:
+            # Fast mode answers without the LLM; the pipeline runs afterwards
+            estimate.update({
+                'llm_calls': 0,
+                'input_tokens': 0,
+                'cached_input_tokens': 0,
+                'output_tokens': 0,
+                'estimated_cost_usd': 0.0,
+                'estimated_seconds': round(content_seconds + FAST_MODE_SECONDS, 1),
+                'background': {**llm_estimate, 'estimated_seconds': estimate['estimated_seconds']},
+            })
+        else:
+            estimate.update(llm_estimate)
+        estimate['estimate_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return estimate
+
+    @staticmethod
+    def _slot_latency(slot) -> float:
+        return slot.latency_ewma or settings.LLM_DEFAULT_JOB_LATENCY_SECONDS
+
+    def _simulate(self, num_chunks: int, num_notes: int = 1) -> float:
+        """
+        Replay the pipeline's scheduling: the notes jobs (one per source)
+        first, then chunk jobs, each taken by whichever worker frees up first.
+        """
+        workers: List[Tuple[float, int, int, float]] = []
+        for index, slot in enumerate(self.pipeline.pool.slots):
+            # A provider cooling down only starts taking jobs once it recovers
+            start = slot.cooldown_remaining()
+            for worker in range(slot.concurrency):
+                workers.append((start, index, worker, self._slot_latency(slot)))
+        heapq.heapify(workers)
+
+        finished = 0.0
+        durations = [NOTES_LATENCY_FACTOR] * num_notes + [1.0] * num_chunks
+        for factor in durations:
+            free_at, index, worker, latency = heapq.heappop(workers)
+            done = free_at + latency * factor
+            finished = max(finished, done)
+            heapq.heappush(workers, (done, index, worker, latency))
+        return finished
+
+    @staticmethod
+    def _cost(model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+        """USD cost from LLM_MODEL_PRICES (per million tokens); None if unpriced."""
+        prices = settings.LLM_MODEL_PRICES.get(model)
+        if not prices:
+            return None
+        cost = (input_tokens * prices.get('input', 0) + output_tokens * prices.get('output', 0)) / 1_000_000
+        return round(cost, 4)
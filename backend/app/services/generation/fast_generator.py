@@ -0,0 +1,164 @@
+import asyncio
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.core.logging import get_logger
+from app.schemas.lesson import (
+    GenerationRequest, Question, Flashcard, QuestionType, DifficultyLevel, BloomLevel
+)
+from app.services.content.chunker import iter_blocks, split_sentences
+from app.services.generation.pipeline import DEFAULT_NUM_FLASHCARDS
+
+logger = get_logger(__name__)
+
+BLANK = "_____"
+MIN_SENTENCE_WORDS = 6
+MAX_SENTENCE_WORDS = 45
+# Keeps TF-IDF well under a second on book-length uploads
+MAX_SENTENCES = 5000
+SUMMARY_SENTENCES = 6
+
+
+class FastGenerator:
+    """
+    LLM-free lesson generation: picks key terms with TF-IDF and turns the
+    sentences that best explain them into cloze flashcards and
+    fill-in-the-blank questions.
+    """
+
+    async def generate(self, content: str, request: GenerationRequest) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.generate_sync, content, request)
+
+    def generate_sync(self, content: str, request: GenerationRequest) -> Dict[str, Any]:
+        sentences = self._sentences(content)
+        if len(sentences) < 2:
+            return {'questions': [], 'flashcards': [], 'study_notes': ""}
+
+        try:
+            terms, sentence_scores, matrix, vocabulary = self._rank(sentences)
+        except ValueError as e:
+            # Only stop words, too-short or non-Latin words: nothing to rank
+            logger.info(f"Fast mode found no key terms: {repr(e)}")
+            return {'questions': [], 'flashcards': [], 'study_notes': ""}
+        pairs = self._pick_pairs(
+            sentences, terms, sentence_scores, matrix, vocabulary,
+            limit=max(request.max_questions, DEFAULT_NUM_FLASHCARDS)
+        )
+
+        difficulty = (
+            request.difficulty if request.difficulty != DifficultyLevel.MIXED
+            else DifficultyLevel.MEDIUM
+        )
+        questions = [
+            Question(
+                question_text=f"Fill in the blank: {cloze}",
+                question_type=QuestionType.FILL_BLANK,
+                difficulty=difficulty,
+                bloom_level=BloomLevel.REMEMBER,
+                options=[],
+                correct_answer=answer,
+                explanation=sentence,
+            )
+            for cloze, answer, sentence in pairs[:request.max_questions]
+        ]
+        flashcards = [
+            Flashcard(front=cloze, back=answer)
+            for cloze, answer, _ in pairs[:DEFAULT_NUM_FLASHCARDS]
+        ]
+        study_notes = self._study_notes(sentences, sentence_scores, pairs)
+
+        logger.info(f"Fast mode: {len(questions)} questions, {len(flashcards)} flashcards from {len(sentences)} sentences")
+        return {'questions': questions, 'flashcards': flashcards, 'study_notes': study_notes}
+
+    @staticmethod
+    def _sentences(content: str) -> List[str]:
+        sentences = []
+        for block, heading in iter_blocks(content):
+            if heading:
+                continue
+            for sentence in split_sentences(block):
+                if MIN_SENTENCE_WORDS <= len(sentence.split()) <= MAX_SENTENCE_WORDS:
+                    sentences.append(sentence)
+                    if len(sentences) >= MAX_SENTENCES:
+                        return sentences
+        return sentences
+
+    @staticmethod
+    def _rank(sentences: List[str]) -> Tuple[List[str], np.ndarray, Any, Dict[str, int]]:
+        """Return terms by document-wide TF-IDF weight, plus per-sentence scores."""
+        vectorizer = TfidfVectorizer(
+            stop_words='english',
+            ngram_range=(1, 2),
+            token_pattern=r"(?u)\b[a-zA-Z][a-zA-Z\-]{2,}\b",
+            sublinear_tf=True,
+            max_features=5000
+        )
+        matrix = vectorizer.fit_transform(sentences)
+        term_scores = np.asarray(matrix.sum(axis=0)).ravel()
+        sentence_scores = np.asarray(matrix.sum(axis=1)).ravel()
+        names = vectorizer.get_feature_names_out()
+        terms = [names[index] for index in np.argsort(-term_scores)]
+        return terms, sentence_scores, matrix, vectorizer.vocabulary_
+
+    @staticmethod
+    def _pick_pairs(
+        sentences: List[str],
+        terms: List[str],
+        sentence_scores: np.ndarray,
+        matrix: Any,
+        vocabulary: Dict[str, int],
+        limit: int
+    ) -> List[Tuple[str, str, str]]:
+        """Pick (cloze, answer, source sentence) triples, one sentence per term."""
+        matrix = matrix.tocsc()
+        chosen_terms: List[str] = []
+        used_sentences = set()
+        pairs = []
+
+        for term in terms:
+            if len(pairs) >= limit:
+                break
+            # Skip terms that overlap one already used ("cell" vs "cell membrane")
+            words = set(term.split())
+            if any(words & set(chosen.split()) for chosen in chosen_terms):
+                continue
+
+            column = matrix.getcol(vocabulary[term])
+            candidates = [index for index in column.indices if index not in used_sentences]
+            if not candidates:
+                continue
+
+            best = max(candidates, key=lambda index: sentence_scores[index])
+            sentence = sentences[best]
+            pattern = r'\s+'.join(re.escape(word) for word in term.split())
+            match = re.search(rf"\b{pattern}\b", sentence, re.IGNORECASE)
+            if not match:
+                continue
+
+            cloze = sentence[:match.start()] + BLANK + sentence[match.end():]
+            pairs.append((cloze, match.group(0), sentence))
+            chosen_terms.append(term)
+            used_sentences.add(best)
+
+        return pairs
+
+    @staticmethod
+    def _study_notes(
+        sentences: List[str],
+        sentence_scores: np.ndarray,
+        pairs: List[Tuple[str, str, str]]
+    ) -> str:
+        """Extractive notes: key terms with their defining sentence, then a summary."""
+        # Normalise by length so long sentences don't dominate the summary
+        lengths = np.array([len(sentence.split()) for sentence in sentences])
+        ranked = np.argsort(-(sentence_scores / np.sqrt(lengths)))[:SUMMARY_SENTENCES]
+
+        lines = ["## Key Terms", ""]
+        lines += [f"- **{answer}**: {sentence}" for _, answer, sentence in pairs]
+        lines += ["", "## Summary", ""]
+        lines += [f"- {sentences[index]}" for index in sorted(ranked)]
+        return "\n".join(lines)
+
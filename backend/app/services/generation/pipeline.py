@@ -0,0 +1,461 @@
+import asyncio
+import hashlib
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import LLMProviderError
+from app.core.logging import get_logger
+from app.schemas.lesson import GenerationRequest, Question, Flashcard
+from app.services.content.content_analyzer import ContentAnalyzer
+from app.services.generation.dedupe import SemanticDeduplicator
+from app.services.llm.provider_pool import ProviderPool, ProviderSlot, get_provider_pool
+from app.services.llm.question_generator import QuestionGeneratorService
+
+logger = get_logger(__name__)
+
+DEFAULT_NUM_FLASHCARDS = 10
+NOTES_FAILED = "Failed to generate notes."
+# How often a background pipeline checks whether interactive jobs have finished
+BACKGROUND_POLL_SECONDS = 0.5
+
+
+def allocate(total: int, weights: List[int]) -> List[int]:
+    """Split total into integer shares proportional to weights (largest remainder)."""
+    weight_sum = sum(weights)
+    if not weights or weight_sum <= 0:
+        return [0] * len(weights)
+    exact = [total * weight / weight_sum for weight in weights]
+    shares = [int(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - shares[i], reverse=True)
+    for i in by_remainder[:total - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def _job_results(q_res: Any, fc_res: Any, q_label: str, fc_label: str) -> Tuple[Any, Any]:
+    """
+    Unpack gathered question/flashcard results, logging failures as empty.
+    When neither produced anything and a provider error was among the
+    failures, it is raised so the scheduler can cool that provider down.
+    """
+    provider_error = next((res for res in (q_res, fc_res) if isinstance(res, LLMProviderError)), None)
+    if isinstance(q_res, Exception):
+        logger.error(f"{q_label}: {q_res}")
+        q_res = []
+    if isinstance(fc_res, Exception):
+        logger.error(f"{fc_label}: {fc_res}")
+        fc_res = []
+    if provider_error is not None and not q_res and not fc_res:
+        raise provider_error
+    return q_res, fc_res
+
+
+class JobFailedError(Exception):
+    """
+    A generation job produced nothing usable. It is retried on another
+    provider, but unlike a provider error it does not cool this one down.
+    """
+
+
+class _Job:
+    """A unit of LLM work that any provider slot can run."""
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[QuestionGeneratorService], Awaitable[Any]],
+        fallback: Any
+    ):
+        self.name = name
+        self.run = run
+        self.fallback = fallback
+        self.attempts = 0
+        # Slots this job has failed on; retries go elsewhere while possible
+        self.failed_on: Set[str] = set()
+
+
+class GenerationPipeline:
+    """
+    Chunk -> plan -> generate pipeline behind /generate/.
+
+    Chunk jobs go on a shared queue drained by workers of every configured
+    provider (LLM_SHARD_PROVIDERS). Each provider runs as many workers as its
+    concurrency allows, so faster and higher-capacity providers pull more
+    chunks. A failed job is retried on a provider it has not failed on; a
+    provider that errors (rate limit, outage) also cools down for a while.
+
+    A background pipeline (speculative generation) starts each job only
+    once no interactive job is in flight on the pool, so it gives way to
+    user requests between jobs, not just before it starts.
+    """
+
+    def __init__(
+        self,
+        content_analyzer: Optional[ContentAnalyzer] = None,
+        pool: Optional[ProviderPool] = None,
+        deduplicator: Optional[SemanticDeduplicator] = None,
+        background: bool = False
+    ):
+        self.content_analyzer = content_analyzer or ContentAnalyzer()
+        self.pool = pool or get_provider_pool()
+        self.deduplicator = deduplicator or SemanticDeduplicator()
+        self.background = background
+        self.generators = {
+            slot.name: QuestionGeneratorService(slot.service) for slot in self.pool.slots
+        }
+
+    @staticmethod
+    def plan(num_chunks: int, max_questions: int, num_flashcards: int = DEFAULT_NUM_FLASHCARDS) -> Dict[str, int]:
+        """Decide how many questions/flashcards to request per chunk."""
+        questions_per_chunk = 1
+        flashcards_per_chunk = 1
+        if num_chunks > 0:
+            questions_per_chunk = max(1, max_questions // num_chunks)
+            flashcards_per_chunk = max(1, num_flashcards // num_chunks)
+        return {
+            'num_chunks': num_chunks,
+            'questions_per_chunk': questions_per_chunk,
+            'flashcards_per_chunk': flashcards_per_chunk,
+        }
+
+    async def generate(self, content: str, request: GenerationRequest) -> Dict[str, Any]:
+        """Chunk content and generate questions, flashcards and study notes."""
+        chunks = await self.content_analyzer.chunk_content(content) or []
+        return await self.generate_from_chunks(content, chunks, request)
+
+    async def generate_from_chunks(
+        self,
+        content: str,
+        chunks: List[str],
+        request: GenerationRequest
+    ) -> Dict[str, Any]:
+        plan = self.plan(len(chunks), request.max_questions)
+        assignments = [
+            (chunk, plan['questions_per_chunk'], plan['flashcards_per_chunk'], content) for chunk in chunks
+        ]
+        return await self._generate([(None, content)], assignments, request)
+
+    async def generate_from_sources(
+        self,
+        sources: List[Tuple[str, str]],
+        request: GenerationRequest
+    ) -> Dict[str, Any]:
+        """One lesson from several (title, content) sources; see plan_sources."""
+        assignments = await self.plan_sources(sources, request.max_questions)
+        return await self._generate(sources, assignments, request)
+
+    async def plan_sources(
+        self,
+        sources: List[Tuple[str, str]],
+        max_questions: int,
+        num_flashcards: int = DEFAULT_NUM_FLASHCARDS
+    ) -> List[Tuple[str, int, int, str]]:
+        """
+        Chunk several (title, content) sources concurrently, drop chunks
+        repeated across sources, and split the question/flashcard budget over
+        all chunks in proportion to their size. Returns (chunk, questions,
+        flashcards, source document) for every chunk that gets any work.
+        """
+        chunk_lists = await asyncio.gather(
+            *(self.content_analyzer.chunk_content(content) for _, content in sources)
+        )
+
+        # (chunk, the source document it came from)
+        chunks: List[Tuple[str, str]] = []
+        seen = set()
+        for (_, content), chunk_list in zip(sources, chunk_lists):
+            for chunk in chunk_list or []:
+                # Shared cover pages, syllabus boilerplate, re-uploaded chapters
+                key = hashlib.sha1(" ".join(chunk.lower().split()).encode('utf-8')).digest()
+                if key not in seen:
+                    seen.add(key)
+                    chunks.append((chunk, content))
+        duplicates = sum(len(chunk_list or []) for chunk_list in chunk_lists) - len(chunks)
+        if duplicates:
+            logger.info(f"Dropped {duplicates} chunks repeated across {len(sources)} sources")
+
+        weights = [len(chunk) for chunk, _ in chunks]
+        question_counts = allocate(max_questions, weights)
+        flashcard_counts = allocate(num_flashcards, weights)
+        return [
+            (chunk, num_questions, num_flashcards, document)
+            for (chunk, document), num_questions, num_flashcards in zip(chunks, question_counts, flashcard_counts)
+            if num_questions or num_flashcards
+        ]
+
+    async def _generate(
+        self,
+        sources: List[Tuple[Optional[str], str]],
+        assignments: List[Tuple[str, int, int, str]],
+        request: GenerationRequest
+    ) -> Dict[str, Any]:
+        """
+        Run notes jobs (one per source) and chunk jobs on the provider pool.
+        Each assignment is (chunk, questions, flashcards, source document); chunk
+        tasks share the document's cached prefix when the provider allows it.
+        """
+        logger.info(
+            f"Processing {len(assignments)} chunks across {len(self.pool.slots)} provider(s): "
+            f"{', '.join(slot.name for slot in self.pool.slots)}"
+        )
+
+        # Study notes cover the whole document and take longest; queue them first.
+        jobs = [self._notes_job(content) for _, content in sources]
+        jobs += [
+            self._chunk_job(index, chunk, num_questions, num_flashcards, request, document)
+            for index, (chunk, num_questions, num_flashcards, document) in enumerate(assignments)
+        ]
+
+        started = time.perf_counter()
+        results = await self._run_sharded(jobs)
+        logger.info(f"Generated content for {len(assignments)} chunks in {time.perf_counter() - started:.1f}s")
+
+        study_notes = self._combine_notes(sources, results[:len(sources)])
+        all_questions: List[Question] = []
+        all_flashcards: List[Flashcard] = []
+        for questions, flashcards in results[len(sources):]:
+            all_questions.extend(questions)
+            all_flashcards.extend(flashcards)
+
+        # Overlapping chunks tend to yield the same item twice
+        content = "\n\n".join(content for _, content in sources)
+        all_questions, all_flashcards = await self._dedupe(content, request, all_questions, all_flashcards)
+
+        return {
+            'questions': all_questions,
+            'flashcards': all_flashcards,
+            'study_notes': study_notes,
+        }
+
+    @staticmethod
+    def _combine_notes(sources: List[Tuple[Optional[str], str]], notes: List[str]) -> str:
+        if len(sources) == 1:
+            return notes[0]
+        sections = [
+            f"# {title}\n\n{section}"
+            for (title, _), section in zip(sources, notes)
+            if section != NOTES_FAILED
+        ]
+        return "\n\n".join(sections) if sections else NOTES_FAILED
+
+    def _notes_job(self, content: str) -> _Job:
+        async def run(generator: QuestionGeneratorService) -> str:
+            notes = await generator.generate_study_notes(content=content)
+            if not isinstance(notes, str) or notes.startswith("Error:"):
+                raise JobFailedError("study notes generation failed")
+            return notes
+
+        return _Job("study_notes", run, fallback=NOTES_FAILED)
+
+    def _chunk_job(
+        self,
+        index: int,
+        chunk: str,
+        num_questions: int,
+        num_flashcards: int,
+        request: GenerationRequest,
+        document: Optional[str] = None
+    ) -> _Job:
+        async def run(generator: QuestionGeneratorService):
+            # Run Q and FC generation in parallel for this chunk
+            q_res, fc_res = await asyncio.gather(
+                generator.generate_questions(
+                    content=chunk,
+                    num_questions=num_questions,
+                    difficulty=request.difficulty,
+                    question_type=request.question_type,
+                    document=document
+                ) if num_questions else asyncio.sleep(0, result=[]),
+                generator.generate_flashcards(
+                    content=chunk,
+                    num_flashcards=num_flashcards,
+                    document=document
+                ) if num_flashcards else asyncio.sleep(0, result=[]),
+                return_exceptions=True
+            )
+            q_res, fc_res = _job_results(q_res, fc_res, "Question Error", "Flashcard Error")
+            if not q_res and not fc_res:
+                raise JobFailedError(f"chunk {index} produced no content")
+            return q_res, fc_res
+
+        return _Job(f"chunk_{index}", run, fallback=([], []))
+
+    async def _dedupe(
+        self,
+        content: str,
+        request: GenerationRequest,
+        questions: List[Question],
+        flashcards: List[Flashcard]
+    ) -> Tuple[List[Question], List[Flashcard]]:
+        """Drop near-duplicates and top up with one replacement job if we fell below target."""
+        if not settings.DEDUPE_ENABLED:
+            return questions, flashcards
+
+        try:
+            kept_questions, kept_flashcards, stats = await asyncio.to_thread(
+                self.deduplicator.dedupe, questions, flashcards
+            )
+        except Exception as e:
+            logger.warning(f"Skipping near-duplicate removal: {repr(e)}")
+            return questions, flashcards
+
+        if not stats['questions_removed'] and not stats['flashcards_removed']:
+            return kept_questions, kept_flashcards
+        logger.info(
+            f"Removed {stats['questions_removed']} duplicate questions and "
+            f"{stats['flashcards_removed']} duplicate flashcards"
+        )
+
+        # Only ask for replacements when dedupe took us below what was requested
+        missing_questions = min(
+            stats['questions_removed'], max(0, request.max_questions - len(kept_questions))
+        )
+        missing_flashcards = min(
+            stats['flashcards_removed'], max(0, DEFAULT_NUM_FLASHCARDS - len(kept_flashcards))
+        )
+        if not missing_questions and not missing_flashcards:
+            return kept_questions, kept_flashcards
+
+        new_questions, new_flashcards = (await self._run_sharded([
+            self._replacement_job(content, request, missing_questions, missing_flashcards)
+        ]))[0]
+        if not new_questions and not new_flashcards:
+            return kept_questions, kept_flashcards
+
+        # Kept items come first, so only replacements that duplicate them are dropped
+        try:
+            questions, flashcards, _ = await asyncio.to_thread(
+                self.deduplicator.dedupe,
+                kept_questions + new_questions,
+                kept_flashcards + new_flashcards
+            )
+        except Exception as e:
+            logger.warning(f"Skipping near-duplicate check on replacements: {repr(e)}")
+            questions, flashcards = kept_questions + new_questions, kept_flashcards + new_flashcards
+
+        questions = questions[:len(kept_questions) + missing_questions]
+        flashcards = flashcards[:len(kept_flashcards) + missing_flashcards]
+        logger.info(
+            f"Added {len(questions) - len(kept_questions)} replacement questions and "
+            f"{len(flashcards) - len(kept_flashcards)} replacement flashcards"
+        )
+        return questions, flashcards
+
+    def _replacement_job(
+        self,
+        content: str,
+        request: GenerationRequest,
+        num_questions: int,
+        num_flashcards: int
+    ) -> _Job:
+        async def run(generator: QuestionGeneratorService):
+            q_res, fc_res = await asyncio.gather(
+                generator.generate_questions(
+                    content=content,
+                    num_questions=num_questions,
+                    difficulty=request.difficulty,
+                    question_type=request.question_type
+                ) if num_questions else asyncio.sleep(0, result=[]),
+                generator.generate_flashcards(
+                    content=content,
+                    num_flashcards=num_flashcards
+                ) if num_flashcards else asyncio.sleep(0, result=[]),
+                return_exceptions=True
+            )
+            return _job_results(q_res, fc_res, "Replacement Question Error", "Replacement Flashcard Error")
+
+        return _Job("replacements", run, fallback=([], []))
+
+    async def _yield_to_interactive(self) -> None:
+        while any(slot.interactive_in_flight() for slot in self.pool.slots):
+            await asyncio.sleep(BACKGROUND_POLL_SECONDS)
+
+    async def _run_sharded(self, jobs: List[_Job]) -> List[Any]:
+        """
+        Run jobs on all provider slots and return results in job order.
+
+        Workers stay up until every job has succeeded or used its attempts,
+        so a retry queued late is still picked up by every provider.
+        """
+        results: List[Any] = [job.fallback for job in jobs]
+        waiting: Deque[int] = deque(range(len(jobs)))
+        unresolved = len(jobs)
+        changed = asyncio.Condition()
+        slot_names = {slot.name for slot in self.pool.slots}
+
+        def take(slot: ProviderSlot) -> Optional[int]:
+            """Next waiting job for slot, skipping ones it already failed unless every slot has."""
+            for index in waiting:
+                failed_on = jobs[index].failed_on
+                if slot.name not in failed_on or slot_names <= failed_on:
+                    waiting.remove(index)
+                    return index
+            return None
+
+        async def next_job(slot: ProviderSlot) -> Optional[int]:
+            async with changed:
+                while unresolved:
+                    cooldown = slot.cooldown_remaining()
+                    if cooldown <= 0:
+                        index = take(slot)
+                        if index is not None:
+                            return index
+                    # Wait for a retry to be queued, or for this slot to cool down
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=min(cooldown, 1.0) if cooldown > 0 else None)
+                    except asyncio.TimeoutError:
+                        pass
+                return None
+
+        async def worker(slot: ProviderSlot):
+            nonlocal unresolved
+            generator = self.generators[slot.name]
+            while True:
+                if self.background:
+                    await self._yield_to_interactive()
+                index = await next_job(slot)
+                if index is None:
+                    return
+
+                job = jobs[index]
+                job.attempts += 1
+                retry = False
+                slot.in_flight += 1
+                if self.background:
+                    slot.background_in_flight += 1
+                started = time.perf_counter()
+                try:
+                    results[index] = await job.run(generator)
+                    slot.record_success(time.perf_counter() - started)
+                except Exception as e:
+                    job.failed_on.add(slot.name)
+                    # Only this call's own provider error cools the slot down
+                    if isinstance(e, LLMProviderError):
+                        slot.record_failure()
+                    retry = job.attempts < settings.LLM_JOB_MAX_ATTEMPTS
+                    if retry:
+                        where = "another provider" if not slot_names <= job.failed_on else "the same provider"
+                        logger.warning(f"{job.name} failed on {slot.name} ({e}); retrying on {where}")
+                    else:
+                        logger.error(f"{job.name} failed after {job.attempts} attempts: {e}")
+                finally:
+                    slot.in_flight -= 1
+                    if self.background:
+                        slot.background_in_flight -= 1
+
+                async with changed:
+                    if retry:
+                        waiting.append(index)
+                    else:
+                        unresolved -= 1
+                    changed.notify_all()
+
+        workers = [
+            worker(slot)
+            for slot in self.pool.slots
+            for _ in range(slot.concurrency)
+        ]
+        await asyncio.gather(*workers)
+        return results
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.schemas.lesson import (
+    GenerationRequest, GenerationSource, GenerationMode, QuestionType, DifficultyLevel
+)
+from app.services.generation.pipeline import GenerationPipeline, NOTES_FAILED
+from app.utils.cache import TTLCache
+
+logger = get_logger(__name__)
+
+# How often to check whether interactive generation has left the providers idle
+IDLE_POLL_SECONDS = 0.5
+
+
+def default_request(file_id: str) -> GenerationRequest:
+    """The lesson most users ask for right after uploading."""
+    return GenerationRequest(
+        source_type=GenerationSource.UPLOAD,
+        file_id=file_id,
+        question_type=QuestionType.MIXED,
+        difficulty=DifficultyLevel.MEDIUM,
+    )
+
+
+def _params(request: GenerationRequest) -> Tuple[Any, ...]:
+    """Everything that changes the generated lesson, apart from the source."""
+    return (
+        request.question_type,
+        request.difficulty,
+        request.max_questions,
+        request.ai_model,
+        tuple(request.bloom_levels or ()),
+        request.custom_instructions or "",
+    )
+
+
+class SpeculativeGenerator:
+    """
+    Pre-generates the default lesson for a freshly uploaded file while the
+    user is still on the upload screen. Runs one job at a time, only when
+    the provider pool has no interactive work in flight, within a per-user
+    budget charged when a run actually starts generating. Its pipeline runs
+    in the background, so it also pauses between generation jobs while user
+    requests are in flight. /generate/ takes the result (or awaits the
+    in-progress run) when its parameters match the default.
+    """
+
+    def __init__(self, pipeline: GenerationPipeline):
+        self.pipeline = pipeline
+        self._semaphore = asyncio.Semaphore(settings.SPECULATIVE_MAX_CONCURRENT)
+        self._results: TTLCache[Dict[str, Any]] = TTLCache(
+            ttl_seconds=settings.SPECULATIVE_RESULT_TTL_SECONDS,
+            max_entries=settings.SPECULATIVE_MAX_RESULTS
+        )
+        self._running: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Runs that got past the idle gate and are actually generating
+        self._generating: set = set()
+        self._user_runs: Dict[str, Deque[float]] = defaultdict(deque)
+        self.hits = 0
+        self.misses = 0
+
+    def _within_budget(self, user_id: str) -> bool:
+        runs = self._user_runs[user_id]
+        now = time.monotonic()
+        while runs and now - runs[0] > settings.SPECULATIVE_BUDGET_WINDOW_SECONDS:
+            runs.popleft()
+        return len(runs) < settings.SPECULATIVE_USER_BUDGET
+
+    def _charge(self, user_id: str) -> None:
+        # Only runs that reach the providers count; dropped or cancelled ones are free
+        self._user_runs[user_id].append(time.monotonic())
+
+    def schedule(self, user_id: str, file_id: str, content: str) -> bool:
+        """Start speculative generation for an upload; False if skipped."""
+        if not settings.SPECULATIVE_GENERATION_ENABLED or not content or not content.strip():
+            return False
+        key = (user_id, file_id)
+        if key in self._running or key in self._results:
+            return False
+        if not self._within_budget(user_id):
+            logger.info(f"Speculative budget exhausted for user {user_id}; skipping file {file_id}")
+            return False
+
+        task = asyncio.create_task(self._run(user_id, file_id, content))
+        self._running[key] = task
+        task.add_done_callback(lambda _: self._finish(key))
+        return True
+
+    def _finish(self, key: Tuple[str, str]) -> None:
+        self._running.pop(key, None)
+        self._generating.discard(key)
+
+    async def _wait_for_idle(self) -> bool:
+        """Low priority: wait until no provider slot is busy with user requests."""
+        deadline = time.monotonic() + settings.SPECULATIVE_IDLE_WAIT_SECONDS
+        while any(slot.interactive_in_flight() or slot.cooldown_remaining() > 0 for slot in self.pipeline.pool.slots):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+        return True
+
+    async def _run(self, user_id: str, file_id: str, content: str) -> Optional[Dict[str, Any]]:
+        request = default_request(file_id)
+        async with self._semaphore:
+            if not await self._wait_for_idle():
+                logger.info(f"Providers busy; dropping speculative generation for file {file_id}")
+                return None
+            # Other runs may have started while this one waited
+            if not self._within_budget(user_id):
+                logger.info(f"Speculative budget exhausted for user {user_id}; dropping file {file_id}")
+                return None
+            self._charge(user_id)
+            self._generating.add((user_id, file_id))
+            try:
+                started = time.perf_counter()
+                generated = await self.pipeline.generate(content, request)
+            except Exception as e:
+                logger.warning(f"Speculative generation failed for file {file_id}: {repr(e)}")
+                return None
+
+        if not generated['questions'] and not generated['flashcards'] and generated['study_notes'] == NOTES_FAILED:
+            return None
+        result = {'params': _params(request), 'content': content, **generated}
+        self._results.set((user_id, file_id), result)
+        logger.info(f"Speculative lesson ready for file {file_id} in {time.perf_counter() - started:.1f}s")
+        return result
+
+    async def take(self, user_id: str, request: GenerationRequest) -> Optional[Dict[str, Any]]:
+        """
+        Return the pre-generated lesson for a matching upload request, waiting
+        for a run that is still in progress. Results are handed out once.
+        """
+        if (
+            request.source_type != GenerationSource.UPLOAD
+            or request.mode != GenerationMode.STANDARD
+            or not request.file_id
+            or request.file_ids
+            or _params(request) != _params(default_request(request.file_id))
+        ):
+            return None
+
+        key = (user_id, request.file_id)
+        task = self._running.get(key)
+        if task is not None and key not in self._generating:
+            # Still queued behind other work; the user's own request wins
+            task.cancel()
+            self.misses += 1
+            return None
+        if task is not None:
+            logger.info(f"Waiting for in-progress speculative generation of file {request.file_id}")
+            try:
+                await asyncio.shield(task)
+            except (Exception, asyncio.CancelledError):
+                # The request itself may have been cancelled; let that propagate
+                if not task.done():
+                    raise
+
+        result = self._results.pop(key)
+        if result is None or result['params'] != _params(request):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': settings.SPECULATIVE_GENERATION_ENABLED,
+            'running': len(self._running),
+            'ready': len(self._results),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+@lru_cache()
+def get_speculative_generator() -> SpeculativeGenerator:
+    return SpeculativeGenerator(GenerationPipeline(background=True))
@@ -1,44 +1,77 @@
 import google.generativeai as genai
+from google.generativeai import caching as genai_caching
 from groq import AsyncGroq, APIError as GroqAPIError
 from openai import AsyncOpenAI, APIError as OpenAIAPIError
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from app.core.config import settings
 from app.core.logging import get_logger
-from app.core.exceptions import LLMServiceError
+from app.core.exceptions import LLMProviderError, LLMServiceError
+from app.services.llm.token_budget import (
+    count_tokens,
+    input_budget_for,
+    fit_to_budget,
+    usage_tracker,
+)
+from app.services.llm.prompt_cache import PromptCacheRegistry, prefix_cache_key
+from datetime import timedelta
+import asyncio
 import json
 import re
+import time
 from functools import lru_cache
 
 logger = get_logger(__name__)
 
+# Providers whose prompt prefixes this service caches explicitly
+# (Gemini CachedContent, OpenRouter cache_control)
+PREFIX_CACHING_PROVIDERS = ('google', 'openrouter')
+
+# genai.configure is process-wide, so every Gemini service must share one key
+_gemini_api_key: Optional[str] = None
+
 
 class LLMService:
     """Service for interacting with a configured LLM provider (Gemini, Groq, or OpenRouter)."""
 
-    def __init__(self):
-        """Initialize the LLM service based on the provider in settings."""
-        self.provider = settings.LLM_PROVIDER.lower()
-        self.model_name = settings.LLM_MODEL
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        model_name: Optional[str] = None,
+        api_key: Optional[str] = None
+    ):
+        """
+        Initialize the LLM service based on the provider in settings.
+        provider/model_name/api_key override the settings for additional
+        providers used by sharded generation.
+        """
+        self.provider = (provider or settings.LLM_PROVIDER).lower()
+        self.model_name = model_name or settings.LLM_MODEL
+        api_key = api_key if provider else settings.LLM_API_KEY
         self.client = None
+        self.prompt_cache = PromptCacheRegistry(ttl_seconds=settings.PROMPT_CACHE_TTL_SECONDS)
 
         try:
-            if not settings.LLM_API_KEY:
+            if not api_key:
                 raise LLMServiceError(f"{self.provider} API key is not configured")
 
             if self.provider == 'google':
-                genai.configure(api_key=settings.LLM_API_KEY)
+                global _gemini_api_key
+                if _gemini_api_key is not None and api_key != _gemini_api_key:
+                    raise LLMServiceError("a different Gemini API key is already configured in this process")
+                genai.configure(api_key=api_key)
+                _gemini_api_key = api_key
                 # Store the default model client
                 self.client = genai.GenerativeModel(self.model_name)
                 logger.info(f"Google Gemini service initialized with model: {self.model_name}")
                 
             elif self.provider == 'groq':
-                self.client = AsyncGroq(api_key=settings.LLM_API_KEY)
+                self.client = AsyncGroq(api_key=api_key)
                 logger.info(f"Groq service initialized with model: {self.model_name}")
             
             elif self.provider == 'openrouter':
                 self.client = AsyncOpenAI(
                     base_url="https://openrouter.ai/api/v1",
-                    api_key=settings.LLM_API_KEY
+                    api_key=api_key
                 )
                 logger.info(f"OpenRouter service initialized for model: {self.model_name}")
                 
@@ -56,25 +89,39 @@ class LLMService:
         temperature: float = settings.TEMPERATURE,
         max_tokens: int = settings.MAX_TOKENS,
         system_instruction: Optional[str] = None,
-        model: Optional[str] = None  # <-- ADDED model override
+        model: Optional[str] = None,  # <-- ADDED model override
+        cache_prefix: Optional[str] = None
     ) -> str:
-        """Generate text using the configured LLM."""
+        """
+        Generate text using the configured LLM.
+
+        cache_prefix is a stable leading part of the prompt (instructions plus
+        source content) that is reused across calls; providers that support it
+        serve it from their prompt cache. The final prompt is cache_prefix + prompt.
+        """
         
         # Determine the model to use for this specific call
         model_to_use = model or self.model_name
         
         logger.info(f"Generating text with {self.provider} using model {model_to_use}")
+        prompt, cache_prefix = self._enforce_input_budget(prompt, model_to_use, system_instruction, cache_prefix)
+        full_prompt = (cache_prefix or "") + prompt
+        started = time.perf_counter()
         
         try:
             if self.provider == 'google':
                 
                 client_instance = self.client
                 apply_system_instruction = bool(system_instruction)
+                cached_content = await self._get_gemini_cached_content(model_to_use, cache_prefix, system_instruction)
                 
                 # Check if we need a new client instance:
+                # 0. If the prefix (and system instruction) lives in a cached content handle
                 # 1. If a custom model is specified AND it's different from the default
                 # 2. If a system instruction is provided (as it's part of the model init)
-                if (model and model != self.model_name) or apply_system_instruction:
+                if cached_content is not None:
+                    client_instance = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+                elif (model and model != self.model_name) or apply_system_instruction:
                     logger.debug(f"Creating new Google client for model: {model_to_use} (System Instruction: {apply_system_instruction})")
                     client_instance = genai.GenerativeModel(
                         model_to_use,
@@ -89,7 +136,7 @@ class LLMService:
                 
                 logger.debug("Calling Google Gemini API...")
                 response = await client_instance.generate_content_async(
-                    prompt,
+                    prompt if cached_content is not None else full_prompt,
                     generation_config=generation_config
                 )
                 
@@ -98,13 +145,19 @@ class LLMService:
                     raise LLMServiceError("Empty response from LLM")
                     
                 logger.info(f"Generated {len(response.text)} characters")
+                usage = getattr(response, 'usage_metadata', None)
+                self._record_usage(
+                    model_to_use, started,
+                    prompt_text=(system_instruction or "") + full_prompt,
+                    output_text=response.text,
+                    reported_input=getattr(usage, 'prompt_token_count', None),
+                    reported_output=getattr(usage, 'candidates_token_count', None),
+                    cached_tokens=getattr(usage, 'cached_content_token_count', None) or 0
+                )
                 return response.text
 
             elif self.provider == 'groq' or self.provider == 'openrouter':
-                messages = []
-                if system_instruction:
-                    messages.append({"role": "system", "content": system_instruction})
-                messages.append({"role": "user", "content": prompt})
+                messages = self._build_messages(prompt, system_instruction, cache_prefix, model_to_use)
 
                 chat_completion = await self.client.chat.completions.create(
                     messages=messages,
@@ -119,6 +172,7 @@ class LLMService:
                     
                 content = chat_completion.choices[0].message.content
                 logger.info(f"Generated {len(content)} characters")
+                self._record_completion_usage(chat_completion, model_to_use, started, (system_instruction or "") + full_prompt, content)
                 return content
 
             return "" 
@@ -129,18 +183,23 @@ class LLMService:
             # Some client errors may not have a .message attribute or may have
             # nested error payloads; fall back safely to string repr.
             message = getattr(api_err, "message", None) or str(api_err)
-            raise LLMServiceError(f"{self.provider} API failed: {message}")
-        except Exception as e:
+            raise LLMProviderError(f"{self.provider} API failed: {message}")
+        except LLMServiceError as e:
             logger.error(f"LLM text generation error with {self.provider}: {repr(e)}", exc_info=True)
             raise LLMServiceError(f"Failed to generate text: {str(e)}")
+        except Exception as e:
+            # Anything else came from the provider client (transport, Gemini API errors)
+            logger.error(f"LLM text generation error with {self.provider}: {repr(e)}", exc_info=True)
+            raise LLMProviderError(f"Failed to generate text: {str(e)}")
 
     async def generate_json(
         self,
         prompt: str,
         temperature: float = settings.TEMPERATURE,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        cache_prefix: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generate structured JSON output using the configured LLM."""
+        """Generate structured JSON output using the configured LLM (see generate_text for cache_prefix)."""
         
         # Determine the model to use for this specific call
         model_to_use = model or self.model_name
@@ -150,14 +209,16 @@ class LLMService:
         json_prompt = f"""{prompt}
 
 IMPORTANT: Return ONLY a valid JSON object or array. No markdown, no code blocks (```json), no explanations before or after the JSON."""
+        json_prompt, cache_prefix = self._enforce_input_budget(json_prompt, model_to_use, cache_prefix=cache_prefix)
 
         response_text = ""  # Initialize for error logging
         try:
             if self.provider == 'groq' or self.provider == 'openrouter':
-                messages = [{"role": "user", "content": json_prompt}]
+                messages = self._build_messages(json_prompt, None, cache_prefix, model_to_use)
                 
                 # Try to use JSON mode
                 try:
+                    started = time.perf_counter()
                     chat_completion = await self.client.chat.completions.create(
                         messages=messages,
                         model=model_to_use, # <-- Use the determined model
@@ -165,18 +226,19 @@ IMPORTANT: Return ONLY a valid JSON object or array. No markdown, no code blocks
                         response_format={"type": "json_object"},
                     )
                     response_text = chat_completion.choices[0].message.content
+                    self._record_completion_usage(chat_completion, model_to_use, started, (cache_prefix or "") + json_prompt, response_text or "")
                     return json.loads(response_text)
                 except Exception as json_mode_error:
                     # Fallback if model doesn't support JSON mode or fails
                     logger.warning(f"JSON mode failed ({repr(json_mode_error)}), falling back to text extraction.")
                     # Pass the specific model to the fallback
-                    return await self._generate_json_from_text(json_prompt, temperature, model=model_to_use)
+                    return await self._generate_json_from_text(json_prompt, temperature, model=model_to_use, cache_prefix=cache_prefix)
             
             elif self.provider == 'google': # Fallback for Google
                 # --- THIS IS THE FIX ---
                 # Pass the specific model to the fallback
                 # Changed `use_model=` to `model=`
-                return await self._generate_json_from_text(json_prompt, temperature, model=model_to_use)
+                return await self._generate_json_from_text(json_prompt, temperature, model=model_to_use, cache_prefix=cache_prefix)
             
             # Default empty dict if providers fail, though error should be raised first
             return {}
@@ -187,15 +249,23 @@ IMPORTANT: Return ONLY a valid JSON object or array. No markdown, no code blocks
         except (GroqAPIError, OpenAIAPIError) as api_err:
             logger.error("%s API error in JSON gen: %r", self.provider, api_err, exc_info=True)
             message = getattr(api_err, "message", None) or str(api_err)
-            raise LLMServiceError(f"{self.provider} API failed: {message}")
+            raise LLMProviderError(f"{self.provider} API failed: {message}")
+        except LLMProviderError:
+            raise
         except Exception as e:
             logger.error(f"LLM JSON generation error: {repr(e)}", exc_info=True)
             raise LLMServiceError(f"Failed to generate JSON: {str(e)}")
 
-    async def _generate_json_from_text(self, prompt: str, temperature: float, model: Optional[str] = None) -> Dict[str, Any]:
+    async def _generate_json_from_text(
+        self,
+        prompt: str,
+        temperature: float,
+        model: Optional[str] = None,
+        cache_prefix: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Internal helper to generate text and extract JSON."""
         # Pass model to generate_text
-        response_text = await self.generate_text(prompt=prompt, temperature=temperature, model=model) 
+        response_text = await self.generate_text(prompt=prompt, temperature=temperature, model=model, cache_prefix=cache_prefix)
         response_text = response_text.strip()
         
         # Strip markdown code blocks if present
@@ -224,18 +294,184 @@ IMPORTANT: Return ONLY a valid JSON object or array. No markdown, no code blocks
     ) -> str:
         """Generate text with given context (RAG)."""
         logger.info("Generating text with context")
+
+        # Trim the context (not the question) so the full prompt fits the budget.
+        model_to_use = model or self.model_name
+        context_budget = input_budget_for(model_to_use) - count_tokens(prompt, model_to_use) - 100
+        context = fit_to_budget(context, context_budget, model_to_use)
         
-        full_prompt = f"""Context:
+        # The context block is the stable part across follow-up questions on
+        # the same file, so it goes first as a cacheable prefix.
+        context_prefix = f"""Context:
 ---
 {context}
 ---
-
+"""
+        question = f"""
 Task:
 Based *only* on the provided context, answer the following question:
 {prompt}
 """
         # Pass the model parameter to generate_text
-        return await self.generate_text(prompt=full_prompt, temperature=temperature, model=model)
+        return await self.generate_text(prompt=question, temperature=temperature, model=model, cache_prefix=context_prefix)
+
+    def _enforce_input_budget(
+        self,
+        prompt: str,
+        model: str,
+        system_instruction: Optional[str] = None,
+        cache_prefix: Optional[str] = None
+    ) -> tuple[str, Optional[str]]:
+        """
+        Last line of defence for oversized prompts. Callers should already have
+        fitted their content; here we compact and, if needed, trim the middle
+        so the trailing output instructions are preserved. A trimmed prompt is
+        no longer a stable prefix, so it is sent uncached.
+        """
+        budget = input_budget_for(model) - count_tokens(system_instruction or "", model)
+        full_prompt = (cache_prefix or "") + prompt
+        prompt_tokens = count_tokens(full_prompt, model)
+        if prompt_tokens <= budget:
+            return prompt, cache_prefix
+        logger.warning(f"Prompt has {prompt_tokens} tokens, over the {budget} token budget for {model}; compacting")
+        return fit_to_budget(full_prompt, budget, model, keep_tail_tokens=300), None
+
+    def cache_min_tokens(self, model: Optional[str] = None) -> int:
+        """Smallest prefix the provider will cache for this model."""
+        overrides = settings.PROMPT_CACHE_MIN_TOKENS_BY_MODEL
+        return overrides.get(
+            f"{self.provider}:{model or self.model_name}",
+            overrides.get(self.provider, settings.PROMPT_CACHE_MIN_TOKENS)
+        )
+
+    def _is_cacheable_prefix(self, cache_prefix: Optional[str], model: str) -> bool:
+        """Providers only cache prefixes above a minimum size."""
+        return (
+            settings.PROMPT_CACHE_ENABLED
+            and self.provider in PREFIX_CACHING_PROVIDERS
+            and bool(cache_prefix)
+            and count_tokens(cache_prefix, model) >= self.cache_min_tokens(model)
+        )
+
+    def can_share_prefix(self, prefix_tokens: int, model: Optional[str] = None) -> bool:
+        """
+        Whether a document-wide prefix of this size should be sent with every
+        chunk task: the provider caches it, and it is small enough that
+        re-sending it at cached rates stays cheap.
+        """
+        model = model or self.model_name
+        return (
+            settings.PROMPT_CACHE_ENABLED
+            and self.provider in PREFIX_CACHING_PROVIDERS
+            and self.cache_min_tokens(model) <= prefix_tokens <= settings.PROMPT_CACHE_SHARED_PREFIX_MAX_TOKENS
+        )
+
+    def _build_messages(
+        self,
+        prompt: str,
+        system_instruction: Optional[str],
+        cache_prefix: Optional[str],
+        model: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Build chat messages for OpenAI-compatible providers. On OpenRouter the
+        prefix is sent as its own content part marked with cache_control so
+        providers with explicit caching (Anthropic, Gemini) cache it; providers
+        with automatic prefix caching benefit from the prefix being first.
+        """
+        messages: List[Dict[str, Any]] = []
+        if system_instruction:
+            messages.append({"role": "system", "content": system_instruction})
+
+        if self.provider == 'openrouter' and self._is_cacheable_prefix(cache_prefix, model):
+            messages.append({
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": cache_prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": prompt},
+                ],
+            })
+        else:
+            messages.append({"role": "user", "content": (cache_prefix or "") + prompt})
+        return messages
+
+    async def _get_gemini_cached_content(
+        self,
+        model: str,
+        cache_prefix: Optional[str],
+        system_instruction: Optional[str]
+    ) -> Optional[Any]:
+        """Get (or create) a Gemini explicit context cache holding the prompt prefix."""
+        if not self._is_cacheable_prefix(cache_prefix, model):
+            return None
+
+        key = prefix_cache_key(self.provider, model, cache_prefix, system_instruction)
+        model_path = model if model.startswith('models/') else f"models/{model}"
+
+        async def create(ttl_seconds: int):
+            return await asyncio.to_thread(
+                genai_caching.CachedContent.create,
+                model=model_path,
+                system_instruction=system_instruction,
+                contents=[cache_prefix],
+                ttl=timedelta(seconds=ttl_seconds),
+            )
+
+        async def refresh(handle, ttl_seconds: int):
+            await asyncio.to_thread(handle.update, ttl=timedelta(seconds=ttl_seconds))
+
+        return await self.prompt_cache.get_or_create(
+            key,
+            create=create,
+            refresh=refresh,
+            delete=lambda handle: asyncio.to_thread(handle.delete),
+        )
+
+    def _record_completion_usage(
+        self,
+        chat_completion: Any,
+        model: str,
+        started: float,
+        prompt_text: str,
+        output_text: str
+    ) -> None:
+        """Record usage for an OpenAI-compatible (Groq/OpenRouter) completion."""
+        usage = getattr(chat_completion, 'usage', None)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        if isinstance(details, dict):
+            cached_tokens = details.get('cached_tokens') or 0
+        else:
+            cached_tokens = getattr(details, 'cached_tokens', None) or 0
+        self._record_usage(
+            model, started,
+            prompt_text=prompt_text,
+            output_text=output_text,
+            reported_input=getattr(usage, 'prompt_tokens', None),
+            reported_output=getattr(usage, 'completion_tokens', None),
+            cached_tokens=cached_tokens
+        )
+
+    def _record_usage(
+        self,
+        model: str,
+        started: float,
+        prompt_text: str,
+        output_text: str,
+        reported_input: Optional[int] = None,
+        reported_output: Optional[int] = None,
+        cached_tokens: int = 0
+    ) -> None:
+        """Record input/output tokens for a call, preferring provider-reported counts."""
+        input_tokens = reported_input if reported_input is not None else count_tokens(prompt_text, model)
+        output_tokens = reported_output if reported_output is not None else count_tokens(output_text, model)
+        latency_ms = (time.perf_counter() - started) * 1000
+        usage_tracker.record(
+            self.provider, model, input_tokens, output_tokens, latency_ms, cached_tokens=cached_tokens
+        )
+        logger.info(
+            f"Token usage ({self.provider}/{model}): in={input_tokens} cached={cached_tokens} "
+            f"out={output_tokens} latency={latency_ms:.0f}ms"
+        )
 
 
 @lru_cache()
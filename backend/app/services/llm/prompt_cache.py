@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def prefix_cache_key(provider: str, model: str, prefix: str, system_instruction: Optional[str] = None) -> str:
+    """Build a stable key for a (provider, model, prompt prefix) combination."""
+    digest = hashlib.sha256()
+    for part in (provider, model, system_instruction or "", prefix):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class _Entry:
+    __slots__ = ('handle', 'expires_at')
+
+    def __init__(self, handle: Any, expires_at: float):
+        self.handle = handle
+        self.expires_at = expires_at
+
+
+class PromptCacheRegistry:
+    """
+    Tracks provider-side cached content handles (e.g. Gemini CachedContent)
+    so a prompt prefix is uploaded once and reused until its TTL runs out.
+
+    The provider calls are injected, so the registry can be exercised with a
+    local stub instead of a real provider.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        refresh_margin_seconds: int = 60,
+        max_entries: int = 128,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._uncacheable: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    async def get_or_create(
+        self,
+        key: str,
+        create: Callable[[int], Awaitable[Any]],
+        refresh: Optional[Callable[[Any, int], Awaitable[None]]] = None,
+        delete: Optional[Callable[[Any], Any]] = None
+    ) -> Optional[Any]:
+        """
+        Return a live handle for key, creating it with create(ttl_seconds) on a
+        miss. Handles close to expiry are extended with refresh(handle, ttl)
+        when available. Returns None if the provider refused to cache the
+        prefix; the key is then skipped until the TTL has passed.
+        """
+        now = self._clock()
+        if self._uncacheable.get(key, 0) > now:
+            return None
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            now = self._clock()
+            entry = self._entries.get(key)
+
+            if entry and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                if refresh and entry.expires_at - now < self.refresh_margin_seconds:
+                    try:
+                        await refresh(entry.handle, self.ttl_seconds)
+                        entry.expires_at = now + self.ttl_seconds
+                        self.refreshes += 1
+                    except Exception as e:
+                        logger.warning(f"Prompt cache refresh failed, recreating: {repr(e)}")
+                        entry = None
+                if entry:
+                    self.hits += 1
+                    return entry.handle
+
+            self.misses += 1
+            try:
+                handle = await create(self.ttl_seconds)
+            except Exception as e:
+                self.failures += 1
+                self._uncacheable[key] = now + self.ttl_seconds
+                logger.warning(f"Prompt cache creation failed, sending uncached: {repr(e)}")
+                return None
+
+            self._entries[key] = _Entry(handle, now + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            await self._evict(delete)
+            return handle
+
+    async def _evict(self, delete: Optional[Callable[[Any], Any]]) -> None:
+        """Drop expired entries and the least recently used beyond max_entries."""
+        now = self._clock()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._entries.pop(key, None)
+            self._locks.pop(key, None)
+
+        while len(self._entries) > self.max_entries:
+            key, entry = self._entries.popitem(last=False)
+            self._locks.pop(key, None)
+            if delete:
+                try:
+                    result = delete(entry.handle)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.warning(f"Failed to delete evicted prompt cache: {repr(e)}")
+
+        self._uncacheable = {key: until for key, until in self._uncacheable.items() if until > now}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'handle_hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,4 +1,5 @@
-from typing import Optional
+from typing import List, Optional
+from app.services.llm.token_budget import count_tokens, input_budget_for, fit_to_budget
 
 class PromptTemplates:
     """Collection of prompt templates for different tasks."""
@@ -16,6 +17,119 @@ class PromptTemplates:
         }
         return descriptions.get(level.lower(), "")
 
+    # Tokens kept free for the task-specific suffix when fitting content.
+    # A fixed reserve (rather than per-task) keeps the fitted content, and so
+    # the cached prefix, identical for every task run on the same chunk.
+    TASK_TOKEN_RESERVE = 600
+
+    @staticmethod
+    def content_prefix(content: str) -> str:
+        """
+        Stable prompt prefix shared by every task run on the same content.
+        It must stay byte-identical across questions, flashcards and notes so
+        providers can serve it from their prompt cache; anything that varies
+        per task belongs in the task suffix.
+        """
+        return f"""You are an expert educational content creator. Every task below must be based *only* on the source material provided here.
+
+**Source Material:**
+---
+{content}
+---
+
+"""
+
+    @staticmethod
+    def focus_section(chunk: str) -> str:
+        """
+        Task-suffix header naming the part of the source material to work on,
+        used when the prefix holds the whole document rather than the chunk.
+        """
+        return f"""**Focus Section:** Base this task only on the following section of the source material.
+---
+{chunk}
+---
+
+"""
+
+    @staticmethod
+    def fit_content(content: str, model: Optional[str] = None) -> str:
+        """Fit content into the model's input budget, leaving room for any task suffix."""
+        overhead = PromptTemplates.content_prefix("")
+        available = input_budget_for(model) - count_tokens(overhead, model) - PromptTemplates.TASK_TOKEN_RESERVE
+        return fit_to_budget(content, available, model)
+
+    @staticmethod
+    def questions_task(num_questions: int, difficulty: str, question_type: str) -> str:
+        """Task suffix for question generation (used by QuestionGeneratorService)."""
+        # We use double curly braces {{ }} to escape them in the f-string
+        return f"""**Task:** Based on the source material above, generate {num_questions} questions.
+Difficulty: {difficulty}
+Question Type: {question_type}
+
+Strictly output a JSON list of objects. Do not include markdown formatting (like ```json).
+Follow this exact JSON structure for every question:
+[
+    {{
+        "question_text": "The actual question here?",
+        "question_type": "multiple_choice",
+        "difficulty": "easy",
+        "bloom_level": "remember",
+        "options": [
+            {{"option_text": "Option A", "is_correct": true}},
+            {{"option_text": "Option B", "is_correct": false}}
+        ],
+        "correct_answer": "Option A",
+        "explanation": "Why this is correct.",
+        "points": 1
+    }}
+]
+"""
+
+    @staticmethod
+    def question_repair_task(
+        num_questions: int,
+        difficulty: str,
+        question_type: str,
+        errors: List[str],
+        existing_questions: List[str]
+    ) -> str:
+        """Task suffix asking for replacements of questions that failed validation."""
+        problems = "\n".join(f"- {error}" for error in errors[:10]) or "- missing questions"
+        avoid = "\n".join(f"- {text}" for text in existing_questions[:20]) or "- (none)"
+        return PromptTemplates.questions_task(num_questions, difficulty, question_type) + f"""
+Some previously generated questions were rejected for these problems:
+{problems}
+
+Make sure that:
+- "correct_answer" exactly matches the text of one option, and only that option has "is_correct": true.
+- Options are unique.
+- "true_false" questions have exactly two options: "True" and "False".
+- "question_type" is one of multiple_choice, true_false, short_answer, fill_in_the_blanks, matching.
+- "difficulty" is one of easy, medium, hard, very_hard.
+- "bloom_level" is one of remember, understand, apply, analyze, evaluate, create.
+
+Do not repeat any of these existing questions:
+{avoid}
+"""
+
+    @staticmethod
+    def flashcards_task(num_flashcards: int) -> str:
+        """Task suffix for flashcard generation."""
+        return f"""**Task:** Based on the source material above, generate {num_flashcards} flashcards.
+
+Format the output as a JSON list of objects, where each object has:
+- "front": str (The question or term)
+- "back": str (The answer or definition)
+"""
+
+    @staticmethod
+    def study_notes_task() -> str:
+        """Task suffix for study notes generation."""
+        return """**Task:** Based on the source material above, generate comprehensive study notes.
+The notes should be well-structured, clear, concise, and in markdown format.
+"""
+
     @staticmethod
     def generate_questions_prompt(
         content: str,
@@ -28,12 +142,8 @@ class PromptTemplates:
         """Generate prompt for question generation."""
         bloom_desc = PromptTemplates.get_bloom_taxonomy_description(bloom_level)
         
-        prompt = f"""You are an expert educational content creator. Based on the content provided, generate {num_questions} high-quality questions of the type '{question_type}'.
-
-**Content to Analyze:**
----
-{content}
----
+        prompt = PromptTemplates.content_prefix(content)
+        prompt += f"""**Task:** Generate {num_questions} high-quality questions of the type '{question_type}'.
 
 **Requirements:**
 - **Question Type:** {question_type}
@@ -88,12 +198,7 @@ Return a JSON array where each object has the following keys:
     @staticmethod
     def generate_flashcards_prompt(content: str, num_cards: int = 10) -> str:
         """Generate prompt for flashcard generation."""
-        return f"""From the content below, create {num_cards} educational flashcards covering the most important concepts.
-
-**Content:**
----
-{content}
----
+        return PromptTemplates.content_prefix(content) + f"""**Task:** Create {num_cards} educational flashcards covering the most important concepts.
 
 **Instructions:**
 For each flashcard, provide a "front" (a concise question or key term) and a "back" (a clear, detailed answer or definition).
@@ -106,12 +211,7 @@ Example: `[ {{"front": "What is photosynthesis?", "back": "It's the process plan
     @staticmethod
     def generate_study_notes_prompt(content: str) -> str:
         """Generate prompt for study notes generation."""
-        return f"""Analyze the following content and create a comprehensive set of study notes in Markdown format.
-
-**Content:**
----
-{content}
----
+        return PromptTemplates.content_prefix(content) + """**Task:** Create a comprehensive set of study notes in Markdown format.
 
 **Instructions:**
 Structure the notes logically with clear headings, bullet points, and bolded keywords. The notes should include:
@@ -0,0 +1,136 @@
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.exceptions import LLMServiceError
+from app.services.llm.llm_service import LLMService, get_llm_service
+
+logger = get_logger(__name__)
+
+
+class ProviderSlot:
+    """One configured provider/model with its capacity and observed latency."""
+
+    # Weight of the newest observation in the latency moving average
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, service: LLMService, concurrency: int):
+        self.service = service
+        self.concurrency = max(1, concurrency)
+        self.latency_ewma: Optional[float] = None
+        self.in_flight = 0
+        # Of in_flight, jobs from background (speculative) pipelines
+        self.background_in_flight = 0
+        self.completed = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.service.provider}:{self.service.model_name}"
+
+    def record_success(self, latency_seconds: float) -> None:
+        self.completed += 1
+        if self.latency_ewma is None:
+            self.latency_ewma = latency_seconds
+        else:
+            self.latency_ewma = self.EWMA_ALPHA * latency_seconds + (1 - self.EWMA_ALPHA) * self.latency_ewma
+
+    def record_failure(self) -> None:
+        """Provider errors (usually rate limits) take the slot out of rotation for a while."""
+        self.failures += 1
+        self.cooldown_until = time.monotonic() + settings.LLM_PROVIDER_COOLDOWN_SECONDS
+
+    def interactive_in_flight(self) -> int:
+        return self.in_flight - self.background_in_flight
+
+    def cooldown_remaining(self) -> float:
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def throughput(self) -> float:
+        """Estimated jobs per second this slot can sustain at full concurrency."""
+        latency = self.latency_ewma or settings.LLM_DEFAULT_JOB_LATENCY_SECONDS
+        return self.concurrency / max(latency, 0.001)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'provider': self.service.provider,
+            'model': self.service.model_name,
+            'concurrency': self.concurrency,
+            'in_flight': self.in_flight,
+            'background_in_flight': self.background_in_flight,
+            'completed': self.completed,
+            'failures': self.failures,
+            'latency_ewma_seconds': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            'cooling_down': self.cooldown_remaining() > 0,
+        }
+
+
+class ProviderPool:
+    """All LLM providers/models available for sharded generation."""
+
+    def __init__(self, slots: List[ProviderSlot]):
+        if not slots:
+            raise LLMServiceError("No LLM providers configured")
+        self.slots = slots
+
+    @property
+    def is_sharded(self) -> bool:
+        return len(self.slots) > 1
+
+    def total_throughput(self) -> float:
+        return sum(slot.throughput() for slot in self.slots)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [slot.stats() for slot in self.slots]
+
+
+def _api_key_for(provider: str) -> Optional[str]:
+    """Resolve the API key for an additional provider."""
+    if provider == settings.LLM_PROVIDER.lower():
+        return settings.LLM_API_KEY
+    return {
+        'google': settings.GEMINI_API_KEY,
+        'groq': settings.GROQ_API_KEY,
+        'openrouter': settings.OPENROUTER_API_KEY,
+    }.get(provider)
+
+
+def _concurrency_for(service: LLMService) -> int:
+    overrides = settings.LLM_PROVIDER_CONCURRENCY
+    return overrides.get(
+        f"{service.provider}:{service.model_name}",
+        overrides.get(service.provider, settings.LLM_DEFAULT_CONCURRENCY)
+    )
+
+
+@lru_cache()
+def get_provider_pool() -> ProviderPool:
+    """
+    Build the provider pool once per process: the primary LLM service plus
+    every "provider:model" entry in LLM_SHARD_PROVIDERS that initialises.
+    """
+    primary = get_llm_service()
+    slots = [ProviderSlot(primary, _concurrency_for(primary))]
+    seen = {slots[0].name}
+
+    if settings.LLM_SHARDING_ENABLED:
+        for entry in settings.LLM_SHARD_PROVIDERS:
+            provider, _, model = entry.partition(':')
+            provider = provider.strip().lower()
+            model = model.strip()
+            if not provider or not model or f"{provider}:{model}" in seen:
+                continue
+            try:
+                service = LLMService(provider=provider, model_name=model, api_key=_api_key_for(provider))
+            except LLMServiceError as e:
+                logger.warning(f"Skipping shard provider '{entry}': {e.message}")
+                continue
+            slot = ProviderSlot(service, _concurrency_for(service))
+            slots.append(slot)
+            seen.add(slot.name)
+
+    logger.info(f"LLM provider pool: {', '.join(slot.name for slot in slots)}")
+    return ProviderPool(slots)
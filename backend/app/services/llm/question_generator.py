@@ -1,18 +1,44 @@
 from app.services.llm.llm_service import LLMService, get_llm_service
 from app.core.logging import get_logger
-from app.core.exceptions import LLMServiceError
+from app.core.exceptions import LLMProviderError, LLMServiceError
+from app.services.llm.prompt_templates import PromptTemplates
+from app.services.llm.token_budget import count_tokens, input_budget_for
+from app.services.llm.question_validator import check_question
+from app.core.config import settings
 from app.schemas.lesson import QuestionType, DifficultyLevel, BloomLevel, Question, Flashcard
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import json
 import re
 
 logger = get_logger(__name__)
 
 class QuestionGeneratorService:
-    def __init__(self):
+    def __init__(self, llm_service: Optional[LLMService] = None):
         # Reuse a cached LLMService instance for all question generation
         # to minimize per-request startup overhead.
-        self.llm_service = get_llm_service()
+        self.llm_service = llm_service or get_llm_service()
+        self.prompts = PromptTemplates()
+
+    def task_prefix(self, content: str, document: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Cacheable prefix and task-suffix focus header for a task on `content`.
+
+        A chunk on its own is usually below the provider's cache minimum, so
+        when `content` is a chunk of a `document` that clears the minimum and
+        fits the input budget, every task on every chunk shares the document
+        prefix (the same one study notes use) and names its chunk in the
+        suffix. Otherwise the chunk is its own prefix and there is no focus.
+        """
+        model = self.llm_service.model_name
+        if document and document != content:
+            prefix = self.prompts.content_prefix(document)
+            prefix_tokens = count_tokens(prefix, model)
+            if self.llm_service.can_share_prefix(prefix_tokens, model):
+                focus = self.prompts.focus_section(content)
+                needed = prefix_tokens + count_tokens(focus, model) + self.prompts.TASK_TOKEN_RESERVE
+                if needed <= input_budget_for(model):
+                    return prefix, focus
+        return self.prompts.content_prefix(self.prompts.fit_content(content, model)), ""
 
     async def generate_questions(
         self,
@@ -20,85 +46,48 @@ class QuestionGeneratorService:
         num_questions: int,
         difficulty: DifficultyLevel,
         question_type: QuestionType,
+        document: Optional[str] = None,
     ) -> List[Question]:
         
         # --- FIX 1: Improved Prompt with Strict JSON Example ---
-        # We use double curly braces {{ }} to escape them in the f-string
-        prompt = f"""
-        Based on the following content, generate {num_questions} questions.
-        Content: {content}
-        Difficulty: {difficulty.value}
-        Question Type: {question_type.value}
-        
-        Strictly output a JSON list of objects. Do not include markdown formatting (like ```json).
-        Follow this exact JSON structure for every question:
-        [
-            {{
-                "question_text": "The actual question here?",
-                "question_type": "multiple_choice",
-                "difficulty": "easy",
-                "bloom_level": "remember",
-                "options": [
-                    {{"option_text": "Option A", "is_correct": true}},
-                    {{"option_text": "Option B", "is_correct": false}}
-                ],
-                "correct_answer": "Option A",
-                "explanation": "Why this is correct.",
-                "points": 1
-            }}
-        ]
-        """
+        # Stable prefix (instructions + content) first, per-task details last,
+        # so the prefix can be served from the provider's prompt cache.
+        prefix, focus = self.task_prefix(content, document)
+        prompt = focus + self.prompts.questions_task(num_questions, difficulty.value, question_type.value)
         
         try:
             logger.info(f"Generating {num_questions} questions...")
             
             generated_json = await self.llm_service.generate_json(
                 prompt=prompt,
-                temperature=0.5
+                temperature=0.5,
+                cache_prefix=prefix
             )
             
             # --- FIX 2: Normalize JSON Structure ---
             # Handle cases where AI returns a list OR a dict wrapping a list
-            data_list = []
-            if isinstance(generated_json, list):
-                data_list = generated_json
-            elif isinstance(generated_json, dict) and "questions" in generated_json:
-                data_list = generated_json["questions"]
-            else:
+            data_list = self._extract_items(generated_json, "questions")
+            if data_list is None:
                 logger.warning(f"Unexpected JSON structure from LLM: {type(generated_json)}")
                 return []
 
-            validated_questions = []
-            
-            for q_data in data_list:
-                try:
-                    # --- FIX 3: Data Normalization (The "KeyError" Fix) ---
-                    
-                    # Map 'question' -> 'question_text' (Common AI inconsistency)
-                    if 'question' in q_data and 'question_text' not in q_data:
-                        q_data['question_text'] = q_data.pop('question')
-
-                    # Map 'answer' -> 'correct_answer'
-                    if 'answer' in q_data and 'correct_answer' not in q_data:
-                        q_data['correct_answer'] = q_data.pop('answer')
-
-                    # Ensure 'options' exists (AI often omits it for Short Answer/TrueFalse)
-                    if 'options' not in q_data:
-                        q_data['options'] = []
-
-                    # Ensure points is an integer
-                    q_data['points'] = int(q_data.get('points', 1))
-
-                    # Validate with Pydantic model
-                    validated_questions.append(Question(**q_data))
-                    
-                except Exception as validation_err:
-                    # Log the specific error but don't crash the whole request
-                    logger.warning(f"Skipping invalid question data: {validation_err} | Data: {q_data}")
-                    continue
+            # --- FIX 3: Local validation and repair ---
+            validated_questions, errors = self._validate_questions(data_list, question_type, difficulty)
+
+            # Ask for replacements for the failed/missing slots only, in one
+            # small follow-up call that reuses the cached content prefix.
+            missing = num_questions - len(validated_questions)
+            if missing > 0 and settings.QUESTION_REPAIR_ENABLED:
+                logger.info(f"{missing} of {num_questions} questions failed validation; requesting replacements")
+                validated_questions += await self._generate_replacements(
+                    prefix, focus, missing, difficulty, question_type, errors, validated_questions
+                )
 
             return validated_questions
 
+        except LLMProviderError:
+            # Propagated so sharded generation can cool this provider down
+            raise
         except LLMServiceError as e:
             logger.error(f"Error generating questions: {e}")
             return []
@@ -106,27 +95,84 @@ class QuestionGeneratorService:
             logger.error(f"Unexpected error in generate_questions: {e}", exc_info=True)
             raise e
 
+    @staticmethod
+    def _extract_items(generated_json: Any, key: str) -> Optional[List[Any]]:
+        """Return the list of items from a bare list or a {key: [...]} wrapper."""
+        if isinstance(generated_json, list):
+            return generated_json
+        if isinstance(generated_json, dict) and isinstance(generated_json.get(key), list):
+            return generated_json[key]
+        return None
+
+    @staticmethod
+    def _validate_questions(
+        data_list: List[Any],
+        question_type: QuestionType,
+        difficulty: DifficultyLevel
+    ) -> Tuple[List[Question], List[str]]:
+        """Validate raw items; returns the valid questions and the problems found."""
+        validated_questions: List[Question] = []
+        errors: List[str] = []
+        for q_data in data_list:
+            question, problems = check_question(q_data, question_type, difficulty)
+            if question:
+                validated_questions.append(question)
+            else:
+                # Log the specific error but don't crash the whole request
+                logger.warning(f"Invalid question data: {'; '.join(problems)} | Data: {q_data}")
+                errors.extend(problems)
+        return validated_questions, errors
+
+    async def _generate_replacements(
+        self,
+        prefix: str,
+        focus: str,
+        count: int,
+        difficulty: DifficultyLevel,
+        question_type: QuestionType,
+        errors: List[str],
+        existing: List[Question]
+    ) -> List[Question]:
+        """One follow-up call for `count` replacement questions; never retried further."""
+        prompt = focus + self.prompts.question_repair_task(
+            count,
+            difficulty.value,
+            question_type.value,
+            errors=sorted(set(errors)),
+            existing_questions=[q.question_text for q in existing]
+        )
+        try:
+            generated_json = await self.llm_service.generate_json(
+                prompt=prompt,
+                temperature=0.5,
+                cache_prefix=prefix
+            )
+        except LLMServiceError as e:
+            logger.error(f"Error generating replacement questions: {e}")
+            return []
+
+        data_list = self._extract_items(generated_json, "questions") or []
+        replacements, _ = self._validate_questions(data_list, question_type, difficulty)
+        logger.info(f"Recovered {min(len(replacements), count)} of {count} failed questions")
+        return replacements[:count]
+
     async def generate_flashcards(
         self,
         content: str,
-        num_flashcards: int
+        num_flashcards: int,
+        document: Optional[str] = None
     ) -> List[Flashcard]:
         
-        prompt = f"""
-        Based on the following content, generate {num_flashcards} flashcards.
-        Content: {content}
-        
-        Format the output as a JSON list of objects, where each object has:
-        - "front": str (The question or term)
-        - "back": str (The answer or definition)
-        """
+        prefix, focus = self.task_prefix(content, document)
+        prompt = focus + self.prompts.flashcards_task(num_flashcards)
         
         try:
             logger.info(f"Generating {num_flashcards} flashcards...")
             
             generated_json = await self.llm_service.generate_json(
                 prompt=prompt,
-                temperature=0.3
+                temperature=0.3,
+                cache_prefix=prefix
             )
             
             if isinstance(generated_json, list):
@@ -137,6 +183,8 @@ class QuestionGeneratorService:
             logger.warning(f"Unexpected JSON structure from LLM: {type(generated_json)}")
             return []
 
+        except LLMProviderError:
+            raise
         except LLMServiceError as e:
             logger.error(f"Error generating flashcards: {e}")
             return []
@@ -149,22 +197,24 @@ class QuestionGeneratorService:
         content: str
     ) -> str:
         
-        prompt = f"""
-        Based on the following content, generate comprehensive study notes.
-        The notes should be well-structured, clear, concise, and in markdown format.
-        Content: {content}
-        """
+        # Study notes see the whole document, so this is the prompt most
+        # likely to need trimming.
+        prefix = self.prompts.content_prefix(self.prompts.fit_content(content, self.llm_service.model_name))
+        prompt = self.prompts.study_notes_task()
         
         try:
             logger.info("Generating study notes...")
             
             notes = await self.llm_service.generate_text(
                 prompt=prompt,
-                temperature=0.2
+                temperature=0.2,
+                cache_prefix=prefix
             )
             
             return notes or "Failed to generate study notes."
 
+        except LLMProviderError:
+            raise
         except LLMServiceError as e:
             logger.error(f"Error generating study notes: {e}")
             return "Error: Could not generate study notes due to LLM failure."
@@ -0,0 +1,201 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.lesson import QuestionType, DifficultyLevel, BloomLevel, Question
+
+# "mixed" is only valid on a request, never on a stored question
+_QUESTION_TYPES = {t.value for t in QuestionType if t != QuestionType.MIXED}
+_DIFFICULTIES = {d.value for d in DifficultyLevel if d != DifficultyLevel.MIXED}
+_BLOOM_LEVELS = {b.value for b in BloomLevel}
+# Types answered by picking one option; matching and fill-in options aren't choices
+_CHOICE_TYPES = {QuestionType.MULTIPLE_CHOICE.value, QuestionType.TRUE_FALSE.value}
+
+_TYPE_ALIASES = {
+    'mcq': 'multiple_choice',
+    'multiple_choice_question': 'multiple_choice',
+    'true_or_false': 'true_false',
+    'truefalse': 'true_false',
+    'fill_in_the_blank': 'fill_in_the_blanks',
+    'fill_blank': 'fill_in_the_blanks',
+    'fill_in_blank': 'fill_in_the_blanks',
+    'short': 'short_answer',
+}
+_OPTION_LETTERS = "abcdefgh"
+
+
+def _norm_enum(value: Any) -> str:
+    return str(value or "").strip().lower().replace('-', '_').replace(' ', '_')
+
+
+def _norm_text(value: Any) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+
+def normalize_question_data(
+    q_data: Dict[str, Any],
+    requested_type: QuestionType,
+    requested_difficulty: DifficultyLevel
+) -> Dict[str, Any]:
+    """
+    Apply cheap local repairs to a raw LLM question before validation:
+    common key/enum inconsistencies, duplicate options and answer/option
+    mismatches that can be fixed without asking the LLM again.
+    """
+    q_data = dict(q_data)
+
+    # Map 'question' -> 'question_text' (Common AI inconsistency)
+    if 'question' in q_data and 'question_text' not in q_data:
+        q_data['question_text'] = q_data.pop('question')
+
+    # Map 'answer' -> 'correct_answer'
+    if 'answer' in q_data and 'correct_answer' not in q_data:
+        q_data['correct_answer'] = q_data.pop('answer')
+
+    q_data['question_text'] = str(q_data.get('question_text') or "").strip()
+    q_data['correct_answer'] = str(q_data.get('correct_answer') or "").strip()
+    q_data['explanation'] = str(q_data.get('explanation') or "").strip()
+
+    # Ensure points is an integer
+    try:
+        q_data['points'] = int(q_data.get('points', 1))
+    except (TypeError, ValueError):
+        q_data['points'] = 1
+
+    # Ensure 'options' exists (AI often omits it for Short Answer/TrueFalse)
+    options = []
+    for option in q_data.get('options') or []:
+        if isinstance(option, str):
+            option = {'option_text': option, 'is_correct': False}
+        elif isinstance(option, dict):
+            option = {
+                'option_text': str(option.get('option_text') or option.get('text') or "").strip(),
+                'is_correct': bool(option.get('is_correct', False)),
+            }
+        else:
+            continue
+        options.append(option)
+
+    # Drop duplicate options, keeping the correct flag if either copy had it
+    unique: Dict[str, Dict[str, Any]] = {}
+    for option in options:
+        key = _norm_text(option['option_text'])
+        if key in unique:
+            unique[key]['is_correct'] = unique[key]['is_correct'] or option['is_correct']
+        else:
+            unique[key] = option
+    options = list(unique.values())
+
+    # Enum values
+    q_type = _norm_enum(q_data.get('question_type'))
+    q_type = _TYPE_ALIASES.get(q_type, q_type)
+    if q_type not in _QUESTION_TYPES:
+        if requested_type != QuestionType.MIXED:
+            q_type = requested_type.value
+        elif len(options) == 2:
+            q_type = QuestionType.TRUE_FALSE.value
+        elif options:
+            q_type = QuestionType.MULTIPLE_CHOICE.value
+        else:
+            q_type = QuestionType.SHORT_ANSWER.value
+    q_data['question_type'] = q_type
+
+    difficulty = _norm_enum(q_data.get('difficulty'))
+    if difficulty not in _DIFFICULTIES:
+        difficulty = (
+            requested_difficulty.value if requested_difficulty != DifficultyLevel.MIXED
+            else DifficultyLevel.MEDIUM.value
+        )
+    q_data['difficulty'] = difficulty
+
+    bloom_level = _norm_enum(q_data.get('bloom_level'))
+    q_data['bloom_level'] = bloom_level if bloom_level in _BLOOM_LEVELS else BloomLevel.UNDERSTAND.value
+
+    # Short answers are graded on correct_answer alone
+    if q_type == QuestionType.SHORT_ANSWER.value:
+        options = []
+
+    # True/false questions without options get the canonical pair
+    if q_type == QuestionType.TRUE_FALSE.value and not options:
+        options = [
+            {'option_text': 'True', 'is_correct': False},
+            {'option_text': 'False', 'is_correct': False},
+        ]
+
+    if options and q_type in _CHOICE_TYPES:
+        answer = q_data['correct_answer']
+        texts = [_norm_text(option['option_text']) for option in options]
+
+        # "B" or "b)" style answers refer to an option by position
+        letter = answer.strip().rstrip(').').lower()
+        if _norm_text(answer) not in texts and len(letter) == 1 and letter in _OPTION_LETTERS[:len(options)]:
+            answer = options[_OPTION_LETTERS.index(letter)]['option_text']
+
+        # Fall back to the single option the LLM flagged as correct
+        flagged = [option for option in options if option['is_correct']]
+        if _norm_text(answer) not in texts and len(flagged) == 1:
+            answer = flagged[0]['option_text']
+
+        if _norm_text(answer) in texts:
+            for option in options:
+                option['is_correct'] = _norm_text(option['option_text']) == _norm_text(answer)
+        q_data['correct_answer'] = answer
+
+    q_data['options'] = options
+    return q_data
+
+
+def validate_question_data(q_data: Dict[str, Any]) -> List[str]:
+    """Return a list of problems with a (normalized) question; empty if valid."""
+    errors = []
+    q_type = q_data.get('question_type')
+    options = q_data.get('options') or []
+    option_texts = [_norm_text(option.get('option_text')) for option in options]
+
+    if not q_data.get('question_text'):
+        errors.append("question_text is empty")
+    if not q_data.get('correct_answer'):
+        errors.append("correct_answer is empty")
+    if not q_data.get('explanation'):
+        errors.append("explanation is empty")
+    if q_type not in _QUESTION_TYPES:
+        errors.append(f"invalid question_type '{q_type}'")
+    if q_data.get('difficulty') not in _DIFFICULTIES:
+        errors.append(f"invalid difficulty '{q_data.get('difficulty')}'")
+    if q_data.get('bloom_level') not in _BLOOM_LEVELS:
+        errors.append(f"invalid bloom_level '{q_data.get('bloom_level')}'")
+
+    if any(not text for text in option_texts):
+        errors.append("an option is empty")
+    if len(set(option_texts)) != len(option_texts):
+        errors.append("options are not unique")
+
+    if q_type == QuestionType.TRUE_FALSE.value and len(options) != 2:
+        errors.append(f"true_false must have exactly 2 options, got {len(options)}")
+    if q_type == QuestionType.MULTIPLE_CHOICE.value and len(options) < 2:
+        errors.append("multiple_choice needs at least 2 options")
+
+    if q_type in _CHOICE_TYPES and _norm_text(q_data.get('correct_answer')) not in option_texts:
+        errors.append("correct_answer is not one of the options")
+    if q_type in _CHOICE_TYPES and sum(1 for option in options if option.get('is_correct')) != 1:
+        errors.append("exactly one option must be marked correct")
+
+    return errors
+
+
+def check_question(
+    q_data: Any,
+    requested_type: QuestionType,
+    requested_difficulty: DifficultyLevel
+) -> Tuple[Optional[Question], List[str]]:
+    """Normalize, validate and build a Question; returns (question, errors)."""
+    if not isinstance(q_data, dict):
+        return None, [f"item is a {type(q_data).__name__}, not an object"]
+
+    normalized = normalize_question_data(q_data, requested_type, requested_difficulty)
+    errors = validate_question_data(normalized)
+    if errors:
+        return None, errors
+
+    try:
+        return Question(**normalized), []
+    except Exception as e:
+        return None, [f"schema validation failed: {e}"]
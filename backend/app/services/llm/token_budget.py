@@ -0,0 +1,208 @@
+import re
+from collections import Counter, deque
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional
+
+import tiktoken
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Every provider we support (Gemini, Groq/Llama, OpenRouter) uses its own
+# tokenizer; cl100k_base is a close enough approximation for budgeting.
+DEFAULT_ENCODING = "cl100k_base"
+
+_PAGE_NUMBER_RE = re.compile(r'^\s*(page\s*)?\d+(\s*(of|/)\s*\d+)?\s*$', re.IGNORECASE)
+_INLINE_SPACE_RE = re.compile(r'[ \t\f\v\u00a0]+')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+@lru_cache(maxsize=32)
+def get_encoder(model: Optional[str] = None) -> tiktoken.Encoding:
+    """Return a cached tiktoken encoder for a model name."""
+    if model:
+        # OpenRouter style ids look like "openai/gpt-4o"
+        for name in (model, model.split('/')[-1]):
+            try:
+                return tiktoken.encoding_for_model(name)
+            except KeyError:
+                continue
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in a piece of text."""
+    if not text:
+        return 0
+    return len(get_encoder(model).encode(text, disallowed_special=()))
+
+
+def input_budget_for(model: Optional[str] = None) -> int:
+    """Get the input token budget for a model (per-model override or default)."""
+    if model and model in settings.LLM_MODEL_INPUT_BUDGETS:
+        return settings.LLM_MODEL_INPUT_BUDGETS[model]
+    return settings.LLM_INPUT_TOKEN_BUDGET
+
+
+def compact_text(text: str) -> str:
+    """
+    Remove redundant whitespace and boilerplate while keeping paragraph
+    structure. Drops bare page-number lines and short lines that repeat
+    on many pages (running headers/footers in extracted PDFs).
+    """
+    if not text:
+        return ""
+
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [_INLINE_SPACE_RE.sub(' ', line).strip() for line in text.split('\n')]
+
+    repeated = Counter(line for line in lines if line and len(line) <= 80)
+    boilerplate = {line for line, count in repeated.items() if count >= 3}
+
+    kept = [
+        line for line in lines
+        if not _PAGE_NUMBER_RE.match(line) and line not in boilerplate
+    ]
+    return _BLANK_LINES_RE.sub('\n\n', '\n'.join(kept)).strip()
+
+
+def merge_overlapping_chunks(chunks: List[str], min_overlap: int = 20, max_overlap: int = 1000) -> str:
+    """
+    Join chunks, dropping text that a chunk repeats from the end of the
+    previous one (the splitter's overlap window).
+    """
+    merged: List[str] = []
+    previous = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        overlap = 0
+        limit = min(len(previous), len(chunk), max_overlap)
+        for size in range(limit, min_overlap - 1, -1):
+            if previous.endswith(chunk[:size]):
+                overlap = size
+                break
+        merged.append(chunk[overlap:].lstrip() if overlap else chunk)
+        previous = chunk
+    return "\n\n".join(part for part in merged if part)
+
+
+def truncate_to_tokens(
+    text: str,
+    max_tokens: int,
+    model: Optional[str] = None,
+    keep_tail_tokens: int = 0
+) -> str:
+    """
+    Cut text down to max_tokens. The head is snapped back to the last
+    paragraph or sentence boundary; optionally the last keep_tail_tokens
+    tokens are preserved so trailing instructions survive.
+    """
+    encoder = get_encoder(model)
+    tokens = encoder.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+
+    keep_tail_tokens = min(keep_tail_tokens, max_tokens // 2)
+    head = encoder.decode(tokens[:max_tokens - keep_tail_tokens])
+
+    # Prefer not to cut mid-sentence if a boundary is reasonably close.
+    for boundary in ("\n\n", ". ", "\n"):
+        cut = head.rfind(boundary)
+        if cut >= len(head) * 0.8:
+            head = head[:cut + len(boundary)]
+            break
+
+    if not keep_tail_tokens:
+        return head.rstrip()
+    tail = encoder.decode(tokens[-keep_tail_tokens:])
+    return f"{head.rstrip()}\n...\n{tail.lstrip()}"
+
+
+def fit_to_budget(
+    text: str,
+    max_tokens: int,
+    model: Optional[str] = None,
+    keep_tail_tokens: int = 0
+) -> str:
+    """Compact text and, if it is still too long, truncate it to max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    compacted = compact_text(text)
+    if count_tokens(compacted, model) <= max_tokens:
+        return compacted
+
+    logger.warning(f"Content exceeds {max_tokens} token budget after compaction; truncating")
+    return truncate_to_tokens(compacted, max_tokens, model, keep_tail_tokens)
+
+
+def fit_content_to_prompt(content: str, template_overhead: str = "", model: Optional[str] = None) -> str:
+    """
+    Fit the variable content of a prompt into the model's input budget,
+    leaving room for the fixed instructions that surround it.
+    """
+    available = input_budget_for(model) - count_tokens(template_overhead, model)
+    return fit_to_budget(content, available, model)
+
+
+class UsageTracker:
+    """In-process record of token usage per LLM call."""
+
+    def __init__(self, history_size: int = 500):
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._lock = Lock()
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        latency_ms: Optional[float] = None,
+        cached_tokens: int = 0
+    ) -> Dict[str, Any]:
+        entry = {
+            'provider': provider,
+            'model': model,
+            'input_tokens': input_tokens,
+            'cached_tokens': cached_tokens,
+            'output_tokens': output_tokens,
+            'latency_ms': latency_ms,
+        }
+        key = f"{provider}:{model}"
+        with self._lock:
+            self._history.append(entry)
+            totals = self._totals.setdefault(
+                key, {'calls': 0, 'input_tokens': 0, 'cached_tokens': 0, 'output_tokens': 0}
+            )
+            totals['calls'] += 1
+            totals['input_tokens'] += input_tokens
+            totals['cached_tokens'] += cached_tokens
+            totals['output_tokens'] += output_tokens
+        return entry
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history)[-limit:]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            summary = {}
+            for key, totals in self._totals.items():
+                summary[key] = dict(totals)
+                # Share of input tokens the provider served from its prompt cache
+                summary[key]['cache_hit_ratio'] = (
+                    round(totals['cached_tokens'] / totals['input_tokens'], 4)
+                    if totals['input_tokens'] else 0.0
+                )
+            return summary
+
+
+usage_tracker = UsageTracker()
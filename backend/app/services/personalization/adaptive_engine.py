@@ -1,7 +1,9 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.repositories.quiz_repository import QuizRepository
+from app.repositories.concept_repository import ConceptRepository
 from app.core.logging import get_logger
-from app.database.supabase_client import supabase
+from app.database.supabase_client import supabase_admin
+from app.database.executor import db_execute
 
 logger = get_logger(__name__)
 
@@ -11,6 +13,7 @@ class AdaptiveEngine:
     
     def __init__(self):
         self.quiz_repo = QuizRepository()
+        self.concept_repo = ConceptRepository()
     
     async def recommend_difficulty(
         self,
@@ -45,7 +48,7 @@ class AdaptiveEngine:
         """Identify weak areas based on question responses."""
         try:
             # Get all question responses for the lesson
-            attempts = supabase.table('quiz_attempts').select('id').eq('user_id', user_id).eq('lesson_id', lesson_id).execute().data
+            attempts = (await db_execute(supabase_admin.table('quiz_attempts').select('id').eq('user_id', user_id).eq('lesson_id', lesson_id))).data
             
             if not attempts:
                 return []
@@ -53,7 +56,7 @@ class AdaptiveEngine:
             weak_bloom_levels = []
             
             for attempt in attempts:
-                responses = supabase.table('question_responses').select('*, questions(bloom_level)').eq('quiz_attempt_id', attempt['id']).execute().data
+                responses = (await db_execute(supabase_admin.table('question_responses').select('*, questions(bloom_level)').eq('quiz_attempt_id', attempt['id']))).data
                 
                 bloom_performance = {}
                 for resp in responses:
@@ -76,3 +79,63 @@ class AdaptiveEngine:
         except Exception as e:
             logger.error(f"Identify weak areas error: {str(e)}")
             return []
+
+    async def identify_weak_concepts(
+        self,
+        user_id: str,
+        lesson_id: Optional[str] = None,
+        threshold: float = 0.7,
+        min_responses: int = 2
+    ) -> List[Dict[str, Any]]:
+        """
+        Identify concepts the user keeps getting wrong, using the lesson
+        concept index to map answered questions to concepts.
+        """
+        try:
+            concepts = await self.concept_repo.get_user_concepts(user_id, lesson_id)
+            if not concepts:
+                return []
+
+            query = supabase_admin.table('question_responses') \
+                .select('question_id, is_correct, quiz_attempts!inner(user_id, lesson_id)') \
+                .eq('quiz_attempts.user_id', user_id)
+            if lesson_id:
+                query = query.eq('quiz_attempts.lesson_id', lesson_id)
+            responses = (await db_execute(query)).data
+
+            question_stats: Dict[str, Dict[str, int]] = {}
+            for resp in responses:
+                stats = question_stats.setdefault(resp['question_id'], {'correct': 0, 'total': 0})
+                stats['total'] += 1
+                if resp['is_correct']:
+                    stats['correct'] += 1
+
+            # The same concept can appear in several lessons; judge it across all of them
+            concept_stats: Dict[str, Dict[str, Any]] = {}
+            for row in concepts:
+                entry = concept_stats.setdefault(row['concept'], {'correct': 0, 'total': 0, 'lesson_ids': set()})
+                for question_id in row.get('question_ids') or []:
+                    stats = question_stats.get(question_id)
+                    if stats:
+                        entry['correct'] += stats['correct']
+                        entry['total'] += stats['total']
+                        entry['lesson_ids'].add(row['lesson_id'])
+
+            weak_concepts = []
+            for concept, perf in concept_stats.items():
+                if perf['total'] < min_responses:
+                    continue
+                accuracy = perf['correct'] / perf['total']
+                if accuracy < threshold:
+                    weak_concepts.append({
+                        'concept': concept,
+                        'accuracy': round(accuracy, 2),
+                        'responses': perf['total'],
+                        'lesson_ids': sorted(perf['lesson_ids']),
+                    })
+
+            return sorted(weak_concepts, key=lambda c: (c['accuracy'], -c['responses']))
+
+        except Exception as e:
+            logger.error(f"Identify weak concepts error: {str(e)}")
+            return []
@@ -1,6 +1,7 @@
 from typing import Dict, Any, List
 from datetime import datetime, timedelta, timezone
 from app.database.supabase_client import supabase_admin
+from app.database.executor import db_execute
 from app.core.logging import get_logger
 import uuid
 
@@ -57,8 +58,8 @@ class SpacedRepetitionService:
                 'updated_at': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
             }
             
-            supabase_admin.table('spaced_repetition_tracking').update(update_data).eq('id', tracking['id']).execute()
-            refreshed = supabase_admin.table('spaced_repetition_tracking').select('*').eq('id', tracking['id']).single().execute()
+            await db_execute(supabase_admin.table('spaced_repetition_tracking').update(update_data).eq('id', tracking['id']))
+            refreshed = await db_execute(supabase_admin.table('spaced_repetition_tracking').select('*').eq('id', tracking['id']).single())
             return refreshed.data
             
         except Exception as e:
@@ -73,7 +74,7 @@ class SpacedRepetitionService:
         """Get or create tracking record for a flashcard."""
         try:
             # Try to get existing
-            result = supabase_admin.table('spaced_repetition_tracking').select('*').eq('user_id', user_id).eq('flashcard_id', flashcard_id).execute()
+            result = await db_execute(supabase_admin.table('spaced_repetition_tracking').select('*').eq('user_id', user_id).eq('flashcard_id', flashcard_id))
             
             if result.data:
                 return result.data[0]
@@ -94,7 +95,7 @@ class SpacedRepetitionService:
                 'updated_at': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
             }
             
-            result = supabase_admin.table('spaced_repetition_tracking').insert(tracking_data).execute()
+            result = await db_execute(supabase_admin.table('spaced_repetition_tracking').insert(tracking_data))
             return result.data[0]
             
         except Exception as e:
@@ -105,7 +106,7 @@ class SpacedRepetitionService:
         """Get flashcards due for review."""
         try:
             # Get all flashcards for lesson
-            flashcards = supabase_admin.table('flashcards').select('*').eq('lesson_id', lesson_id).execute().data
+            flashcards = (await db_execute(supabase_admin.table('flashcards').select('*').eq('lesson_id', lesson_id))).data
             
             due_cards = []
             for card in flashcards:
@@ -1,4 +1,5 @@
 from sentence_transformers import SentenceTransformer
+from functools import lru_cache
 from typing import List
 import numpy as np
 from app.core.config import settings
@@ -37,6 +38,14 @@ class EmbeddingService:
             logger.error(f"Batch embedding generation error: {str(e)}")
             raise
     
+    def encode(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """Encode texts in one batch; rows are unit length when normalize is set."""
+        try:
+            return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize)
+        except Exception as e:
+            logger.error(f"Batch embedding generation error: {str(e)}")
+            raise
+    
     def compute_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """Compute cosine similarity between two embeddings."""
         try:
@@ -47,4 +56,10 @@ class EmbeddingService:
             return float(similarity)
         except Exception as e:
             logger.error(f"Similarity computation error: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+
+@lru_cache()
+def get_embedding_service() -> EmbeddingService:
+    """Load the embedding model once per process."""
+    return EmbeddingService()
@@ -1,5 +1,6 @@
 from typing import List, Dict, Any
 from app.services.rag.vector_store import VectorStore
+from app.services.llm.token_budget import merge_overlapping_chunks
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -28,7 +29,8 @@ class Retriever:
             # Combine retrieved documents
             if results and results.get('documents'):
                 documents = results['documents'][0]  # First query results
-                context = "\n\n".join(documents)
+                # Neighbouring chunks share an overlap window; don't send it twice.
+                context = merge_overlapping_chunks(documents)
                 logger.info(f"Retrieved {len(documents)} relevant documents")
                 return context
             
@@ -2,7 +2,7 @@ import chromadb
 from chromadb.config import Settings as ChromaSettings
 from typing import List, Dict, Any, Optional
 from app.core.config import settings
-from app.services.rag.embeddings import EmbeddingService
+from app.services.rag.embeddings import get_embedding_service
 from app.core.logging import get_logger
 import uuid
 
@@ -19,7 +19,7 @@ class VectorStore:
                 path=settings.VECTOR_DB_PATH,
                 settings=ChromaSettings(anonymized_telemetry=False)
             )
-            self.embedding_service = EmbeddingService()
+            self.embedding_service = get_embedding_service()
             logger.info("Vector store initialized")
         except Exception as e:
             logger.error(f"Failed to initialize vector store: {str(e)}")
@@ -0,0 +1,130 @@
+"""
+Request throughput and event-loop stalls under concurrent requests, when
+repository methods call the blocking supabase-py client inline (the
+previous behaviour) against running it on DatabaseExecutor.
+
+Each simulated request makes --queries sequential database calls. By
+default a call is a synthetic query that blocks its thread for --latency-ms,
+as an HTTP round trip to PostgREST does; --live sends a small real query
+instead (needs the same .env as the app). Run from backend/:
+
+    python -m benchmarks.bench_db_throughput --concurrency 1 10 50 --workers 4 16
+    python -m benchmarks.bench_db_throughput --live --concurrency 10 --workers 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable, List
+
+from app.database.executor import DatabaseExecutor
+
+LAG_INTERVAL = 0.005
+
+
+class SyntheticQuery:
+    """Stands in for a supabase-py query builder; execute() blocks like a round trip."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def execute(self) -> Any:
+        time.sleep(self.latency)
+        return None
+
+
+def make_query(args: argparse.Namespace) -> Callable[[], Any]:
+    if not args.live:
+        return lambda: SyntheticQuery(args.latency_ms / 1000)
+    from app.database.supabase_client import supabase_admin
+    return lambda: supabase_admin.table('lessons').select('id').limit(1)
+
+
+async def watch_loop_lag(lags: List[float], stop: asyncio.Event) -> None:
+    """Record how late the loop wakes a short sleep; blocking calls show up here."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(time.perf_counter() - started - LAG_INTERVAL)
+
+
+async def run_mode(
+    execute: Callable[[Any], Awaitable[Any]],
+    make: Callable[[], Any],
+    concurrency: int,
+    requests: int,
+    queries: int
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def request() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            for _ in range(queries):
+                await execute(make())
+            latencies.append(time.perf_counter() - started)
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+
+    latencies.sort()
+    return {
+        'rps': requests / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'max_lag_ms': max(lags, default=0.0) * 1000,
+    }
+
+
+async def inline(query: Any) -> Any:
+    return query.execute()
+
+
+def report(name: str, concurrency: int, result: dict, baseline: float) -> None:
+    print(
+        f"{name:<16} {concurrency:>5} {result['rps']:>9.1f} {result['rps'] / baseline:>7.1f}x "
+        f"{result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} {result['max_lag_ms']:>10.0f}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    make = make_query(args)
+    source = "live PostgREST" if args.live else f"synthetic {args.latency_ms}ms"
+    print(f"{args.requests} requests x {args.queries} queries, {source} per query")
+    print(f"{'mode':<16} {'conc':>5} {'req/s':>9} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9} {'loop lag':>10}")
+
+    for concurrency in args.concurrency:
+        result = await run_mode(inline, make, concurrency, args.requests, args.queries)
+        baseline = result['rps']
+        report("inline", concurrency, result, baseline)
+
+        for workers in args.workers:
+            executor = DatabaseExecutor(max_workers=workers, slow_query_ms=0)
+            try:
+                result = await run_mode(executor.execute, make, concurrency, args.requests, args.queries)
+                report(f"executor/{workers}", concurrency, result, baseline)
+            finally:
+                executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=4, help="sequential database calls per request")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--live", action="store_true", help="query the configured Supabase project")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
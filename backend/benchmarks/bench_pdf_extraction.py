@@ -0,0 +1,123 @@
+"""
+Compare PDF text extraction engines (PyPDF2, pypdf), serial on one core
+against page-range sharding across ExtractionExecutor worker processes.
+
+Uses --pdf if given, otherwise writes a synthetic text PDF with --pages
+pages. Run from backend/ (needs the same .env as the app):
+
+    python -m benchmarks.bench_pdf_extraction --pages 300 --workers 4
+    python -m benchmarks.bench_pdf_extraction --pdf textbook.pdf --shard 10 25 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+from app.services.content.extraction import PDF_ENGINES, ExtractionExecutor, extract_pdf_text
+
+WORDS = (
+    "cell membrane protein energy molecule enzyme reaction structure function "
+    "system process theory model evidence analysis variable pressure volume "
+    "temperature population species gene evolution market demand supply price"
+).split()
+LINES_PER_PAGE = 45
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_synthetic_pdf(path: str, pages: int, seed: int = 7) -> None:
+    """A minimal PDF with pages of Helvetica text, so no PDF writer dependency is needed."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * i for i in range(pages)]
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for number, page_id in enumerate(page_ids, start=1):
+        lines = [f"Section {number}"] + [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 13))) for _ in range(LINES_PER_PAGE)
+        ]
+        ops = ["BT", "/F1 11 Tf", "14 TL", "50 780 Td"]
+        ops += [f"({_pdf_string(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_at = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at))
+
+
+def timed(run, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, timings: List[float], chars: int, baseline: float) -> None:
+    median = statistics.median(timings)
+    print(f"{name:<28} {median:>8.2f}s {baseline / median:>7.2f}x {chars:>12,}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to extract (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--shard", type=int, nargs="+", default=[25])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if not path:
+            path = os.path.join(tmp, "synthetic.pdf")
+            write_synthetic_pdf(path, args.pages)
+        print(f"{path} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB), {args.workers} workers")
+        print(f"{'mode':<28} {'median':>9} {'speedup':>8} {'chars':>12}")
+
+        baseline = None
+        for engine in PDF_ENGINES:
+            text = extract_pdf_text(path, engine)
+            timings = timed(lambda: extract_pdf_text(path, engine), args.repeat)
+            baseline = baseline or statistics.median(timings)
+            report(f"{engine} serial", timings, len(text), baseline)
+
+            for shard in args.shard:
+                executor = ExtractionExecutor(
+                    max_workers=args.workers, pdf_engine=engine, pdf_pages_per_shard=shard
+                )
+                try:
+                    # Warm the pool so worker start-up is not counted
+                    result = asyncio.run(executor.extract(path, ".pdf"))
+                    timings = timed(lambda: asyncio.run(executor.extract(path, ".pdf")), args.repeat)
+                    report(f"{engine} sharded/{shard}", timings, len(result["text"]), baseline)
+                finally:
+                    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Peak RSS per concurrent upload: the previous read-everything path
+(await file.read(), then BytesIO for extraction and bytes for storage)
+against spool_upload, which copies to disk in UPLOAD_CHUNK_SIZE steps and
+hands extraction and storage a file stream.
+
+Each (mode, concurrency) pair runs in a fresh process so ru_maxrss is not
+polluted by earlier runs. Run from backend/ (needs the same .env as the app):
+
+    python -m benchmarks.bench_upload_memory --size-mb 10 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from typing import BinaryIO, Dict
+
+from starlette.datastructures import UploadFile
+
+from app.services.content.upload_spool import spool_upload
+
+# Starlette's multipart parser keeps the first MiB in memory, then rolls over to disk
+PARSER_SPOOL_MAX_SIZE = 1024 * 1024
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def peak_rss_kib() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_upload(size: int) -> UploadFile:
+    """An UploadFile as the multipart parser would hand it to the route."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=PARSER_SPOOL_MAX_SIZE)
+    block = os.urandom(STREAM_BLOCK_SIZE)
+    written = 0
+    while written < size:
+        spooled.write(block[:size - written])
+        written += min(len(block), size - written)
+    spooled.seek(0)
+    return UploadFile(file=spooled, size=size, filename="lecture.pdf")
+
+
+def consume_stream(stream: BinaryIO) -> str:
+    """Stand-in for extraction/storage reading a file stream block by block."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(STREAM_BLOCK_SIZE), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+async def legacy_upload(file: UploadFile, barrier: asyncio.Barrier) -> None:
+    content = await file.read()
+    extraction_copy = io.BytesIO(content).getvalue()
+    consume_stream(io.BytesIO(extraction_copy))
+    # Every upload holds its buffers at the same time, as under real load
+    await barrier.wait()
+    hashlib.sha256(content).hexdigest()
+
+
+async def spooled_upload(file: UploadFile, barrier: asyncio.Barrier) -> None:
+    with await spool_upload(file, file.filename, max_bytes=file.size + 1) as upload:
+        with upload.open() as stream:
+            consume_stream(stream)
+        await barrier.wait()
+        with upload.open() as stream:
+            consume_stream(stream)
+
+
+def run_case(mode: str, size: int, concurrency: int, results: Dict) -> None:
+    uploads = [make_upload(size) for _ in range(concurrency)]
+    baseline = peak_rss_kib()
+    handler = legacy_upload if mode == "legacy" else spooled_upload
+
+    async def main() -> None:
+        barrier = asyncio.Barrier(concurrency)
+        await asyncio.gather(*(handler(upload, barrier) for upload in uploads))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    results[(mode, concurrency)] = (peak_rss_kib() - baseline, time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        for concurrency in args.concurrency:
+            for mode in ("legacy", "spooled"):
+                process = ctx.Process(target=run_case, args=(mode, size, concurrency, results))
+                process.start()
+                process.join()
+
+        print(f"{args.size_mb:.1f} MiB uploads")
+        print(f"{'mode':<8} {'concurrent':>10} {'peak RSS +MiB':>14} {'per upload MiB':>15} {'seconds':>8}")
+        for concurrency in args.concurrency:
+            for mode in ("legacy", "spooled"):
+                rss_kib, seconds = results[(mode, concurrency)]
+                print(
+                    f"{mode:<8} {concurrency:>10} {rss_kib / 1024:>14.1f} "
+                    f"{rss_kib / 1024 / concurrency:>15.2f} {seconds:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+-- Trigram indexes for substring concept search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Users table (extends Supabase auth.users)
 CREATE TABLE users (
@@ -71,6 +73,29 @@ CREATE TABLE study_notes (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Content-addressed upload blobs, shared by every uploaded_files row with the same sha256
+CREATE TABLE file_blobs (
+    sha256 TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL, -- storage object, blobs/<sha256><ext>
+    file_type TEXT NOT NULL,
+    file_size BIGINT,
+    extracted_text TEXT, -- legacy; new blobs keep their text in file_text_blocks
+    page_offsets JSONB,
+    text_length INTEGER, -- characters of extracted text
+    block_chars INTEGER, -- characters per file_text_blocks block
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    pending_uploads INTEGER NOT NULL DEFAULT 0, -- uploads storing this blob's object/text, not yet registered
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Extracted text of a blob, in fixed-size character blocks (zlib, base64)
+CREATE TABLE file_text_blocks (
+    sha256 TEXT NOT NULL,
+    block_index INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (sha256, block_index)
+);
+
 -- Uploaded files table
 CREATE TABLE uploaded_files (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -79,7 +104,9 @@ CREATE TABLE uploaded_files (
     file_path TEXT NOT NULL,
     file_type TEXT NOT NULL,
     file_size BIGINT,
-    extracted_text TEXT,
+    sha256 TEXT REFERENCES file_blobs(sha256), -- NULL for files uploaded before deduplication
+    extracted_text TEXT, -- NULL when the text lives on the shared blob
+    page_offsets JSONB, -- [start, end) character range of each PDF page in extracted_text
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -91,6 +118,9 @@ CREATE TABLE quiz_attempts (
     score INTEGER NOT NULL,
     total_questions INTEGER NOT NULL,
     time_taken INTEGER, -- in seconds
+    -- Running totals of question_responses, kept by record_question_response
+    answered_count INTEGER NOT NULL DEFAULT 0,
+    correct_count INTEGER NOT NULL DEFAULT 0,
     completed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -119,14 +149,30 @@ CREATE TABLE spaced_repetition_tracking (
     UNIQUE(user_id, flashcard_id)
 );
 
+-- Lesson concepts table (per-user concept -> lesson/questions index)
+CREATE TABLE lesson_concepts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    lesson_id UUID NOT NULL REFERENCES lessons(id) ON DELETE CASCADE,
+    concept TEXT NOT NULL,
+    weight FLOAT DEFAULT 0,
+    question_ids UUID[] DEFAULT '{}',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(lesson_id, concept)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_lessons_user_id ON lessons(user_id);
 CREATE INDEX idx_lessons_folder_id ON lessons(folder_id);
 CREATE INDEX idx_questions_lesson_id ON questions(lesson_id);
 CREATE INDEX idx_flashcards_lesson_id ON flashcards(lesson_id);
 CREATE INDEX idx_uploaded_files_user_id ON uploaded_files(user_id);
+CREATE INDEX idx_uploaded_files_sha256 ON uploaded_files(sha256);
 CREATE INDEX idx_quiz_attempts_user_id ON quiz_attempts(user_id);
 CREATE INDEX idx_quiz_attempts_lesson_id ON quiz_attempts(lesson_id);
+CREATE INDEX idx_lesson_concepts_user_concept ON lesson_concepts(user_id, concept);
+CREATE INDEX idx_lesson_concepts_lesson_id ON lesson_concepts(lesson_id);
+CREATE INDEX idx_lesson_concepts_concept_trgm ON lesson_concepts USING GIN (concept gin_trgm_ops);
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
@@ -136,9 +182,12 @@ ALTER TABLE questions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE flashcards ENABLE ROW LEVEL SECURITY;
 ALTER TABLE study_notes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE uploaded_files ENABLE ROW LEVEL SECURITY;
+ALTER TABLE file_blobs ENABLE ROW LEVEL SECURITY; -- no policies: service role only
+ALTER TABLE file_text_blocks ENABLE ROW LEVEL SECURITY; -- no policies: service role only
 ALTER TABLE quiz_attempts ENABLE ROW LEVEL SECURITY;
 ALTER TABLE question_responses ENABLE ROW LEVEL SECURITY;
 ALTER TABLE spaced_repetition_tracking ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lesson_concepts ENABLE ROW LEVEL SECURITY;
 
 -- RLS Policies for users
 CREATE POLICY "Users can view their own data" ON users FOR SELECT USING (auth.uid() = id);
@@ -174,3 +223,364 @@ CREATE POLICY "Users can create their own quiz attempts" ON quiz_attempts FOR IN
 
 CREATE POLICY "Users can view their own spaced repetition data" ON spaced_repetition_tracking FOR SELECT USING (auth.uid() = user_id);
 CREATE POLICY "Users can manage their own spaced repetition data" ON spaced_repetition_tracking FOR ALL USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view their own lesson concepts" ON lesson_concepts FOR SELECT USING (auth.uid() = user_id);
+
+-- Functions
+
+-- Add a user's reference to a blob (creating the blob on first upload) and
+-- insert their uploaded_files row, atomically. With p_require_existing the
+-- caller has nothing stored yet (a deduplicated upload): it only attaches to
+-- a blob that is already registered and returns no row otherwise. Without
+-- it, the caller has stored the object and text under a claim_blob claim,
+-- which registration turns into a reference.
+CREATE OR REPLACE FUNCTION register_file(
+    p_id UUID,
+    p_user_id UUID,
+    p_filename TEXT,
+    p_file_type TEXT,
+    p_file_size BIGINT,
+    p_sha256 TEXT,
+    p_file_path TEXT,
+    p_extracted_text TEXT DEFAULT NULL,
+    p_page_offsets JSONB DEFAULT NULL,
+    p_text_length INTEGER DEFAULT NULL,
+    p_block_chars INTEGER DEFAULT NULL,
+    p_require_existing BOOLEAN DEFAULT FALSE
+) RETURNS SETOF uploaded_files AS $$
+BEGIN
+    IF p_require_existing THEN
+        UPDATE file_blobs SET ref_count = ref_count + 1
+        WHERE sha256 = p_sha256 AND ref_count > 0;
+        IF NOT FOUND THEN
+            RETURN;
+        END IF;
+    ELSE
+        INSERT INTO file_blobs AS b (
+            sha256, file_path, file_type, file_size, extracted_text, page_offsets, text_length, block_chars, ref_count
+        )
+        VALUES (
+            p_sha256, p_file_path, p_file_type, p_file_size, p_extracted_text, p_page_offsets, p_text_length, p_block_chars, 1
+        )
+        ON CONFLICT (sha256) DO UPDATE SET
+            page_offsets = COALESCE(b.page_offsets, EXCLUDED.page_offsets),
+            text_length = COALESCE(b.text_length, EXCLUDED.text_length),
+            block_chars = COALESCE(b.block_chars, EXCLUDED.block_chars),
+            ref_count = b.ref_count + 1,
+            pending_uploads = GREATEST(b.pending_uploads - 1, 0);
+    END IF;
+
+    RETURN QUERY
+    INSERT INTO uploaded_files (id, user_id, filename, file_path, file_type, file_size, sha256)
+    SELECT p_id, p_user_id, p_filename, b.file_path, p_file_type, p_file_size, p_sha256
+    FROM file_blobs b WHERE b.sha256 = p_sha256
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Claim a blob before storing its object and text, so neither a failed
+-- identical upload nor the release of the blob's last file deletes them
+-- while this upload is still in progress.
+CREATE OR REPLACE FUNCTION claim_blob(
+    p_sha256 TEXT,
+    p_file_path TEXT,
+    p_file_type TEXT,
+    p_file_size BIGINT
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO file_blobs AS b (sha256, file_path, file_type, file_size, pending_uploads)
+    VALUES (p_sha256, p_file_path, p_file_type, p_file_size, 1)
+    ON CONFLICT (sha256) DO UPDATE SET pending_uploads = b.pending_uploads + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop the claim of an upload that failed before registering. orphaned is
+-- true when nothing else references or is storing the blob; its text blocks
+-- are deleted here and the caller removes the storage object.
+CREATE OR REPLACE FUNCTION release_blob_claim(p_sha256 TEXT)
+RETURNS TABLE (file_path TEXT, orphaned BOOLEAN) AS $$
+DECLARE
+    v_path TEXT;
+    v_refs INTEGER;
+    v_pending INTEGER;
+BEGIN
+    UPDATE file_blobs b SET pending_uploads = GREATEST(b.pending_uploads - 1, 0)
+    WHERE b.sha256 = p_sha256
+    RETURNING b.file_path, b.ref_count, b.pending_uploads INTO v_path, v_refs, v_pending;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF v_refs <= 0 AND v_pending <= 0 THEN
+        DELETE FROM file_text_blocks t WHERE t.sha256 = p_sha256;
+        DELETE FROM file_blobs b WHERE b.sha256 = p_sha256;
+        RETURN QUERY SELECT v_path, TRUE;
+    ELSE
+        RETURN QUERY SELECT v_path, FALSE;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Delete a user's file and drop its blob reference. orphaned is true when no
+-- other file uses the storage object any more (the caller removes it).
+CREATE OR REPLACE FUNCTION release_file(p_file_id UUID, p_user_id UUID)
+RETURNS TABLE (file_path TEXT, blob_sha256 TEXT, orphaned BOOLEAN) AS $$
+DECLARE
+    v_sha256 TEXT;
+    v_path TEXT;
+    v_remaining INTEGER;
+    v_pending INTEGER;
+BEGIN
+    DELETE FROM uploaded_files f
+    WHERE f.id = p_file_id AND f.user_id = p_user_id
+    RETURNING f.sha256, f.file_path INTO v_sha256, v_path;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF v_sha256 IS NULL THEN
+        -- Pre-deduplication upload: the object belonged to this row alone
+        RETURN QUERY SELECT v_path, NULL::TEXT, TRUE;
+        RETURN;
+    END IF;
+
+    UPDATE file_blobs b SET ref_count = b.ref_count - 1
+    WHERE b.sha256 = v_sha256
+    RETURNING b.ref_count, b.pending_uploads INTO v_remaining, v_pending;
+
+    -- An upload of the same bytes in progress keeps the object and text
+    IF v_remaining IS NOT NULL AND v_remaining <= 0 AND v_pending <= 0 THEN
+        DELETE FROM file_text_blocks t WHERE t.sha256 = v_sha256;
+        DELETE FROM file_blobs b WHERE b.sha256 = v_sha256;
+        RETURN QUERY SELECT v_path, v_sha256, TRUE;
+    ELSE
+        RETURN QUERY SELECT v_path, v_sha256, FALSE;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create a lesson with its generated questions, flashcards and study notes in
+-- one transaction. Returns the lesson row with 'questions', 'flashcards' and
+-- 'study_notes' attached, the same shape as a lesson read.
+CREATE OR REPLACE FUNCTION create_lesson_with_content(
+    p_lesson JSONB,
+    p_questions JSONB,
+    p_flashcards JSONB,
+    p_study_notes TEXT
+) RETURNS JSONB AS $$
+DECLARE
+    v_lesson JSONB;
+    v_questions JSONB;
+    v_flashcards JSONB;
+BEGIN
+    INSERT INTO lessons AS l (id, user_id, folder_id, title, description, created_at, updated_at)
+    SELECT r.id, r.user_id, r.folder_id, r.title, r.description,
+           COALESCE(r.created_at, NOW()), COALESCE(r.updated_at, NOW())
+    FROM jsonb_populate_record(NULL::lessons, p_lesson) r
+    RETURNING to_jsonb(l) INTO v_lesson;
+
+    WITH inserted AS (
+        INSERT INTO questions AS q (
+            id, lesson_id, question_text, question_type, difficulty, bloom_level,
+            correct_answer, explanation, options, points
+        )
+        SELECT r.id, (v_lesson->>'id')::UUID, r.question_text, r.question_type, r.difficulty, r.bloom_level,
+               r.correct_answer, r.explanation, r.options, COALESCE(r.points, 1)
+        FROM jsonb_populate_recordset(NULL::questions, COALESCE(p_questions, '[]'::JSONB)) r
+        RETURNING q.*
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::JSONB) INTO v_questions FROM inserted;
+
+    WITH inserted AS (
+        INSERT INTO flashcards AS f (id, lesson_id, front, back, confidence_level)
+        SELECT r.id, (v_lesson->>'id')::UUID, r.front, r.back, COALESCE(r.confidence_level, 0)
+        FROM jsonb_populate_recordset(NULL::flashcards, COALESCE(p_flashcards, '[]'::JSONB)) r
+        RETURNING f.*
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::JSONB) INTO v_flashcards FROM inserted;
+
+    INSERT INTO study_notes (lesson_id, content)
+    VALUES ((v_lesson->>'id')::UUID, COALESCE(p_study_notes, ''));
+
+    RETURN v_lesson || jsonb_build_object(
+        'questions', v_questions,
+        'flashcards', v_flashcards,
+        'study_notes', COALESCE(p_study_notes, '')
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Swap newly generated content into an existing lesson in one transaction.
+-- Questions with quiz attempts and flashcards under review are kept and the
+-- new items are added alongside them. Locking the lesson row serializes
+-- concurrent replaces and blocks new attempts (whose foreign key needs a
+-- share lock on it) until the swap commits. Returns FALSE if the lesson
+-- doesn't exist.
+CREATE OR REPLACE FUNCTION replace_lesson_content(
+    p_lesson_id UUID,
+    p_questions JSONB,
+    p_flashcards JSONB,
+    p_study_notes TEXT
+) RETURNS BOOLEAN AS $$
+BEGIN
+    PERFORM 1 FROM lessons WHERE id = p_lesson_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM quiz_attempts WHERE lesson_id = p_lesson_id) THEN
+        DELETE FROM questions WHERE lesson_id = p_lesson_id;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM spaced_repetition_tracking s
+        JOIN flashcards f ON f.id = s.flashcard_id
+        WHERE f.lesson_id = p_lesson_id
+    ) THEN
+        DELETE FROM flashcards WHERE lesson_id = p_lesson_id;
+    END IF;
+
+    DELETE FROM study_notes WHERE lesson_id = p_lesson_id;
+
+    INSERT INTO questions (
+        id, lesson_id, question_text, question_type, difficulty, bloom_level,
+        correct_answer, explanation, options, points
+    )
+    SELECT r.id, p_lesson_id, r.question_text, r.question_type, r.difficulty, r.bloom_level,
+           r.correct_answer, r.explanation, r.options, COALESCE(r.points, 1)
+    FROM jsonb_populate_recordset(NULL::questions, COALESCE(p_questions, '[]'::JSONB)) r;
+
+    INSERT INTO flashcards (id, lesson_id, front, back, confidence_level)
+    SELECT r.id, p_lesson_id, r.front, r.back, COALESCE(r.confidence_level, 0)
+    FROM jsonb_populate_recordset(NULL::flashcards, COALESCE(p_flashcards, '[]'::JSONB)) r;
+
+    INSERT INTO study_notes (lesson_id, content)
+    VALUES (p_lesson_id, COALESCE(p_study_notes, ''));
+
+    UPDATE lessons SET updated_at = NOW() WHERE id = p_lesson_id;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Record one answer of an in-progress attempt and update its running score.
+-- Locking the attempt row serializes concurrent answers, so the counters stay
+-- exact without recounting question_responses. Returns no row if the attempt
+-- isn't the user's.
+CREATE OR REPLACE FUNCTION record_question_response(
+    p_attempt_id UUID,
+    p_user_id UUID,
+    p_question_id UUID,
+    p_user_answer TEXT,
+    p_is_correct BOOLEAN,
+    p_time_taken INTEGER DEFAULT 0
+) RETURNS TABLE (answered_count INTEGER, correct_count INTEGER, score INTEGER) AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE quiz_attempts a SET
+        answered_count = a.answered_count + 1,
+        correct_count = a.correct_count + p_is_correct::INTEGER,
+        total_questions = a.answered_count + 1,
+        score = ROUND((a.correct_count + p_is_correct::INTEGER) * 100.0 / (a.answered_count + 1))::INTEGER
+    WHERE a.id = p_attempt_id AND a.user_id = p_user_id
+    RETURNING a.answered_count, a.correct_count, a.score;
+
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO question_responses (quiz_attempt_id, question_id, user_answer, is_correct, time_taken)
+    VALUES (p_attempt_id, p_question_id, p_user_answer, p_is_correct, p_time_taken);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Save a whole quiz submission in one transaction: the completed attempt and
+-- all of its graded responses (a JSON array of {question_id, user_answer,
+-- is_correct, time_taken}). Returns the attempt row.
+CREATE OR REPLACE FUNCTION submit_quiz_attempt(
+    p_user_id UUID,
+    p_lesson_id UUID,
+    p_score INTEGER,
+    p_total_questions INTEGER,
+    p_time_taken INTEGER,
+    p_responses JSONB
+) RETURNS SETOF quiz_attempts AS $$
+DECLARE
+    v_attempt quiz_attempts;
+BEGIN
+    INSERT INTO quiz_attempts (
+        user_id, lesson_id, score, total_questions, time_taken, answered_count, correct_count
+    )
+    SELECT p_user_id, p_lesson_id, p_score, p_total_questions, p_time_taken,
+           COUNT(*), COUNT(*) FILTER (WHERE r.is_correct)
+    FROM jsonb_to_recordset(COALESCE(p_responses, '[]'::JSONB)) AS r(is_correct BOOLEAN)
+    RETURNING * INTO v_attempt;
+
+    INSERT INTO question_responses (quiz_attempt_id, question_id, user_answer, is_correct, time_taken)
+    SELECT v_attempt.id, r.question_id, r.user_answer, r.is_correct, COALESCE(r.time_taken, 0)
+    FROM jsonb_to_recordset(COALESCE(p_responses, '[]'::JSONB))
+        AS r(question_id UUID, user_answer TEXT, is_correct BOOLEAN, time_taken INTEGER);
+
+    RETURN NEXT v_attempt;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Upgrading an existing database
+-- The CREATE TABLE statements above are for a fresh install. Run this
+-- section on a database created from an older version of this file to add
+-- what has changed since; every statement is safe to re-run.
+
+-- Page offsets of extracted PDF text
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS page_offsets JSONB;
+
+-- Content-addressed upload blobs
+CREATE TABLE IF NOT EXISTS file_blobs (
+    sha256 TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    file_size BIGINT,
+    extracted_text TEXT,
+    page_offsets JSONB,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+ALTER TABLE file_blobs ADD COLUMN IF NOT EXISTS pending_uploads INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE file_blobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS sha256 TEXT REFERENCES file_blobs(sha256);
+CREATE INDEX IF NOT EXISTS idx_uploaded_files_sha256 ON uploaded_files(sha256);
+
+-- Extracted text stored in blocks
+ALTER TABLE file_blobs ADD COLUMN IF NOT EXISTS text_length INTEGER;
+ALTER TABLE file_blobs ADD COLUMN IF NOT EXISTS block_chars INTEGER;
+CREATE TABLE IF NOT EXISTS file_text_blocks (
+    sha256 TEXT NOT NULL,
+    block_index INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (sha256, block_index)
+);
+ALTER TABLE file_text_blocks ENABLE ROW LEVEL SECURITY;
+
+-- Running answer counters on quiz attempts, backfilled from the responses
+-- recorded before they existed
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'quiz_attempts' AND column_name = 'answered_count'
+    ) THEN
+        ALTER TABLE quiz_attempts ADD COLUMN answered_count INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE quiz_attempts ADD COLUMN IF NOT EXISTS correct_count INTEGER NOT NULL DEFAULT 0;
+
+        UPDATE quiz_attempts a SET
+            answered_count = s.answered,
+            correct_count = s.correct
+        FROM (
+            SELECT quiz_attempt_id, COUNT(*) AS answered, COUNT(*) FILTER (WHERE is_correct) AS correct
+            FROM question_responses
+            GROUP BY quiz_attempt_id
+        ) s
+        WHERE s.quiz_attempt_id = a.id;
+    END IF;
+END;
+$$;
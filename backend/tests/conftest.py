@@ -0,0 +1,8 @@
+import os
+
+# Settings validation needs these before any app module is imported
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("LLM_API_KEY", "test-llm-key")
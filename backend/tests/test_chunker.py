@@ -0,0 +1,108 @@
+from app.services.content.chunker import TokenChunker, is_heading, iter_blocks
+from app.services.llm.token_budget import count_tokens
+
+SENTENCES = [
+    "Cells are the basic unit of life.",
+    "Every cell is enclosed by a membrane that controls what enters and leaves.",
+    "The nucleus stores genetic material in the form of DNA.",
+    "Mitochondria convert nutrients into ATP through cellular respiration.",
+    "Ribosomes read messenger RNA and assemble proteins from amino acids.",
+    "The endoplasmic reticulum folds and transports newly made proteins.",
+    "The Golgi apparatus packages proteins for delivery inside or outside the cell.",
+    "Lysosomes break down worn out organelles and engulfed particles.",
+]
+
+
+def document(paragraphs: int = 6) -> str:
+    return "\n\n".join(
+        " ".join(SENTENCES[(start + i) % len(SENTENCES)] for i in range(5))
+        for start in range(paragraphs)
+    )
+
+
+class TestTokenChunker:
+    def test_chunks_never_exceed_max_tokens(self):
+        chunker = TokenChunker(max_tokens=60, overlap_tokens=20)
+
+        chunks = list(chunker.iter_chunks(document(10)))
+
+        assert len(chunks) > 3
+        assert all(count_tokens(chunk) <= 60 for chunk in chunks)
+
+    def test_chunks_end_on_sentence_boundaries(self):
+        chunker = TokenChunker(max_tokens=60, overlap_tokens=0)
+
+        for chunk in chunker.iter_chunks(document()):
+            assert chunk.endswith(".")
+
+    def test_consecutive_chunks_overlap_by_whole_sentences(self):
+        chunker = TokenChunker(max_tokens=60, overlap_tokens=25)
+
+        chunks = list(chunker.iter_chunks(document()))
+
+        for previous, current in zip(chunks, chunks[1:]):
+            first_sentence = current.split(". ")[0].split("\n")[0].rstrip(".") + "."
+            assert first_sentence in previous
+            assert count_tokens(first_sentence) <= 25
+
+    def test_no_overlap_when_disabled(self):
+        chunker = TokenChunker(max_tokens=60, overlap_tokens=0)
+
+        chunks = list(chunker.iter_chunks(document()))
+
+        joined = " ".join(chunks)
+        assert sum(joined.count(sentence) for sentence in SENTENCES) == 6 * 5
+
+    def test_heading_starts_a_new_chunk(self):
+        chunker = TokenChunker(max_tokens=80, overlap_tokens=20)
+        text = "\n\n".join([
+            " ".join(SENTENCES[:4]),
+            "Cell Division",
+            " ".join(SENTENCES[4:]),
+        ])
+
+        chunks = list(chunker.iter_chunks(text))
+
+        assert len(chunks) == 2
+        assert chunks[1].startswith("Cell Division\n")
+        assert SENTENCES[3] not in chunks[1]
+
+    def test_long_run_on_text_is_split_on_token_boundaries(self):
+        chunker = TokenChunker(max_tokens=50, overlap_tokens=0)
+        run_on = " ".join(f"cell{i} membrane protein" for i in range(200))
+
+        chunks = list(chunker.iter_chunks(run_on))
+
+        assert len(chunks) > 1
+        assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+
+    def test_streamed_pieces_match_whole_text(self):
+        chunker = TokenChunker(max_tokens=60, overlap_tokens=20)
+        text = document()
+        # Pieces split mid-line and mid-word, as page-by-page extraction does
+        pieces = [text[i:i + 37] for i in range(0, len(text), 37)]
+
+        assert list(chunker.iter_chunks(pieces)) == list(chunker.iter_chunks(text))
+
+    def test_short_fragments_are_dropped(self):
+        chunker = TokenChunker(max_tokens=60, min_chars=50)
+
+        assert list(chunker.iter_chunks("Too short.")) == []
+
+
+class TestBlocks:
+    def test_wrapped_lines_are_joined(self):
+        blocks = list(iter_blocks("The nucleus stores\ngenetic   material.\n\nIntroduction to Cells\nCells are small."))
+
+        assert blocks == [
+            ("The nucleus stores genetic material.", False),
+            ("Introduction to Cells", True),
+            ("Cells are small.", False),
+        ]
+
+    def test_heading_heuristics(self):
+        assert is_heading("# Photosynthesis")
+        assert is_heading("2.1 The Calvin Cycle")
+        assert is_heading("CELL STRUCTURE")
+        assert not is_heading("Cells are the basic unit of life.")
+        assert not is_heading("the lowercase start of a wrapped line")
@@ -0,0 +1,100 @@
+import numpy as np
+
+from app.schemas.lesson import Flashcard, Question
+from app.services.generation.dedupe import SemanticDeduplicator, near_duplicate_mask
+
+
+def unit(*values):
+    vector = np.array(values, dtype=float)
+    return vector / np.linalg.norm(vector)
+
+
+class StubEmbeddings:
+    """Looks texts up in a fixed table of unit vectors."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    def encode(self, texts, normalize=True):
+        self.calls.append(list(texts))
+        return np.array([self.vectors[text] for text in texts])
+
+
+def question(text):
+    return Question(
+        question_text=text,
+        question_type="short_answer",
+        difficulty="medium",
+        bloom_level="remember",
+        correct_answer="answer",
+        explanation="explanation",
+    )
+
+
+def flashcard(front):
+    return Flashcard(front=front, back="back")
+
+
+class TestNearDuplicateMask:
+    def test_later_duplicates_are_dropped(self):
+        embeddings = np.array([unit(1, 0, 0), unit(0, 1, 0), unit(1, 0.05, 0), unit(0, 0, 1)])
+
+        assert near_duplicate_mask(embeddings, 0.95).tolist() == [True, True, False, True]
+
+    def test_dropped_item_does_not_remove_others(self):
+        # b is close to a and to c, but a and c are far apart: only b goes
+        a, b, c = unit(1, 0), unit(1, 1), unit(0, 1)
+
+        assert near_duplicate_mask(np.array([a, b, c]), 0.7).tolist() == [True, False, True]
+
+    def test_threshold_is_exclusive(self):
+        embeddings = np.array([unit(1, 0), unit(1, 0)])
+
+        assert near_duplicate_mask(embeddings, 1.0).tolist() == [True, True]
+
+    def test_fewer_than_two_items(self):
+        assert near_duplicate_mask(np.zeros((0, 3)), 0.9).tolist() == []
+        assert near_duplicate_mask(np.array([unit(1, 0)]), 0.9).tolist() == [True]
+
+
+class TestSemanticDeduplicator:
+    def test_questions_and_flashcards_are_deduplicated_separately(self):
+        embeddings = StubEmbeddings({
+            "What is ATP?": unit(1, 0, 0),
+            "What does ATP stand for?": unit(1, 0.1, 0),
+            "Where does the Calvin cycle run?": unit(0, 1, 0),
+            # Same text as a question, but flashcards are only compared to flashcards
+            "ATP": unit(1, 0, 0),
+            "Adenosine triphosphate": unit(0, 0, 1),
+        })
+        deduplicator = SemanticDeduplicator(embedding_service=embeddings, threshold=0.9)
+
+        questions, flashcards, stats = deduplicator.dedupe(
+            [question("What is ATP?"), question("What does ATP stand for?"), question("Where does the Calvin cycle run?")],
+            [flashcard("ATP"), flashcard("Adenosine triphosphate")]
+        )
+
+        assert [q.question_text for q in questions] == ["What is ATP?", "Where does the Calvin cycle run?"]
+        assert [fc.front for fc in flashcards] == ["ATP", "Adenosine triphosphate"]
+        assert stats == {'questions_removed': 1, 'flashcards_removed': 0}
+        assert len(embeddings.calls) == 1
+
+    def test_earlier_items_win(self):
+        embeddings = StubEmbeddings({"kept": unit(1, 0), "candidate": unit(1, 0.01)})
+        deduplicator = SemanticDeduplicator(embedding_service=embeddings, threshold=0.9)
+
+        questions, _, stats = deduplicator.dedupe([question("kept"), question("candidate")], [])
+
+        assert [q.question_text for q in questions] == ["kept"]
+        assert stats['questions_removed'] == 1
+
+    def test_nothing_to_compare_skips_embedding(self):
+        embeddings = StubEmbeddings({})
+        deduplicator = SemanticDeduplicator(embedding_service=embeddings, threshold=0.9)
+
+        questions, flashcards, stats = deduplicator.dedupe([question("only")], [flashcard("one")])
+
+        assert len(questions) == 1 and len(flashcards) == 1
+        assert stats == {'questions_removed': 0, 'flashcards_removed': 0}
+        assert embeddings.calls == []
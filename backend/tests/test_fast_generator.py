@@ -0,0 +1,33 @@
+from app.schemas.lesson import GenerationMode, GenerationRequest, GenerationSource, QuestionType
+from app.services.generation.fast_generator import FastGenerator
+
+TEXT = " ".join([
+    "Mitochondria convert nutrients into chemical energy through cellular respiration.",
+    "Ribosomes translate messenger RNA into chains of amino acids.",
+    "The nucleus stores genetic material and controls gene expression.",
+    "Chloroplasts capture sunlight and produce glucose through photosynthesis.",
+    "Lysosomes digest worn out organelles using powerful enzymes.",
+])
+
+
+def make_request() -> GenerationRequest:
+    return GenerationRequest(source_type=GenerationSource.NOTES, content=TEXT, mode=GenerationMode.FAST)
+
+
+class TestFastGenerator:
+    def test_builds_cloze_items_from_key_terms(self):
+        generated = FastGenerator().generate_sync(TEXT, make_request())
+
+        assert generated['questions']
+        for question in generated['questions']:
+            assert question.question_type == QuestionType.FILL_BLANK
+            assert question.correct_answer.lower() in question.explanation.lower()
+            assert "_____" in question.question_text
+
+    def test_text_without_key_terms_gives_empty_result(self):
+        # Only stop words and non-Latin words: TF-IDF has no vocabulary
+        content = "This is what they would have been about. " * 3 + "細胞 は 生命 の 基本 単位 です 。"
+
+        generated = FastGenerator().generate_sync(content, make_request())
+
+        assert generated == {'questions': [], 'flashcards': [], 'study_notes': ""}
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.core.idempotency import IdempotencyStore, detach, request_fingerprint
+
+
+class Payload(BaseModel):
+    lesson_id: str
+    answer: str = "a"
+
+
+class CountingWork:
+    """Awaitable work that records how often it ran and can be held open."""
+
+    def __init__(self, result="lesson"):
+        self.result = result
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.result
+
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(ttl_seconds=60, max_entries=10)
+
+
+class TestIdempotencyStore:
+    async def test_without_key_always_runs(self, store):
+        work = CountingWork()
+
+        assert await store.run("generate", "user", None, "fp", work) == ("lesson", False)
+        assert await store.run("generate", "user", None, "fp", work) == ("lesson", False)
+        assert work.calls == 2
+
+    async def test_completed_request_is_replayed(self, store):
+        work = CountingWork()
+
+        assert await store.run("generate", "user", "key", "fp", work) == ("lesson", False)
+        assert await store.run("generate", "user", "key", "fp", work) == ("lesson", True)
+        assert work.calls == 1
+        assert store.stats()["replays"] == 1
+
+    async def test_retry_attaches_to_in_flight_work(self, store):
+        work = CountingWork()
+        work.release.clear()
+
+        first = asyncio.create_task(store.run("generate", "user", "key", "fp", work))
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(store.run("generate", "user", "key", "fp", work))
+        await asyncio.sleep(0)
+        work.release.set()
+
+        assert await first == ("lesson", False)
+        assert await retry == ("lesson", True)
+        assert work.calls == 1
+        assert store.stats()["attached"] == 1
+
+    async def test_work_survives_original_client_going_away(self, store):
+        work = CountingWork()
+        work.release.clear()
+
+        first = asyncio.create_task(store.run("generate", "user", "key", "fp", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(store.run("generate", "user", "key", "fp", work))
+        await asyncio.sleep(0)
+        work.release.set()
+
+        assert await retry == ("lesson", True)
+        assert work.calls == 1
+
+    async def test_reused_key_with_different_body_is_rejected(self, store):
+        await store.run("quiz_submit", "user", "key", request_fingerprint(Payload(lesson_id="1")), CountingWork())
+
+        with pytest.raises(HTTPException) as error:
+            await store.run("quiz_submit", "user", "key", request_fingerprint(Payload(lesson_id="2")), CountingWork())
+        assert error.value.status_code == 422
+
+    async def test_keys_are_scoped_per_user_and_endpoint(self, store):
+        work = CountingWork()
+
+        await store.run("generate", "alice", "key", "fp", work)
+        await store.run("generate", "bob", "key", "fp", work)
+        await store.run("quiz_submit", "alice", "key", "fp", work)
+
+        assert work.calls == 3
+
+    async def test_failures_are_not_stored(self, store):
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("provider down")
+            return "lesson"
+
+        with pytest.raises(RuntimeError):
+            await store.run("generate", "user", "key", "fp", flaky)
+        assert await store.run("generate", "user", "key", "fp", flaky) == ("lesson", False)
+
+    async def test_overlong_key_is_rejected(self, store):
+        with pytest.raises(HTTPException) as error:
+            await store.run("generate", "user", "k" * 256, "fp", CountingWork())
+        assert error.value.status_code == 400
+
+
+async def test_detached_side_effect_runs_to_completion():
+    done = asyncio.Event()
+
+    async def side_effect():
+        await asyncio.sleep(0)
+        done.set()
+
+    task = detach(side_effect())
+    await asyncio.wait_for(done.wait(), timeout=1)
+    await task
+    assert task.done()
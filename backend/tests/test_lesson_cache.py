@@ -0,0 +1,110 @@
+import pytest
+
+from app.repositories import lesson_cache as lesson_cache_module
+from app.repositories.lesson_cache import LessonCache
+
+
+def make_lesson(lesson_id: str = "lesson-1", user_id: str = "user") -> dict:
+    return {
+        'id': lesson_id,
+        'user_id': user_id,
+        'title': "Cell Biology",
+        'questions': [
+            {'id': "q1", 'correct_answer': "Mitochondria", 'explanation': "They make ATP.", 'options': ["Mitochondria", "Nucleus"]},
+        ],
+        'flashcards': [{'front': "ATP", 'back': "Energy currency"}],
+    }
+
+
+@pytest.fixture
+def cache():
+    return LessonCache(max_bytes=1024 * 1024, ttl_seconds=60)
+
+
+class TestLessonCache:
+    def test_returned_lessons_are_independent_of_the_cache(self, cache):
+        lesson = make_lesson()
+        cache.set_lesson(lesson)
+        lesson['questions'].clear()
+
+        first = cache.get_lesson("lesson-1", "user")
+        first['questions'][0]['options'].append("Ribosome")
+        first['flashcards'].clear()
+
+        second = cache.get_lesson("lesson-1", "user")
+        assert second['questions'][0]['options'] == ["Mitochondria", "Nucleus"]
+        assert second['flashcards'] == [{'front': "ATP", 'back': "Energy currency"}]
+
+    def test_returned_answer_keys_are_independent_of_the_cache(self, cache):
+        cache.set_answer_key("lesson-1", "user", {'q1': {'correct_answer': "A", 'explanation': None}})
+
+        cache.get_answer_key("lesson-1", "user")['q1']['correct_answer'] = "B"
+
+        assert cache.get_answer_key("lesson-1", "user")['q1']['correct_answer'] == "A"
+
+    def test_other_users_miss(self, cache):
+        cache.set_lesson(make_lesson())
+        cache.set_answer_key("lesson-1", "user", {})
+
+        assert cache.get_lesson("lesson-1", "someone-else") is None
+        assert cache.get_answer_key("lesson-1", "someone-else") is None
+
+    def test_answer_key_is_derived_from_a_cached_lesson(self, cache):
+        cache.set_lesson(make_lesson())
+
+        assert cache.get_answer_key("lesson-1", "user") == {
+            'q1': {'correct_answer': "Mitochondria", 'explanation': "They make ATP."}
+        }
+
+    def test_fill_started_before_invalidation_is_dropped(self, cache):
+        epoch = cache.epoch
+        cache.invalidate("lesson-1")
+
+        cache.set_lesson(make_lesson(), epoch)
+        cache.set_answer_key("lesson-1", "user", {}, epoch)
+
+        assert cache.get_lesson("lesson-1", "user") is None
+        assert cache.stats()['answer_keys']['entries'] == 0
+
+    def test_fill_started_after_invalidation_is_stored(self, cache):
+        cache.invalidate("lesson-1")
+        epoch = cache.epoch
+
+        cache.set_lesson(make_lesson(), epoch)
+
+        assert cache.get_lesson("lesson-1", "user") is not None
+
+    def test_invalidating_one_lesson_keeps_fills_of_others(self, cache):
+        epoch = cache.epoch
+        cache.invalidate("lesson-2")
+
+        cache.set_lesson(make_lesson("lesson-1"), epoch)
+        cache.set_answer_key("lesson-1", "user", {}, epoch)
+
+        assert cache.get_lesson("lesson-1", "user") is not None
+        assert cache.get_answer_key("lesson-1", "user") == {}
+
+    def test_clear_drops_every_in_flight_fill(self, cache):
+        epoch = cache.epoch
+        cache.set_lesson(make_lesson("lesson-2"))
+
+        cache.clear()
+        cache.set_lesson(make_lesson("lesson-1"), epoch)
+
+        assert cache.get_lesson("lesson-1", "user") is None
+        assert cache.get_lesson("lesson-2", "user") is None
+
+    def test_forgotten_invalidations_stay_conservative(self, cache, monkeypatch):
+        monkeypatch.setattr(lesson_cache_module, "MAX_TRACKED_INVALIDATIONS", 2)
+        epoch = cache.epoch
+
+        for lesson_id in ("lesson-1", "lesson-2", "lesson-3"):
+            cache.invalidate(lesson_id)
+        # lesson-1 is no longer tracked, so fills from before its
+        # invalidation are dropped for it and anything else
+        cache.set_lesson(make_lesson("lesson-1"), epoch)
+        cache.set_lesson(make_lesson("lesson-4"), epoch)
+
+        assert cache.stats()['tracked_invalidations'] == 2
+        assert cache.get_lesson("lesson-1", "user") is None
+        assert cache.get_lesson("lesson-4", "user") is None
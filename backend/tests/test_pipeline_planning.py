@@ -0,0 +1,104 @@
+import pytest
+
+from app.services.generation.pipeline import GenerationPipeline, allocate
+from app.services.llm.llm_service import LLMService
+from app.services.llm.provider_pool import ProviderPool, ProviderSlot
+
+
+class StubAnalyzer:
+    """Returns preset chunks for each source's content."""
+
+    def __init__(self, chunks_by_content):
+        self.chunks_by_content = chunks_by_content
+
+    async def chunk_content(self, content):
+        return self.chunks_by_content[content]
+
+
+def make_pipeline(chunks_by_content):
+    service = LLMService(provider="openrouter", model_name="test/model", api_key="test-key")
+    return GenerationPipeline(
+        content_analyzer=StubAnalyzer(chunks_by_content),
+        pool=ProviderPool([ProviderSlot(service, 1)]),
+        deduplicator=object()
+    )
+
+
+class TestAllocate:
+    def test_shares_are_proportional_and_sum_to_total(self):
+        assert allocate(10, [1, 2, 7]) == [1, 2, 7]
+        assert sum(allocate(7, [3, 5, 11, 2])) == 7
+
+    def test_largest_remainder_gets_the_extra_item(self):
+        assert allocate(3, [10, 20, 70]) == [0, 1, 2]
+        # Ties go to the earlier weight
+        assert allocate(10, [1, 1, 2]) == [3, 2, 5]
+
+    def test_more_weights_than_items(self):
+        shares = allocate(2, [5, 5, 5, 5])
+
+        assert sum(shares) == 2
+        assert all(share in (0, 1) for share in shares)
+
+    def test_no_weight(self):
+        assert allocate(5, []) == []
+        assert allocate(5, [0, 0]) == [0, 0]
+
+
+class TestPlan:
+    def test_per_chunk_counts(self):
+        assert GenerationPipeline.plan(4, 10, 10) == {
+            'num_chunks': 4, 'questions_per_chunk': 2, 'flashcards_per_chunk': 2
+        }
+
+    def test_every_chunk_gets_at_least_one(self):
+        plan = GenerationPipeline.plan(20, 5, 10)
+
+        assert plan['questions_per_chunk'] == 1
+        assert plan['flashcards_per_chunk'] == 1
+
+
+class TestPlanSources:
+    @pytest.fixture
+    def sources(self):
+        return [("Chapter 1", "doc-one"), ("Chapter 2", "doc-two")]
+
+    async def test_budget_is_split_by_chunk_size(self, sources):
+        pipeline = make_pipeline({
+            "doc-one": ["a" * 300, "b" * 100],
+            "doc-two": ["c" * 600],
+        })
+
+        assignments = await pipeline.plan_sources(sources, max_questions=10, num_flashcards=5)
+
+        assert [(chunk[0], nq, nf, document) for chunk, nq, nf, document in assignments] == [
+            ("a", 3, 2, "doc-one"),
+            ("b", 1, 0, "doc-one"),
+            ("c", 6, 3, "doc-two"),
+        ]
+        assert sum(nq for _, nq, _, _ in assignments) == 10
+        assert sum(nf for _, _, nf, _ in assignments) == 5
+
+    async def test_chunks_repeated_across_sources_are_planned_once(self, sources):
+        cover = "Course Syllabus   Introduction to Biology"
+        pipeline = make_pipeline({
+            "doc-one": [cover, "x" * 200],
+            "doc-two": ["course syllabus introduction to biology", "y" * 200],
+        })
+
+        assignments = await pipeline.plan_sources(sources, max_questions=20, num_flashcards=20)
+
+        chunks = [chunk for chunk, _, _, _ in assignments]
+        assert chunks.count(cover) == 1
+        assert "course syllabus introduction to biology" not in chunks
+        assert len(chunks) == 3
+
+    async def test_chunks_without_work_are_left_out(self, sources):
+        pipeline = make_pipeline({
+            "doc-one": ["a" * 1000, "b" * 10],
+            "doc-two": [],
+        })
+
+        assignments = await pipeline.plan_sources(sources, max_questions=1, num_flashcards=1)
+
+        assert [(chunk[0], nq, nf) for chunk, nq, nf, _ in assignments] == [("a", 1, 1)]
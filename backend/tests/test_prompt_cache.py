@@ -0,0 +1,266 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.lesson import DifficultyLevel, QuestionType
+from app.services.llm import llm_service as llm_module
+from app.services.llm.llm_service import LLMService
+from app.services.llm.prompt_cache import PromptCacheRegistry
+from app.services.llm.question_generator import QuestionGeneratorService
+from app.services.llm.token_budget import UsageTracker, count_tokens
+
+MODEL = "test/model"
+
+PARAGRAPH = (
+    "Photosynthesis converts light energy into chemical energy. In the light-dependent "
+    "reactions, chlorophyll absorbs photons and splits water, releasing oxygen and "
+    "producing ATP and NADPH. The Calvin cycle then fixes carbon dioxide into sugars. "
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubCompletions:
+    """
+    OpenAI-compatible chat endpoint that caches like OpenRouter: a content
+    part marked with cache_control is written on first use and reported as
+    prompt_tokens_details.cached_tokens on later requests.
+    """
+
+    def __init__(self):
+        self.cached_prefixes = set()
+        self.requests = []
+
+    async def create(self, messages, model, **kwargs):
+        self.requests.append(messages)
+        content = messages[-1]["content"]
+        cached_tokens = 0
+        if isinstance(content, list):
+            prefix = next((part["text"] for part in content if "cache_control" in part), None)
+            text = "".join(part["text"] for part in content)
+            if prefix in self.cached_prefixes:
+                cached_tokens = count_tokens(prefix, model)
+            elif prefix is not None:
+                self.cached_prefixes.add(prefix)
+        else:
+            text = content
+
+        body = {"questions": [], "flashcards": []}
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(body)))],
+            usage=SimpleNamespace(
+                prompt_tokens=count_tokens(text, model),
+                completion_tokens=5,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+            ),
+        )
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = UsageTracker()
+    monkeypatch.setattr(llm_module, "usage_tracker", tracker)
+    return tracker
+
+
+@pytest.fixture
+def cache_settings(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "PROMPT_CACHE_MIN_TOKENS", 1024)
+    monkeypatch.setattr(settings, "PROMPT_CACHE_MIN_TOKENS_BY_MODEL", {})
+    monkeypatch.setattr(settings, "PROMPT_CACHE_SHARED_PREFIX_MAX_TOKENS", 8000)
+    monkeypatch.setattr(settings, "LLM_INPUT_TOKEN_BUDGET", 12000)
+    monkeypatch.setattr(settings, "QUESTION_REPAIR_ENABLED", False)
+
+
+@pytest.fixture
+def openrouter(cache_settings):
+    service = LLMService(provider="openrouter", model_name=MODEL, api_key="test-key")
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=StubCompletions()))
+    return service
+
+
+def make_document(min_tokens: int) -> str:
+    document = PARAGRAPH
+    while count_tokens(document, MODEL) < min_tokens:
+        document += PARAGRAPH
+    return document
+
+
+class TestPromptCacheRegistry:
+    async def test_reuses_handle_until_ttl(self):
+        clock = FakeClock()
+        registry = PromptCacheRegistry(ttl_seconds=600, refresh_margin_seconds=0, clock=clock)
+        created = []
+
+        async def create(ttl_seconds):
+            created.append(ttl_seconds)
+            return f"handle-{len(created)}"
+
+        handles = [await registry.get_or_create("prefix", create) for _ in range(4)]
+
+        assert handles == ["handle-1"] * 4
+        assert registry.stats()["hits"] == 3
+        assert registry.stats()["misses"] == 1
+        assert registry.stats()["handle_hit_ratio"] == 0.75
+
+        clock.now += 601
+        assert await registry.get_or_create("prefix", create) == "handle-2"
+        assert registry.stats()["misses"] == 2
+
+    async def test_refreshes_handle_near_expiry(self):
+        clock = FakeClock()
+        registry = PromptCacheRegistry(ttl_seconds=600, refresh_margin_seconds=60, clock=clock)
+        refreshed = []
+
+        async def create(ttl_seconds):
+            return "handle"
+
+        async def refresh(handle, ttl_seconds):
+            refreshed.append(handle)
+
+        await registry.get_or_create("prefix", create, refresh)
+        clock.now += 100
+        assert await registry.get_or_create("prefix", create, refresh) == "handle"
+        assert refreshed == []
+
+        clock.now += 490
+        assert await registry.get_or_create("prefix", create, refresh) == "handle"
+        assert refreshed == ["handle"]
+
+        # The refresh extended the TTL from the time it ran
+        clock.now += 590
+        assert await registry.get_or_create("prefix", create, refresh) == "handle"
+        assert registry.stats()["misses"] == 1
+        assert registry.stats()["hits"] == 3
+
+    async def test_failed_create_is_not_retried_until_ttl(self):
+        clock = FakeClock()
+        registry = PromptCacheRegistry(ttl_seconds=600, clock=clock)
+        attempts = []
+
+        async def create(ttl_seconds):
+            attempts.append(ttl_seconds)
+            raise RuntimeError("content too small to cache")
+
+        assert await registry.get_or_create("prefix", create) is None
+        assert await registry.get_or_create("prefix", create) is None
+        assert len(attempts) == 1
+        assert registry.stats()["failures"] == 1
+
+
+class TestLLMServicePrefixCaching:
+    async def test_repeated_prefix_is_served_from_cache(self, openrouter, tracker):
+        prefix = make_document(1500)
+
+        for task in ("first task", "second task", "third task"):
+            await openrouter.generate_json(prompt=task, cache_prefix=prefix)
+
+        summary = tracker.summary()[f"openrouter:{MODEL}"]
+        assert summary["calls"] == 3
+        prefix_tokens = count_tokens(prefix, MODEL)
+        assert summary["cached_tokens"] == 2 * prefix_tokens
+        assert summary["cache_hit_ratio"] > 0.6
+
+    async def test_prefix_below_minimum_is_sent_uncached(self, openrouter, tracker):
+        prefix = make_document(200)
+
+        for task in ("first task", "second task"):
+            await openrouter.generate_json(prompt=task, cache_prefix=prefix)
+
+        assert tracker.summary()[f"openrouter:{MODEL}"]["cache_hit_ratio"] == 0.0
+        assert all(isinstance(messages[-1]["content"], str) for messages in openrouter.client.chat.completions.requests)
+
+    async def test_per_model_minimum_overrides_default(self, openrouter, tracker, monkeypatch):
+        monkeypatch.setattr(settings, "PROMPT_CACHE_MIN_TOKENS_BY_MODEL", {f"openrouter:{MODEL}": 128})
+        prefix = make_document(200)
+
+        for task in ("first task", "second task"):
+            await openrouter.generate_json(prompt=task, cache_prefix=prefix)
+
+        assert openrouter.cache_min_tokens(MODEL) == 128
+        assert tracker.summary()[f"openrouter:{MODEL}"]["cached_tokens"] == count_tokens(prefix, MODEL)
+
+    async def test_gemini_cached_content_handles_are_reused(self, cache_settings, tracker, monkeypatch):
+        created = []
+
+        class StubCachedContent:
+            @staticmethod
+            def create(model, system_instruction, contents, ttl):
+                created.append(contents[0])
+                return SimpleNamespace(update=lambda ttl: None, delete=lambda: None)
+
+        class StubModel:
+            async def generate_content_async(self, prompt, generation_config):
+                return SimpleNamespace(
+                    text="notes",
+                    usage_metadata=SimpleNamespace(
+                        prompt_token_count=count_tokens(prefix + prompt, MODEL),
+                        candidates_token_count=1,
+                        cached_content_token_count=count_tokens(prefix, MODEL),
+                    ),
+                )
+
+        monkeypatch.setattr(llm_module.genai_caching, "CachedContent", StubCachedContent)
+        monkeypatch.setattr(llm_module.genai.GenerativeModel, "from_cached_content", lambda cached_content: StubModel())
+        service = LLMService(provider="google", model_name=MODEL, api_key="test-key")
+        prefix = make_document(1500)
+
+        for task in ("first task", "second task", "third task"):
+            await service.generate_text(prompt=task, cache_prefix=prefix)
+
+        assert created == [prefix]
+        assert service.prompt_cache.stats()["handle_hit_ratio"] == round(2 / 3, 4)
+        assert tracker.summary()[f"google:{MODEL}"]["cache_hit_ratio"] > 0.6
+
+
+class TestChunkTasksShareDocumentPrefix:
+    async def test_chunks_share_one_cached_prefix(self, openrouter, tracker):
+        generator = QuestionGeneratorService(openrouter)
+        document = make_document(2000)
+        chunks = [document[i:i + 1200] for i in range(0, 3600, 1200)]
+
+        for chunk in chunks:
+            await generator.generate_questions(
+                content=chunk,
+                num_questions=3,
+                difficulty=DifficultyLevel.MEDIUM,
+                question_type=QuestionType.MULTIPLE_CHOICE,
+                document=document
+            )
+            await generator.generate_flashcards(content=chunk, num_flashcards=3, document=document)
+
+        stub = openrouter.client.chat.completions
+        assert len(stub.cached_prefixes) == 1
+        summary = tracker.summary()[f"openrouter:{MODEL}"]
+        assert summary["calls"] == 6
+        assert summary["cached_tokens"] == 5 * count_tokens(generator.prompts.content_prefix(document), MODEL)
+        assert summary["cache_hit_ratio"] > 0.7
+
+    async def test_each_task_names_its_chunk(self, openrouter):
+        generator = QuestionGeneratorService(openrouter)
+        document = make_document(2000)
+        chunk = document[:1200]
+
+        prefix, focus = generator.task_prefix(chunk, document)
+
+        assert prefix == generator.prompts.content_prefix(document)
+        assert chunk in focus
+
+    async def test_small_document_falls_back_to_chunk_prefix(self, openrouter):
+        generator = QuestionGeneratorService(openrouter)
+        document = make_document(300)
+        chunk = document[:400]
+
+        prefix, focus = generator.task_prefix(chunk, document)
+
+        assert prefix == generator.prompts.content_prefix(chunk)
+        assert focus == ""
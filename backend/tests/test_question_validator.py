@@ -0,0 +1,134 @@
+from app.schemas.lesson import DifficultyLevel, QuestionType
+from app.services.llm.question_validator import check_question, normalize_question_data, validate_question_data
+
+
+def raw_question(**overrides):
+    data = {
+        "question_text": "Which gas do plants release during photosynthesis?",
+        "question_type": "multiple_choice",
+        "difficulty": "medium",
+        "bloom_level": "remember",
+        "options": [
+            {"option_text": "Oxygen", "is_correct": True},
+            {"option_text": "Nitrogen", "is_correct": False},
+            {"option_text": "Carbon dioxide", "is_correct": False},
+        ],
+        "correct_answer": "Oxygen",
+        "explanation": "Splitting water in the light reactions releases oxygen.",
+    }
+    data.update(overrides)
+    return data
+
+
+def check(data, question_type=QuestionType.MULTIPLE_CHOICE, difficulty=DifficultyLevel.MEDIUM):
+    return check_question(data, question_type, difficulty)
+
+
+class TestNormalization:
+    def test_renames_keys_and_enum_aliases(self):
+        data = raw_question(question_type="MCQ", difficulty="Hard", bloom_level="Apply")
+        data["question"] = data.pop("question_text")
+        data["answer"] = data.pop("correct_answer")
+
+        normalized = normalize_question_data(data, QuestionType.MIXED, DifficultyLevel.MIXED)
+
+        assert normalized["question_text"].startswith("Which gas")
+        assert normalized["correct_answer"] == "Oxygen"
+        assert normalized["question_type"] == "multiple_choice"
+        assert normalized["difficulty"] == "hard"
+        assert normalized["bloom_level"] == "apply"
+
+    def test_unknown_enums_fall_back_to_request(self):
+        normalized = normalize_question_data(
+            raw_question(question_type="essay", difficulty="extreme", bloom_level="dream"),
+            QuestionType.MULTIPLE_CHOICE,
+            DifficultyLevel.EASY
+        )
+
+        assert normalized["question_type"] == "multiple_choice"
+        assert normalized["difficulty"] == "easy"
+        assert normalized["bloom_level"] == "understand"
+
+    def test_letter_answer_is_resolved_to_option(self):
+        question, errors = check(raw_question(correct_answer="b)"))
+
+        assert errors == []
+        assert question.correct_answer == "Nitrogen"
+        assert [option.is_correct for option in question.options] == [False, True, False]
+
+    def test_duplicate_options_are_merged(self):
+        options = raw_question()["options"] + [{"option_text": " oxygen ", "is_correct": False}]
+
+        question, errors = check(raw_question(options=options))
+
+        assert errors == []
+        assert len(question.options) == 3
+
+    def test_true_false_without_options_gets_canonical_pair(self):
+        question, errors = check(
+            raw_question(question_type="true_false", options=None, correct_answer="true"),
+            QuestionType.TRUE_FALSE
+        )
+
+        assert errors == []
+        assert [option.option_text for option in question.options] == ["True", "False"]
+        assert question.options[0].is_correct
+
+    def test_short_answer_drops_options(self):
+        question, errors = check(
+            raw_question(question_type="short_answer", correct_answer="Oxygen gas"),
+            QuestionType.SHORT_ANSWER
+        )
+
+        assert errors == []
+        assert question.options == []
+
+
+class TestValidation:
+    def test_answer_outside_options_is_rejected(self):
+        options = [{"option_text": text, "is_correct": False} for text in ("Oxygen", "Nitrogen")]
+
+        question, errors = check(raw_question(options=options, correct_answer="Helium"))
+
+        assert question is None
+        assert "correct_answer is not one of the options" in errors
+        assert "exactly one option must be marked correct" in errors
+
+    def test_missing_explanation_is_an_error(self):
+        data = raw_question()
+        del data["explanation"]
+
+        question, errors = check(data)
+
+        assert question is None
+        assert errors == ["explanation is empty"]
+
+    def test_matching_options_are_not_choices(self):
+        data = raw_question(
+            question_type="matching",
+            question_text="Match each stage to its product.",
+            options=[
+                {"option_text": "Light reactions - ATP", "is_correct": False},
+                {"option_text": "Calvin cycle - glucose", "is_correct": False},
+            ],
+            correct_answer="Light reactions - ATP; Calvin cycle - glucose",
+        )
+
+        question, errors = check(data, QuestionType.MATCHING)
+
+        assert errors == []
+        assert question.question_type == QuestionType.MATCHING
+        assert len(question.options) == 2
+
+    def test_true_false_needs_two_options(self):
+        normalized = normalize_question_data(
+            raw_question(question_type="true_false"), QuestionType.TRUE_FALSE, DifficultyLevel.MEDIUM
+        )
+
+        assert "true_false must have exactly 2 options, got 3" in validate_question_data(normalized)
+
+    def test_non_object_item_is_rejected(self):
+        question, errors = check("just a string")
+
+        assert question is None
+        assert errors == ["item is a str, not an object"]
@@ -0,0 +1,167 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.content import text_store as text_store_module
+from app.services.content.text_store import TextStore, decode_block, encode_blocks, page_range
+
+TEXT = "".join(f"Sentence {i} about cell biology. " for i in range(200))
+
+
+class FakeBlocksQuery:
+    """Just enough of a supabase-py query builder over an in-memory file_text_blocks table."""
+
+    def __init__(self, table, action, rows=None):
+        self.table = table
+        self.action = action
+        self.rows = rows
+        self.filters = []
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row[column] <= value)
+        return self
+
+    def order(self, column):
+        self.order_by = column
+        return self
+
+    def execute(self):
+        if self.action == 'upsert':
+            for row in self.rows:
+                self.table.rows[(row['sha256'], row['block_index'])] = dict(row)
+            return SimpleNamespace(data=self.rows)
+        matching = [row for row in self.table.rows.values() if all(check(row) for check in self.filters)]
+        if self.action == 'delete':
+            for row in matching:
+                del self.table.rows[(row['sha256'], row['block_index'])]
+            return SimpleNamespace(data=matching)
+        self.table.reads.append(sorted(row['block_index'] for row in matching))
+        return SimpleNamespace(data=sorted(matching, key=lambda row: row['block_index']))
+
+
+class FakeBlocksTable:
+    def __init__(self):
+        self.rows = {}
+        self.reads = []
+
+    def upsert(self, rows, on_conflict=None):
+        return FakeBlocksQuery(self, 'upsert', rows)
+
+    def select(self, columns):
+        return FakeBlocksQuery(self, 'select')
+
+    def delete(self):
+        return FakeBlocksQuery(self, 'delete')
+
+
+@pytest.fixture
+def blocks(monkeypatch):
+    table = FakeBlocksTable()
+    monkeypatch.setattr(
+        text_store_module, "supabase_admin", SimpleNamespace(table=lambda name: table)
+    )
+    return table
+
+
+@pytest.fixture
+def store(blocks):
+    return TextStore(block_chars=1000, cache_max_bytes=1024 * 1024, cache_ttl_seconds=60)
+
+
+class TestBlockEncoding:
+    def test_round_trip(self):
+        encoded = encode_blocks(TEXT, 1000, 6)
+
+        assert len(encoded) == -(-len(TEXT) // 1000)
+        assert "".join(decode_block(block) for block in encoded) == TEXT
+
+    def test_multibyte_text_splits_on_characters(self):
+        text = "é日本" * 500
+
+        encoded = encode_blocks(text, 7, 6)
+
+        assert all(len(decode_block(block)) <= 7 for block in encoded)
+        assert "".join(decode_block(block) for block in encoded) == text
+
+    def test_empty_text_has_one_block(self):
+        encoded = encode_blocks("", 1000, 6)
+
+        assert len(encoded) == 1
+        assert decode_block(encoded[0]) == ""
+
+
+class TestPageRange:
+    def test_page_span(self):
+        offsets = [[0, 100], [100, 250], [250, 400]]
+
+        assert page_range(offsets, 2, 3) == (100, 400)
+        assert page_range(offsets, 0, 99) == (0, 400)
+        assert page_range(offsets, 3, 1) == (250, 400)
+
+    def test_no_page_index(self):
+        with pytest.raises(ValueError):
+            page_range([], 1, 1)
+
+
+class TestTextStore:
+    async def test_save_then_read_whole_text(self, store, blocks):
+        layout = await store.save("blob", TEXT)
+        store.evict("blob")
+
+        assert layout == {'text_length': len(TEXT), 'block_chars': 1000}
+        assert len(blocks.rows) == len(encode_blocks(TEXT, 1000, 6))
+        assert await store.get_text("blob") == TEXT
+
+    async def test_range_reads_only_overlapping_blocks(self, store, blocks):
+        await store.save("blob", TEXT)
+        store.evict("blob")
+
+        assert await store.get_range("blob", 1500, 3200, len(TEXT)) == TEXT[1500:3200]
+        assert blocks.reads == [[1, 2, 3]]
+        assert store.stats()["blocks_read"] == 3
+
+    async def test_range_on_block_boundaries(self, store, blocks):
+        await store.save("blob", TEXT)
+        store.evict("blob")
+
+        assert await store.get_range("blob", 1000, 2000, len(TEXT)) == TEXT[1000:2000]
+        assert blocks.reads == [[1]]
+
+    async def test_range_is_clamped_to_text(self, store, blocks):
+        await store.save("blob", TEXT)
+        store.evict("blob")
+
+        assert await store.get_range("blob", -5, 10, len(TEXT)) == TEXT[:10]
+        assert await store.get_range("blob", len(TEXT) - 3, len(TEXT) + 50, len(TEXT)) == TEXT[-3:]
+        assert await store.get_range("blob", 50, 50, len(TEXT)) == ""
+
+    async def test_range_uses_the_blob_block_size(self, store, blocks):
+        # Written with an older, smaller block size
+        await TextStore(block_chars=400).save("blob", TEXT)
+        store.evict("blob")
+
+        assert await store.get_range("blob", 850, 1250, len(TEXT), block_chars=400) == TEXT[850:1250]
+        assert blocks.reads == [[2, 3]]
+
+    async def test_cached_text_serves_ranges_without_reads(self, store, blocks):
+        await store.save("blob", TEXT)
+
+        assert await store.get_range("blob", 10, 20, len(TEXT)) == TEXT[10:20]
+        assert await store.get_text("blob") == TEXT
+        assert blocks.reads == []
+
+    async def test_delete_removes_blocks(self, store, blocks):
+        await store.save("blob", TEXT)
+
+        await store.delete("blob")
+
+        assert blocks.rows == {}
+        assert await store.get_text("blob") == ""
@@ -0,0 +1,83 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.core.upload_limit import UploadSizeLimitMiddleware
+
+LIMIT = 1024
+OVERHEAD = 256
+BOUNDARY = "boundary"
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, limits={"/upload": LIMIT}, overhead=OVERHEAD)
+    parsed = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        parsed.append(file.size)
+        return {"size": file.size}
+
+    @app.post("/other")
+    async def other(file: UploadFile = File(...)):
+        return {"size": file.size}
+
+    return TestClient(app), parsed
+
+
+def multipart(size: int) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="notes.txt"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode() + b"x" * size + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def chunked(body: bytes, piece: int = 100):
+    for start in range(0, len(body), piece):
+        yield body[start:start + piece]
+
+
+HEADERS = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+class TestUploadSizeLimit:
+    def test_upload_within_limit_is_accepted(self):
+        client, parsed = make_client()
+
+        response = client.post("/upload", content=multipart(LIMIT), headers=HEADERS)
+
+        assert response.status_code == 200
+        assert parsed == [LIMIT]
+
+    def test_oversize_content_length_is_rejected(self):
+        client, parsed = make_client()
+
+        response = client.post("/upload", content=multipart(LIMIT + OVERHEAD + 1), headers=HEADERS)
+
+        assert response.status_code == 413
+        assert parsed == []
+
+    def test_oversize_chunked_upload_is_rejected_while_streaming(self):
+        client, parsed = make_client()
+
+        response = client.post("/upload", content=chunked(multipart(LIMIT * 10)), headers=HEADERS)
+
+        assert response.status_code == 413
+        assert "maximum size" in response.json()["detail"]
+        assert parsed == []
+
+    def test_chunked_upload_within_limit_is_accepted(self):
+        client, parsed = make_client()
+
+        response = client.post("/upload", content=chunked(multipart(LIMIT)), headers=HEADERS)
+
+        assert response.status_code == 200
+        assert parsed == [LIMIT]
+
+    def test_other_paths_are_not_limited(self):
+        client, _ = make_client()
+
+        response = client.post("/other", content=chunked(multipart(LIMIT * 10)), headers=HEADERS)
+
+        assert response.status_code == 200
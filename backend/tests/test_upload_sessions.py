@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.content import upload_sessions as upload_sessions_module
+from app.services.content.upload_sessions import ASSEMBLED, MANIFEST, UploadSessionStore
+
+PART_SIZE = 16
+DATA = bytes(range(256)) * 2 + b"tail"  # 33 parts, the last one short
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MIN_PART_SIZE", 1)
+    monkeypatch.setattr(settings, "UPLOAD_MAX_PART_SIZE", 1024)
+    monkeypatch.setattr(settings, "UPLOAD_SESSION_TTL_SECONDS", 3600)
+    return UploadSessionStore(root=str(tmp_path))
+
+
+def part_bytes(number: int) -> bytes:
+    return DATA[(number - 1) * PART_SIZE:number * PART_SIZE]
+
+
+async def stream(data: bytes, piece: int = 5):
+    for start in range(0, len(data), piece):
+        yield data[start:start + piece]
+
+
+async def start(store: UploadSessionStore) -> str:
+    session = await store.init("user", "notes.pdf", len(DATA), part_size=PART_SIZE)
+    return session['upload_id']
+
+
+async def send(store: UploadSessionStore, upload_id: str, number: int, data: bytes = None):
+    return await store.write_part(upload_id, "user", number, stream(part_bytes(number) if data is None else data))
+
+
+class Recorder:
+    """process() callback that records what it was given."""
+
+    def __init__(self):
+        self.uploads = []
+
+    async def __call__(self, upload):
+        with open(upload.path, 'rb') as f:
+            self.uploads.append((f.read(), upload.sha256, upload.size))
+        return {'id': f"file-{len(self.uploads)}"}
+
+
+class TestUploadSessions:
+    async def test_out_of_order_parts_assemble_in_order(self, store):
+        upload_id = await start(store)
+        num_parts = -(-len(DATA) // PART_SIZE)
+        order = list(range(num_parts, 0, -2)) + list(range(num_parts - 1, 0, -2))
+
+        for number in order[:-1]:
+            await send(store, upload_id, number)
+        assert (await store.status(upload_id, "user"))['missing_parts'] == [order[-1]]
+
+        await send(store, upload_id, order[-1])
+        recorder = Recorder()
+        result = await store.complete(upload_id, "user", recorder)
+
+        assert result == {'id': 'file-1'}
+        assert recorder.uploads == [(DATA, hashlib.sha256(DATA).hexdigest(), len(DATA))]
+
+    async def test_leading_parts_are_assembled_as_they_arrive(self, store):
+        upload_id = await start(store)
+
+        await send(store, upload_id, 2)
+        assert (await store.status(upload_id, "user"))['assembled_parts'] == 0
+        summary = await send(store, upload_id, 1)
+
+        assert summary['assembled_parts'] == 2
+        assert not os.path.exists(store._part_path(upload_id, 1))
+
+    async def test_resent_part_overwrites_until_assembled(self, store):
+        upload_id = await start(store)
+
+        await send(store, upload_id, 3, b"x" * PART_SIZE)
+        summary = await send(store, upload_id, 3)
+        assert summary['sha256'] == hashlib.sha256(part_bytes(3)).hexdigest()
+
+        await send(store, upload_id, 1)
+        await send(store, upload_id, 2)
+        # Already assembled: a resend is a no-op
+        summary = await send(store, upload_id, 1, b"y" * PART_SIZE)
+        assert summary['sha256'] == hashlib.sha256(part_bytes(1)).hexdigest()
+
+    async def test_wrong_part_size_is_rejected(self, store):
+        upload_id = await start(store)
+
+        with pytest.raises(HTTPException) as too_big:
+            await send(store, upload_id, 1, b"z" * (PART_SIZE + 1))
+        with pytest.raises(HTTPException) as too_small:
+            await send(store, upload_id, 1, b"z" * (PART_SIZE - 1))
+
+        assert too_big.value.status_code == 413
+        assert too_small.value.status_code == 400
+        assert (await store.status(upload_id, "user"))['received_parts'] == []
+
+    async def test_complete_with_missing_parts_is_rejected(self, store):
+        upload_id = await start(store)
+        await send(store, upload_id, 1)
+
+        with pytest.raises(HTTPException) as error:
+            await store.complete(upload_id, "user", Recorder())
+        assert error.value.status_code == 409
+
+    async def test_repeated_complete_returns_the_stored_result(self, store):
+        upload_id = await start(store)
+        for number in range(1, -(-len(DATA) // PART_SIZE) + 1):
+            await send(store, upload_id, number)
+        recorder = Recorder()
+
+        first = await store.complete(upload_id, "user", recorder)
+        second = await store.complete(upload_id, "user", recorder)
+
+        assert first == second == {'id': 'file-1'}
+        assert len(recorder.uploads) == 1
+        assert (await store.status(upload_id, "user"))['status'] == 'completed'
+        with pytest.raises(HTTPException) as error:
+            await send(store, upload_id, 1)
+        assert error.value.status_code == 409
+
+    async def test_failed_processing_leaves_session_open(self, store):
+        upload_id = await start(store)
+        for number in range(1, -(-len(DATA) // PART_SIZE) + 1):
+            await send(store, upload_id, number)
+
+        async def failing(upload):
+            raise RuntimeError("extraction failed")
+
+        with pytest.raises(RuntimeError):
+            await store.complete(upload_id, "user", failing)
+        assert (await store.status(upload_id, "user"))['status'] == 'open'
+
+        recorder = Recorder()
+        await store.complete(upload_id, "user", recorder)
+        assert recorder.uploads[0][1] == hashlib.sha256(DATA).hexdigest()
+
+    async def test_partial_append_from_a_crash_is_truncated(self, store):
+        upload_id = await start(store)
+        await send(store, upload_id, 1)
+        # A crash mid-append left bytes past the recorded prefix, and a
+        # restarted process has no running digest
+        with open(os.path.join(store._dir(upload_id), ASSEMBLED), 'ab') as f:
+            f.write(b"garbage")
+        store._digests.clear()
+
+        for number in range(2, -(-len(DATA) // PART_SIZE) + 1):
+            await send(store, upload_id, number)
+        recorder = Recorder()
+        await store.complete(upload_id, "user", recorder)
+
+        assert recorder.uploads == [(DATA, hashlib.sha256(DATA).hexdigest(), len(DATA))]
+
+    async def test_failed_copy_does_not_corrupt_the_digest(self, store, monkeypatch):
+        upload_id = await start(store)
+        await send(store, upload_id, 1)
+
+        real_open = open
+        failures = []
+
+        class FailingPart:
+            """Part file whose second read fails, after one block was appended."""
+
+            def __init__(self, f):
+                self.f = f
+                self.reads = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.f.close()
+
+            def read(self, size):
+                self.reads += 1
+                if self.reads == 2:
+                    failures.append(1)
+                    raise OSError("disk error")
+                return self.f.read(4)
+
+        def flaky_open(path, mode='r', *args, **kwargs):
+            f = real_open(path, mode, *args, **kwargs)
+            if path.endswith("part-00002") and mode == 'rb' and not failures:
+                return FailingPart(f)
+            return f
+
+        monkeypatch.setattr(upload_sessions_module, "open", flaky_open, raising=False)
+        with pytest.raises(OSError):
+            await send(store, upload_id, 2)
+
+        for number in range(2, -(-len(DATA) // PART_SIZE) + 1):
+            await send(store, upload_id, number)
+        recorder = Recorder()
+        await store.complete(upload_id, "user", recorder)
+
+        assert recorder.uploads == [(DATA, hashlib.sha256(DATA).hexdigest(), len(DATA))]
+
+    async def test_sessions_are_private_to_their_user(self, store):
+        upload_id = await start(store)
+
+        with pytest.raises(HTTPException) as error:
+            await store.status(upload_id, "someone-else")
+        assert error.value.status_code == 404
+
+    async def test_abort_removes_the_session(self, store):
+        upload_id = await start(store)
+        await send(store, upload_id, 1)
+
+        await store.abort(upload_id, "user")
+
+        assert not os.path.exists(store._dir(upload_id))
+        with pytest.raises(HTTPException):
+            await store.status(upload_id, "user")
+
+    async def test_manifest_survives_a_new_store(self, store, tmp_path):
+        upload_id = await start(store)
+        await send(store, upload_id, 2)
+
+        restarted = UploadSessionStore(root=str(tmp_path))
+
+        summary = await restarted.status(upload_id, "user")
+        assert summary['received_parts'] == [2]
+        with open(os.path.join(restarted._dir(upload_id), MANIFEST)) as f:
+            assert json.load(f)['parts']['2']['size'] == PART_SIZE